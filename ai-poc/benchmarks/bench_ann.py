@@ -0,0 +1,99 @@
+"""Recall vs latency of the ANN index modes against the exact Flat baseline.
+
+Vectors are synthetic: normalized gaussian clusters in MiniLM's 384 dims, which
+is closer to real sentence embeddings than uniform noise.
+
+Usage: python benchmarks/bench_ann.py [--sizes 10000,100000,1000000] [--queries 500] [--k 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+import faiss
+from utils import index_factory
+
+SWEEPS = {
+    "ivf": ("nprobe", [1, 4, 16, 64]),
+    "ivfpq": ("nprobe", [4, 16, 64]),
+    "hnsw": ("ef_search", [16, 64, 256]),
+}
+
+
+def make_vectors(n, dim, n_clusters=256, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    out = np.empty((n, dim), dtype=np.float32)
+    # generate in blocks so 1M x 384 does not need a float64 temporary
+    for start in range(0, n, 100000):
+        stop = min(n, start + 100000)
+        labels = rng.integers(0, n_clusters, stop - start)
+        out[start:stop] = centers[labels] + 0.6 * rng.standard_normal((stop - start, dim)).astype(np.float32)
+    faiss.normalize_L2(out)
+    return out
+
+
+def recall(found, truth):
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def timed_search(index, queries, k, params=None):
+    start = time.perf_counter()
+    for q in queries:
+        index.search(q.reshape(1, -1), k, params=params)
+    per_query = (time.perf_counter() - start) / len(queries)
+    _, I = index.search(queries, k, params=params)
+    return per_query * 1000, I
+
+
+def bench_size(n, dim, n_queries, k, kinds, nlist):
+    base = make_vectors(n, dim)
+    queries = make_vectors(n_queries, dim, seed=1)
+    ids = np.arange(n, dtype=np.int64)
+
+    flat = index_factory.create_index(base, kind="flat")
+    flat.add_with_ids(base, ids)
+    flat_ms, truth = timed_search(flat, queries, k)
+    print(f"\nn={n:,} dim={dim} queries={n_queries} k={k}")
+    print(f"{'index':<8} {'param':<14} {'build s':>8} {'ms/query':>9} {'recall@k':>9}")
+    print(f"{'flat':<8} {'-':<14} {'-':>8} {flat_ms:9.3f} {1.0:9.3f}")
+
+    for kind in kinds:
+        start = time.perf_counter()
+        index = index_factory.create_index(base, kind=kind, nlist=nlist)
+        index.add_with_ids(base, ids)
+        build_s = time.perf_counter() - start
+        if index_factory.index_kind(index) != kind:
+            print(f"{kind:<8} corpus too small, fell back to {index_factory.index_kind(index)}")
+            continue
+        name, values = SWEEPS[kind]
+        for value in values:
+            params = index_factory.search_params(index, **{name: value})
+            ms, found = timed_search(index, queries, k, params)
+            print(f"{kind:<8} {f'{name}={value}':<14} {build_s:8.1f} {ms:9.3f} {recall(found, truth):9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--kinds", default="ivf,ivfpq,hnsw")
+    parser.add_argument("--nlist", type=int, default=None, help="default: INDEX_NLIST, capped by corpus size")
+    args = parser.parse_args()
+
+    for n in (int(s) for s in args.sizes.split(",")):
+        bench_size(n, args.dim, args.queries, args.k, args.kinds.split(","), args.nlist)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
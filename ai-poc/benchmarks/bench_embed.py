@@ -0,0 +1,79 @@
+"""Embedding throughput per backend and cosine agreement with the PyTorch baseline.
+
+Encodes the same synthetic FIR passages with every backend in utils.embeddings
+(torch, onnx, onnx-int8) at the given thread count and batch sizes, and compares
+each backend's vectors with torch's row by row. Backends that fail to load
+(e.g. optimum[onnxruntime] not installed) are reported and skipped.
+
+Usage: python benchmarks/bench_embed.py [--texts 512] [--threads 0] [--batch-sizes 16,32,64]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from config import EMBEDDING_MODEL
+from utils.embeddings import BACKENDS, load_model
+
+WORDS = ("complainant reported accused entered premises market cash stolen police station night witness "
+         "vehicle registered mobile phone statement recorded section investigation officer threatened "
+         "assaulted injured hospital neighbour property dispute gold chain snatched motorcycle").split()
+
+
+def make_texts(n, seed=0):
+    rnd = random.Random(seed)
+    return [f"FIR under IPC {rnd.choice([302, 379, 420, 498])}: "
+            + " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(20, 120))) for _ in range(n)]
+
+
+def encode(model, texts, batch_size):
+    return model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                        normalize_embeddings=True).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads (0: runtime default)")
+    parser.add_argument("--batch-sizes", default="16,32,64")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    baseline = None
+    print(f"{'backend':<12}{'batch':>7}{'texts/sec':>12}{'mean cos':>10}{'min cos':>10}")
+    for backend in BACKENDS:
+        try:
+            start = time.perf_counter()
+            model = load_model(args.model, backend, args.threads)
+            load_s = time.perf_counter() - start
+        except Exception as e:
+            print(f"{backend:<12} unavailable: {e}")
+            continue
+        encode(model, texts[:8], 8)  # first call allocates; keep it out of the timings
+        vectors = None
+        for batch_size in batch_sizes:
+            start = time.perf_counter()
+            vectors = encode(model, texts, batch_size)
+            rate = len(texts) / (time.perf_counter() - start)
+            if baseline is None and backend == "torch":
+                baseline = vectors
+            if baseline is not None:
+                cos = np.sum(vectors * baseline, axis=1)
+                agreement = f"{cos.mean():10.4f}{cos.min():10.4f}"
+            else:
+                agreement = f"{'-':>10}{'-':>10}"
+            print(f"{backend:<12}{batch_size:>7}{rate:>12.1f}{agreement}")
+        print(f"{'':<12}load {load_s:.1f}s, dim {vectors.shape[1]}")
+
+
+if __name__ == "__main__":
+    main()
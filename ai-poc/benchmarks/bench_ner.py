@@ -0,0 +1,94 @@
+"""Benchmark NER extraction: per-call spacy.load (old behaviour) vs the cached
+pipeline vs batched nlp.pipe.
+
+Usage: python benchmarks/bench_ner.py [--docs 200] [--batch-size 64] [--n-process 1]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from config import SPACY_MODEL
+from utils import ner
+
+FIRST_NAMES = ["Ramesh", "Sunita", "Arjun", "Priya", "Vikram", "Anita", "Rahul", "Meera"]
+LAST_NAMES = ["Sharma", "Patel", "Singh", "Iyer", "Khan", "Das", "Reddy", "Gupta"]
+
+
+def make_corpus(n, seed=0):
+    rnd = random.Random(seed)
+    docs = []
+    for i in range(n):
+        who = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+        accused = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+        description = (
+            f"{who} reported that {accused} entered the premises of "
+            f"{rnd.choice(LAST_NAMES)} Traders near the market and took cash. "
+        ) * rnd.randint(1, 4)
+        docs.append(
+            f"Complainant: {who}\nIncident Date: 2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}\n"
+            f"Sections: IPC {rnd.choice([302, 307, 379, 420, 498])}\n"
+            f"Contact: 98{rnd.randint(10000000, 99999999)}\n"
+            f"Description: {description}"
+        )
+    return docs
+
+
+def _report(label, n, elapsed):
+    print(f"{label:<28} {elapsed * 1000 / n:9.2f} ms/doc {n / elapsed:10.1f} docs/sec")
+
+
+def bench_uncached(docs):
+    import spacy
+    start = time.perf_counter()
+    for text in docs:
+        nlp = spacy.load(SPACY_MODEL)
+        nlp(text)
+    return time.perf_counter() - start
+
+
+def bench_cached(docs):
+    ner.extract_entities(docs[0])  # load outside the timed region
+    start = time.perf_counter()
+    for text in docs:
+        ner.extract_entities(text)
+    return time.perf_counter() - start
+
+
+def bench_batch(docs, batch_size, n_process):
+    ner.extract_entities(docs[0])
+    start = time.perf_counter()
+    ner.extract_entities_batch(docs, batch_size=batch_size, n_process=n_process)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--uncached-docs", type=int, default=10,
+                        help="docs for the spacy.load-per-call baseline (it is slow)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-process", type=int, default=1)
+    args = parser.parse_args()
+
+    if ner._get_nlp() is None:
+        print(f"spaCy model '{SPACY_MODEL}' is not installed; nothing to benchmark.")
+        return 1
+
+    docs = make_corpus(args.docs)
+    n_uncached = min(args.uncached_docs, len(docs))
+    print(f"model={SPACY_MODEL} docs={len(docs)}")
+    _report("before: load per call", n_uncached, bench_uncached(docs[:n_uncached]))
+    _report("after: cached pipeline", len(docs), bench_cached(docs))
+    _report(f"after: pipe(bs={args.batch_size},np={args.n_process})", len(docs),
+            bench_batch(docs, args.batch_size, args.n_process))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
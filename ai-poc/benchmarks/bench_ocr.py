@@ -0,0 +1,127 @@
+"""OCR throughput and character accuracy on raw vs preprocessed page images.
+
+Pages are synthetic FIR text rendered with PIL, then degraded like phone photos:
+upscaled, rotated a few degrees, tinted and noised, with no DPI metadata. Each
+page is OCRed as-is with tesseract's defaults ("raw") and through
+ocr_preprocess.prepare with the chosen PSM ("preprocessed"); accuracy is the
+difflib similarity of the OCR text to the rendered text. Without a tesseract
+binary only preprocessing throughput and deskew error are reported. The last row
+is a repeat of the corpus answered from the page-hash cache.
+
+Usage: python benchmarks/bench_ocr.py [--pages 20] [--scale 1.8] [--max-skew 3]
+"""
+import argparse
+import difflib
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+import pytesseract
+from PIL import Image, ImageDraw, ImageFont
+
+from utils import ocr, ocr_preprocess
+
+WORDS = ("complainant reported accused entered premises market cash stolen police station night "
+         "witness vehicle registered mobile phone statement recorded section investigation officer").split()
+
+
+def make_page(rnd, lines=24, width=1700, height=2200):
+    text_lines = [f"FIR No {rnd.randint(100, 999)}/2025  Sections: IPC {rnd.choice([302, 379, 420, 498])}"]
+    for _ in range(lines - 1):
+        text_lines.append(" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(6, 10))).capitalize())
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=34)
+    for i, line in enumerate(text_lines):
+        draw.text((120, 140 + i * 76), line, fill=0, font=font)
+    return page, "\n".join(text_lines)
+
+
+def degrade(page, rnd, scale, max_skew):
+    """Phone-photo version of a clean page. Returns (image, applied rotation in degrees)."""
+    angle = rnd.uniform(-max_skew, max_skew)
+    img = page.resize((int(page.width * scale), int(page.height * scale)), Image.BICUBIC)
+    img = img.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    arr = np.asarray(img, dtype=np.float32)
+    arr = 40 + arr * 0.75 + np.random.default_rng(rnd.randint(0, 10 ** 6)).normal(0, 12, arr.shape)
+    gray = np.clip(arr, 0, 255).astype(np.uint8)
+    rgb = np.stack([gray, np.clip(gray * 0.95, 0, 255).astype(np.uint8), np.clip(gray * 0.85, 0, 255).astype(np.uint8)],
+                   axis=-1)
+    return Image.fromarray(rgb, "RGB"), angle
+
+
+def accuracy(truth, text):
+    norm = lambda s: re.sub(r"\s+", " ", s).strip()
+    return difflib.SequenceMatcher(None, norm(truth), norm(text)).ratio()
+
+
+def have_tesseract():
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def run(label, pages, fn):
+    start = time.perf_counter()
+    outputs = [fn(img) for img, _, _ in pages]
+    elapsed = time.perf_counter() - start
+    acc = [accuracy(truth, out) for (_, truth, _), out in zip(pages, outputs)] if outputs[0] is not None else None
+    acc_text = f"{np.mean(acc) * 100:9.1f}%" if acc else f"{'-':>10}"
+    print(f"{label:<22}{len(pages) / elapsed:10.2f}{acc_text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--scale", type=float, default=1.8, help="upscale factor simulating a phone photo")
+    parser.add_argument("--max-skew", type=float, default=3.0)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    pages = []
+    for _ in range(args.pages):
+        page, truth = make_page(rnd)
+        img, angle = degrade(page, rnd, args.scale, args.max_skew)
+        pages.append((img, truth, angle))
+    print(f"{args.pages} pages of {pages[0][0].size[0]}x{pages[0][0].size[1]} px")
+
+    errors = []
+    start = time.perf_counter()
+    for img, _, angle in pages:
+        gray = img.convert("L")
+        gray = gray.resize((int(gray.width * ocr_preprocess.target_scale(gray)),
+                            int(gray.height * ocr_preprocess.target_scale(gray))))
+        mask = ocr_preprocess._analysis_mask(gray, ocr_preprocess.otsu_threshold(gray.histogram()), True)
+        # the page was rotated by angle; leveling it takes -angle
+        errors.append(abs(ocr_preprocess.skew_angle(mask) + angle))
+    print(f"deskew error: mean {np.mean(errors):.2f} deg, max {np.max(errors):.2f} deg "
+          f"({args.pages / (time.perf_counter() - start):.1f} pages/sec)")
+
+    print(f"{'pipeline':<22}{'pages/sec':>10}{'accuracy':>10}")
+    run("preprocess only", pages, lambda img: (ocr_preprocess.prepare(img), None)[1])
+    if not have_tesseract():
+        print("tesseract binary not found; OCR rows skipped")
+        return
+    run("raw", pages, lambda img: pytesseract.image_to_string(img))
+    run("preprocessed", pages, lambda img: ocr._ocr_image(img)[0])
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        ocr.CACHE_DIR = cache_dir
+        for img, _, _ in pages:
+            ocr._cache_put(ocr._page_key(img), ocr._ocr_image(img)[0])
+        run("cached repeat", pages, lambda img: ocr._cache_get(ocr._page_key(img)))
+
+
+if __name__ == "__main__":
+    main()
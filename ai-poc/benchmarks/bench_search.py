@@ -0,0 +1,101 @@
+"""Query latency of BM25, dense and hybrid (RRF) search, with and without filters.
+
+Documents are synthetic FIR-like texts (random vocabulary plus IPC sections,
+case ids and dates); vectors are random normalized 384-d rows, so this measures
+index cost only, not embedding time or ranking quality.
+
+Usage: python benchmarks/bench_search.py [--docs 100000] [--queries 200] [--k 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+import faiss
+from config import SEARCH_FUSION_DEPTH, SEARCH_RRF_K
+from utils import index_factory
+from utils.bm25 import BM25Index, reciprocal_rank_fusion
+
+SECTIONS = ["302", "307", "323", "354", "376", "379", "392", "406", "420", "498"]
+
+
+def make_corpus(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"w{i}" for i in range(20000)])
+    bm25 = BM25Index()
+    for i in range(n):
+        section = SECTIONS[i % len(SECTIONS)]
+        # zipf-ish word frequencies, like real text
+        words = vocab[np.minimum(rng.zipf(1.3, 150), len(vocab)) - 1]
+        text = f"case {i} booked under IPC {section} phone 98{i:08d} " + " ".join(words)
+        fields = {"caseId": f"case-{i % 5000}", "sections": [section],
+                  "dates": [f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}"]}
+        bm25.add(str(i), text, fields)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    dense = index_factory.flat_index(dim)
+    dense.add_with_ids(vectors, np.arange(n, dtype=np.int64))
+    return bm25, dense
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    bm25, dense = make_corpus(args.docs, args.dim)
+    print(f"built {args.docs} docs in {time.perf_counter() - start:.1f}s ({len(bm25.postings)} terms)")
+
+    rng = np.random.default_rng(1)
+    texts = [f"IPC {SECTIONS[i % len(SECTIONS)]} w{rng.integers(0, 200)} w{rng.integers(0, 5000)}"
+             for i in range(args.queries)]
+    qvecs = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    faiss.normalize_L2(qvecs)
+    queries = list(zip(texts, qvecs))
+    depth = max(args.k, SEARCH_FUSION_DEPTH)
+
+    def dense_search(q, allowed=None):
+        params = None
+        if allowed is not None:
+            ids = np.fromiter((int(d) for d in allowed), dtype=np.int64)
+            params = index_factory.search_params(dense, selector=faiss.IDSelectorBatch(ids))
+        _, I = dense.search(q[1].reshape(1, -1), depth, params=params)
+        return [str(i) for i in I[0] if i >= 0]
+
+    def hybrid(q, filters=None):
+        allowed = bm25.filter(**filters) if filters else None
+        keyword = [d for d, _ in bm25.search(q[0], depth, allowed)]
+        return reciprocal_rank_fusion([dense_search(q, allowed), keyword], k=SEARCH_RRF_K)[:args.k]
+
+    rows = [
+        ("bm25", lambda q: bm25.search(q[0], args.k)),
+        ("dense (flat)", dense_search),
+        ("hybrid", hybrid),
+        ("hybrid + caseId", lambda q: hybrid(q, {"case_id": "case-42"})),
+        ("hybrid + section", lambda q: hybrid(q, {"section": "IPC 420"})),
+        ("hybrid + date range", lambda q: hybrid(q, {"date_from": "2024-03-01", "date_to": "2024-03-31"})),
+    ]
+    print(f"{'mode':<22}{'ms/query':>10}")
+    for name, fn in rows:
+        print(f"{name:<22}{timed(fn, queries):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Offline stand-ins for the heavy models, installed by the benchmark suite only.
+
+The suite must run without network access or downloaded models. install() puts
+cheap, deterministic replacements in front of whatever is missing (or of
+everything, with mode "all") before the ai-poc modules are imported:
+
+  embeddings  sentence_transformers.SentenceTransformer: hashed bag-of-words
+              vectors of the model's dimension
+  generator   transformers.pipeline: a template draft after a fixed model latency,
+              so the micro-batcher still groups concurrent drafts
+  ocr         pytesseract.image_to_string: canned FIR text sized to the page;
+              OCR runs inline, since pool workers would not see the patch
+  spacy       made unimportable, which puts NER on its regex-only path
+
+Numbers measured with a stub say nothing about that model's cost; the suite
+records which components were stubbed and warns when a baseline differs.
+"""
+import hashlib
+import importlib.util
+import os
+import shutil
+import sys
+import time
+import types
+
+import numpy as np
+
+MODES = ("auto", "all", "none")
+
+STUB_DIM = 384
+# fixed cost of one stub generation call (a batch) and of each prompt in it
+STUB_GENERATE_BATCH_SECONDS = 0.05
+STUB_GENERATE_PROMPT_SECONDS = 0.005
+
+_FIR_LINE = "Complainant reported that the accused entered the premises near the market and took cash."
+
+
+class StubSentenceTransformer:
+    def __init__(self, model_name_or_path=None, **kwargs):
+        self.model_name = model_name_or_path
+
+    def get_sentence_embedding_dimension(self):
+        return STUB_DIM
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, normalize_embeddings=True, **kwargs):
+        out = np.zeros((len(sentences), STUB_DIM), dtype=np.float32)
+        for row, text in enumerate(sentences):
+            for word in text.lower().split():
+                out[row, int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest(), "little")
+                    % STUB_DIM] += 1.0
+        if normalize_embeddings:
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out /= np.where(norms > 0, norms, 1.0)
+        return out
+
+
+class _StubPipeline:
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, prompts, **kwargs):
+        prompts = [prompts] if isinstance(prompts, str) else list(prompts)
+        time.sleep(STUB_GENERATE_BATCH_SECONDS + STUB_GENERATE_PROMPT_SECONDS * len(prompts))
+        return [{"generated_text": "Summary:\n" + p.rsplit("FACTS:\n", 1)[-1][:400]
+                 + "\n\nCharges:\n-\n\nEvidence:\n-\n\nNext Steps:\n-"} for p in prompts]
+
+
+def _stub_pipeline(task=None, model=None, **kwargs):
+    return _StubPipeline(model)
+
+
+def _stub_image_to_string(image, lang=None, config="", **kwargs):
+    lines = max(1, getattr(image, "height", 1100) // 60)
+    return "\n".join(_FIR_LINE for _ in range(lines))
+
+
+def _model_cached(name):
+    """True if a Hugging Face model is available without the network."""
+    try:
+        from huggingface_hub import snapshot_download
+        snapshot_download(name, local_files_only=True)
+        return True
+    except Exception:
+        return False
+
+
+def _spacy_model_installed(name):
+    try:
+        import spacy.util
+        return spacy.util.is_package(name)
+    except Exception:
+        return False
+
+
+def _tesseract_installed():
+    try:
+        import pytesseract
+        return shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+    except ImportError:
+        return False
+
+
+def install(mode="auto"):
+    """Install stubs for missing (auto) or all (all) heavy models; none installs nothing.
+    Must run before config and utils are imported. Returns {component: real|stub|regex}."""
+    if mode not in MODES:
+        raise ValueError(f"stub mode must be one of {', '.join(MODES)}")
+    # never reach out to the Hugging Face Hub or Inference API
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+    os.environ.pop("HUGGINGFACE_HUB_API_TOKEN", None)
+
+    embedding_model = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    if "/" not in embedding_model and not os.path.isdir(embedding_model):
+        embedding_model = "sentence-transformers/" + embedding_model
+    draft_model = os.getenv("MODEL_NAME", "google/flan-t5-small")
+    spacy_model = os.getenv("SPACY_MODEL", "en_core_web_sm")
+
+    def _stub(real_available):
+        return mode == "all" or (mode == "auto" and not real_available)
+
+    used = {}
+    if _stub(importlib.util.find_spec("sentence_transformers") is not None and _model_cached(embedding_model)):
+        module = types.ModuleType("sentence_transformers")
+        module.SentenceTransformer = StubSentenceTransformer
+        sys.modules["sentence_transformers"] = module
+        used["embeddings"] = "stub"
+    else:
+        used["embeddings"] = "real"
+
+    if _stub(importlib.util.find_spec("transformers") is not None and _model_cached(draft_model)):
+        module = types.ModuleType("transformers")
+        module.pipeline = _stub_pipeline
+        sys.modules["transformers"] = module
+        used["generator"] = "stub"
+    else:
+        used["generator"] = "real"
+
+    if _stub(_tesseract_installed()):
+        import pytesseract
+        pytesseract.image_to_string = _stub_image_to_string
+        pytesseract.get_tesseract_version = lambda: "stub"
+        os.environ["OCR_WORKERS"] = "0"
+        used["ocr"] = "stub"
+    else:
+        used["ocr"] = "real"
+
+    if mode == "all":
+        # a None entry makes `import spacy` raise ImportError
+        sys.modules["spacy"] = None
+        used["spacy"] = "regex"
+    else:
+        # without the model NER falls back to its regex detectors on its own
+        used["spacy"] = "real" if _spacy_model_installed(spacy_model) else "regex"
+    return used
@@ -0,0 +1,408 @@
+"""Reproducible benchmark suite: micro-benchmarks and an in-process load test.
+
+  micro  extract_entities, _redact_names, image_to_text, embed_texts and
+         search_index on generated FIR corpora
+  load   concurrent /ocr-extract, /search and /generate-draft requests against the
+         FastAPI app in this process (lifespan included, no sockets); p50/p95/p99
+         latency and throughput per endpoint
+
+The app runs from a scratch copy of ai-poc in a temporary directory, so its
+storage (index, database, caches, uploads) starts empty and the working tree's
+is left alone. Models that are not available offline are stubbed (see
+benchmarks/stubs.py); corpora and request mixes are seeded.
+
+Save a run with --save and check a later one against it with --baseline: metrics
+that got worse by more than --tolerance are reported and the exit status is 1.
+
+Usage:
+    python benchmarks/suite.py [micro|load|all] [--quick] [--stubs auto|all|none]
+        [--concurrency 8] [--duration 15] [--save run.json] [--baseline base.json]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+import stubs
+
+FIRST_NAMES = ["Ramesh", "Sunita", "Arjun", "Priya", "Vikram", "Anita", "Rahul", "Meera", "Imran", "Kavita"]
+LAST_NAMES = ["Sharma", "Patel", "Singh", "Iyer", "Khan", "Das", "Reddy", "Gupta", "Nair", "Joshi"]
+SECTIONS = [302, 307, 323, 354, 379, 392, 406, 420, 498]
+WORDS = ("complainant reported accused entered premises market cash stolen police station night witness "
+         "vehicle registered mobile phone statement recorded investigation officer threatened assaulted "
+         "injured hospital neighbour property dispute gold chain snatched motorcycle").split()
+
+# (full run, --quick) sizes
+SIZES = {
+    "ner_docs": (200, 40),
+    "ocr_pages": (10, 3),
+    "embed_texts": (512, 96),
+    "search_docs": (2000, 300),
+    "search_queries": (200, 50),
+    "duration": (15.0, 5.0),
+}
+# texts per embed_texts call in the micro-benchmark
+EMBED_BATCH = 32
+DEFAULT_MIX = "search=6,ocr-extract=1,generate-draft=2"
+# compared against a baseline: metric -> True when higher is better
+COMPARED = {"p50_ms": False, "p95_ms": False, "p99_ms": False, "ops_per_sec": True, "texts_per_sec": True,
+            "rps": True}
+# tail percentiles of fewer samples than this are noise, not compared
+MIN_TAIL_SAMPLES = 100
+
+
+# -- corpora --
+
+def make_firs(n, seed=0):
+    """n synthetic FIR texts. Returns [(text, names mentioned, sections, date)]."""
+    rnd = random.Random(seed)
+    docs = []
+    for _ in range(n):
+        who = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+        accused = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+        section = rnd.choice(SECTIONS)
+        date = f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"
+        description = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(30, 150)))
+        text = (f"Complainant: {who}\nIncident Date: {date}\nSections: IPC {section}\n"
+                f"Contact: 98{rnd.randint(10000000, 99999999)}\n"
+                f"Description: {who} reported that {accused} {description}.")
+        docs.append((text, [who, accused], [f"IPC {section}"], date))
+    return docs
+
+
+def make_queries(n, seed=0):
+    rnd = random.Random(seed)
+    return [f"{' '.join(rnd.sample(WORDS, rnd.randint(2, 5)))} IPC {rnd.choice(SECTIONS)} {i}" for i in range(n)]
+
+
+def make_page(text, width=1240, height=1754):
+    """PNG bytes of an A4 page at 150 DPI with text typed on it."""
+    from PIL import Image, ImageDraw, ImageFont
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=26)
+    lines = [wrapped for line in text.splitlines() for wrapped in textwrap.wrap(line, 70) or [""]]
+    for i, line in enumerate(lines[:(height - 160) // 40]):
+        draw.text((90, 90 + i * 40), line, fill=0, font=font)
+    out = io.BytesIO()
+    page.save(out, format="PNG", dpi=(150, 150))
+    return out.getvalue()
+
+
+def unique_png(png, n):
+    """The same image with a tEXt chunk after IHDR, so every upload has its own SHA-256."""
+    data = b"bench\x00" + str(n).encode("ascii")
+    chunk = struct.pack(">I", len(data)) + b"tEXt" + data + struct.pack(">I", zlib.crc32(b"tEXt" + data))
+    # 8-byte signature + IHDR (4 length + 4 type + 13 data + 4 crc)
+    return png[:33] + chunk + png[33:]
+
+
+# -- measurement --
+
+def latency_stats(seconds):
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    if not ms.size:
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"n": int(ms.size), "mean_ms": round(float(ms.mean()), 3), "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3)}
+
+
+def time_each(fn, calls):
+    """Run fn(*args) for every args tuple in calls; the first call only warms up and is not timed
+    (timing it again would measure a cache hit)."""
+    fn(*calls[0])
+    calls = calls[1:]
+    seconds = []
+    start = time.perf_counter()
+    for args in calls:
+        t = time.perf_counter()
+        fn(*args)
+        seconds.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    return dict(latency_stats(seconds), ops_per_sec=round(len(calls) / elapsed, 2))
+
+
+# -- micro-benchmarks --
+
+def run_micro(size):
+    from utils import ner, ocr
+    from utils.embeddings import embed_texts
+    from utils.faiss_index import build_index, search_index
+
+    results = {}
+    firs = make_firs(size("ner_docs"), seed=1)
+    print(f"micro: extract_entities x{len(firs)}", file=sys.stderr)
+    results["micro.extract_entities"] = time_each(ner.extract_entities, [(text,) for text, *_ in firs])
+    results["micro._redact_names"] = time_each(ner._redact_names, [(text, names) for text, names, *_ in firs])
+
+    pages = [make_page(text) for text, *_ in make_firs(size("ocr_pages"), seed=2)]
+    print(f"micro: image_to_text x{len(pages)}", file=sys.stderr)
+    results["micro.image_to_text"] = time_each(ocr.image_to_text, [(page,) for page in pages])
+
+    texts = [text for text, *_ in make_firs(size("embed_texts"), seed=3)]
+    batches = [(texts[i:i + EMBED_BATCH],) for i in range(0, len(texts), EMBED_BATCH)]
+    print(f"micro: embed_texts x{len(texts)}", file=sys.stderr)
+    for name, use_cache in (("micro.embed_texts", False), ("micro.embed_texts.cached", True)):
+        if use_cache:
+            embed_texts(texts)  # fill the cache
+        stats = time_each(lambda batch: embed_texts(batch, use_cache=use_cache), batches)
+        stats["texts_per_sec"] = round(stats["ops_per_sec"] * EMBED_BATCH, 1)
+        results[name] = stats
+
+    records = [{"id": f"doc-{i}", "caseId": f"case-{i % 200}", "extractedText": text, "redactedText": text,
+                "entities": {"sections": sections, "dates": [date]}}
+               for i, (text, _, sections, date) in enumerate(make_firs(size("search_docs"), seed=4))]
+    print(f"micro: search_index over {len(records)} docs", file=sys.stderr)
+    build_index(records)
+    for seed, mode in enumerate(("hybrid", "dense", "bm25"), start=5):
+        # distinct queries per mode, so neither the result nor the query-vector cache answers them
+        queries = make_queries(size("search_queries"), seed=seed)
+        results[f"micro.search_index.{mode}"] = time_each(lambda q: search_index(q, 10, mode=mode),
+                                                          [(q,) for q in queries])
+    return results
+
+
+# -- load test --
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("search", "ocr-extract", "generate-draft"):
+            raise ValueError(f"unknown endpoint in mix: {name}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+async def _wait_ready(client, timeout=180.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = await client.get("/ready")
+        if response.status_code == 200:
+            return response.json()
+        await asyncio.sleep(0.5)
+    raise RuntimeError("the app did not become ready within %.0fs" % timeout)
+
+
+async def _load(app, concurrency, duration, weights, seed):
+    import httpx
+
+    firs = make_firs(60, seed=seed)
+    pages = [make_page(text) for text, *_ in firs[:8]]
+    queries = make_queries(200, seed=seed + 1)
+    uploads = iter(range(10 ** 9))
+
+    def request(name, rnd):
+        if name == "ocr-extract":
+            n = next(uploads)
+            return "POST", "/ocr-extract", {
+                "files": {"file": (f"fir-{n}.png", unique_png(pages[n % len(pages)], n), "image/png")},
+                "data": {"caseId": f"case-{n % 20}"}}
+        if name == "search":
+            mode = rnd.choices(["hybrid", "dense", "bm25"], [4, 1, 1])[0]
+            return "GET", "/search", {"params": {"q": rnd.choice(queries), "k": 5, "mode": mode}}
+        return "POST", "/generate-draft", {"data": {"text": rnd.choice(firs)[0]}}
+
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://ai-poc", timeout=300) as client:
+            ready = await _wait_ready(client)
+            print(f"load: ready ({'degraded' if ready.get('degraded') else 'all components'}); seeding",
+                  file=sys.stderr)
+            for n, (text, *_) in enumerate(firs[:20]):
+                await client.post("/ocr-extract", files={"file": (f"seed-{n}.txt", text.encode("utf-8"), "text/plain")},
+                                  data={"caseId": f"case-{n % 20}"})
+            response = await client.post("/index")
+            if response.status_code != 200:
+                raise RuntimeError(f"POST /index failed: {response.text}")
+            # one untimed request per endpoint loads whatever is still lazy
+            warm = random.Random(seed)
+            for name in weights:
+                method, url, kwargs = request(name, warm)
+                await client.request(method, url, **kwargs)
+
+            print(f"load: {concurrency} clients for {duration:.0f}s, mix {weights}", file=sys.stderr)
+            names, weight_list = list(weights), list(weights.values())
+            deadline = time.perf_counter() + duration
+
+            async def client_loop(i):
+                rnd = random.Random(seed * 1000 + i)
+                while time.perf_counter() < deadline:
+                    name = rnd.choices(names, weight_list)[0]
+                    method, url, kwargs = request(name, rnd)
+                    t = time.perf_counter()
+                    try:
+                        response = await client.request(method, url, **kwargs)
+                        ok = response.status_code < 400
+                    except Exception:
+                        ok = False
+                    samples[name].append(time.perf_counter() - t)
+                    if not ok:
+                        errors[name] += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(client_loop(i) for i in range(concurrency)))
+            elapsed = time.perf_counter() - start
+
+    results = {}
+    for name in names:
+        results[f"load.{name}"] = dict(latency_stats(samples[name]), errors=errors[name],
+                                       rps=round(len(samples[name]) / elapsed, 2))
+    everything = [s for name in names for s in samples[name]]
+    results["load.all"] = dict(latency_stats(everything), errors=sum(errors.values()),
+                               rps=round(len(everything) / elapsed, 2))
+    return results
+
+
+def run_load(concurrency, duration, mix, seed):
+    import main
+    return asyncio.run(_load(main.app, concurrency, duration, parse_mix(mix), seed))
+
+
+# -- reporting --
+
+def print_results(results):
+    print(f"{'benchmark':<32}{'n':>7}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'per sec':>11}{'errors':>8}")
+    for name, r in results.items():
+        rate = r.get("rps", r.get("ops_per_sec", 0.0))
+        print(f"{name:<32}{r.get('n', 0):>7}{r.get('p50_ms', 0):>11.2f}{r.get('p95_ms', 0):>11.2f}"
+              f"{r.get('p99_ms', 0):>11.2f}{rate:>11.2f}{r.get('errors', ''):>8}")
+
+
+def compare(current, baseline, tolerance):
+    """Print the change of every compared metric. Returns the regressions."""
+    for key in ("stubs", "quick", "concurrency", "duration", "mix", "cpus"):
+        if current["meta"].get(key) != baseline["meta"].get(key):
+            print(f"warning: {key} differs from the baseline ({baseline['meta'].get(key)} -> "
+                  f"{current['meta'].get(key)}); the comparison may not be meaningful")
+    regressions = []
+    print(f"\n{'benchmark':<32}{'metric':<14}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, metrics in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        if metrics.get("errors", 0) > base.get("errors", 0):
+            regressions.append(f"{name} errors {base.get('errors', 0)} -> {metrics['errors']}")
+        for metric, higher_is_better in COMPARED.items():
+            if not base.get(metric) or metric not in metrics:
+                continue
+            if metric in ("p95_ms", "p99_ms") and min(base.get("n", 0), metrics.get("n", 0)) < MIN_TAIL_SAMPLES:
+                continue
+            change = (metrics[metric] - base[metric]) / base[metric]
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > tolerance else ("  improved" if worse < -tolerance else "")
+            print(f"{name:<32}{metric:<14}{base[metric]:>12.2f}{metrics[metric]:>12.2f}{change:>+9.1%}{flag}")
+            if worse > tolerance:
+                regressions.append(f"{name} {metric} {base[metric]:.2f} -> {metrics[metric]:.2f} ({change:+.1%})")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("suite", nargs="?", choices=("micro", "load", "all"), default="all")
+    parser.add_argument("--quick", action="store_true", help="small corpora and a short load test")
+    parser.add_argument("--stubs", choices=stubs.MODES, default="auto",
+                        help="auto: stub models unavailable offline; all: stub every model; none: no stubs")
+    parser.add_argument("--concurrency", type=int, default=8, help="load test clients")
+    parser.add_argument("--duration", type=float, default=None, help="load test seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="load test endpoint weights")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare with results saved earlier by --save")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="relative change counted as a regression (default 0.15)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch copy of the app")
+    args = parser.parse_args()
+
+    def size(name):
+        return SIZES[name][1 if args.quick else 0]
+
+    duration = args.duration if args.duration is not None else size("duration")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    work = tempfile.mkdtemp(prefix="ai-poc-bench-")
+    app_dir = os.path.join(work, "ai-poc")
+    shutil.copytree(BASE_DIR, app_dir, ignore=shutil.ignore_patterns("storage", "__pycache__", "benchmarks", "tests"))
+    # repeated pages in the corpus must be OCRed every time
+    os.environ.setdefault("OCR_CACHE_DIR", "")
+    used = stubs.install(args.stubs)
+    sys.path.insert(0, app_dir)
+    os.chdir(app_dir)
+    print(f"app copy: {app_dir}; models: {used}", file=sys.stderr)
+
+    results = {}
+    try:
+        # the load test first, while the app's storage and caches are empty
+        if args.suite in ("load", "all"):
+            results.update(run_load(args.concurrency, duration, args.mix, args.seed))
+        if args.suite in ("micro", "all"):
+            results.update(run_micro(size))
+    finally:
+        os.chdir(BASE_DIR)
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    run = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "stubs": used,
+            "quick": args.quick,
+            "concurrency": args.concurrency if args.suite != "micro" else None,
+            "duration": duration if args.suite != "micro" else None,
+            "mix": args.mix if args.suite != "micro" else None,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    print_results(results)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+    if baseline is not None:
+        regressions = compare(run, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nno regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
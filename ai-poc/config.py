@@ -1,7 +1,157 @@
 # Placeholder config - implementation removed per user request
+import os
+
 AI_SERVICE_HOST = "0.0.0.0"
 AI_SERVICE_PORT = 8001
 MODEL_NAME = "google/flan-t5-small"
 INDEX_PATH = "storage/indexes/faiss.index"
 STORAGE_DIR = "storage"
 
+# NER (spaCy)
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+# pipeline components not needed for entity extraction
+SPACY_DISABLED_PIPES = ["tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
+NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", "64"))
+NER_N_PROCESS = int(os.getenv("NER_N_PROCESS", "1"))
+
+# Search index
+# fold the incremental update log into a full index snapshot after this many entries
+INDEX_COMPACT_EVERY = int(os.getenv("INDEX_COMPACT_EVERY", "1000"))
+# index structure for full rebuilds: flat | ivf | ivfpq | hnsw
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+INDEX_NLIST = int(os.getenv("INDEX_NLIST", "1024"))
+INDEX_PQ_M = int(os.getenv("INDEX_PQ_M", "16"))
+INDEX_PQ_NBITS = int(os.getenv("INDEX_PQ_NBITS", "8"))
+INDEX_HNSW_M = int(os.getenv("INDEX_HNSW_M", "32"))
+INDEX_HNSW_EF_CONSTRUCTION = int(os.getenv("INDEX_HNSW_EF_CONSTRUCTION", "200"))
+# default per-query search effort (overridable per request)
+INDEX_NPROBE = int(os.getenv("INDEX_NPROBE", "16"))
+INDEX_EF_SEARCH = int(os.getenv("INDEX_EF_SEARCH", "64"))
+# max vectors used to train IVF centroids / PQ codebooks
+INDEX_TRAIN_SAMPLE = int(os.getenv("INDEX_TRAIN_SAMPLE", "100000"))
+# memory-map the index file on load instead of reading it into RAM
+INDEX_MMAP = os.getenv("INDEX_MMAP", "1") == "1"
+# how often a worker checks storage/indexes/CURRENT and the update log for changes made by its siblings
+INDEX_SYNC_INTERVAL_SECONDS = float(os.getenv("INDEX_SYNC_INTERVAL_SECONDS", "1.0"))
+# published snapshots kept on disk (older ones are deleted)
+INDEX_KEEP_SNAPSHOTS = int(os.getenv("INDEX_KEEP_SNAPSHOTS", "2"))
+
+# Embeddings
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# torch | onnx | onnx-int8 (see utils/embeddings.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# quantized export used by onnx-int8; the model repo ships avx2/avx512/arm64 variants
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+# intra-op threads for the embedding runtime; 0 keeps its default (all cores)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") == "1"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "storage/cache/embeddings")
+
+# OCR
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+OCR_MAX_INFLIGHT_PAGES = int(os.getenv("OCR_MAX_INFLIGHT_PAGES", str(2 * max(OCR_WORKERS, 1))))
+# resolution used to rasterize PDF pages that have no text layer
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", "300"))
+# rescale/grayscale/binarize/deskew pages before tesseract (utils/ocr_preprocess.py)
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "1") == "1"
+# pages with a known DPI are resampled to this; any page is shrunk to OCR_MAX_SIDE pixels
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "300"))
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "3500"))
+# largest skew (degrees) searched for when deskewing; 0 disables deskew
+OCR_DESKEW_MAX_ANGLE = float(os.getenv("OCR_DESKEW_MAX_ANGLE", "5"))
+# tesseract page segmentation mode: "auto" picks 3, 6 or 7 from the page layout
+OCR_PSM = os.getenv("OCR_PSM", "auto")
+# OCR text per page, keyed by a hash of the page pixels; empty disables the cache
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "storage/cache/ocr")
+
+# Uploads: streamed to disk in chunks; larger uploads get 413, other types 415
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(256 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+# types sniffed from the file's first bytes; text is decoded as-is by the OCR fallback
+UPLOAD_ALLOWED_TYPES = [t.strip() for t in os.getenv(
+    "UPLOAD_ALLOWED_TYPES", "pdf,png,jpeg,tiff,gif,bmp,webp,text").split(",") if t.strip()]
+# reuse the extraction of an earlier upload with the same SHA-256 instead of re-running OCR
+UPLOAD_DEDUPE = os.getenv("UPLOAD_DEDUPE", "1") == "1"
+
+# Executor stages: name -> (pool kind, workers, max queued calls beyond the workers)
+EXECUTOR_STAGES = {
+    "io": ("thread", int(os.getenv("STAGE_IO_WORKERS", "8")), int(os.getenv("STAGE_IO_QUEUE", "64"))),
+    # page-level OCR already fans out to the OCR process pool, so this stage only coordinates
+    "ocr": ("thread", int(os.getenv("STAGE_OCR_WORKERS", "4")), int(os.getenv("STAGE_OCR_QUEUE", "16"))),
+    "ner": ("process", int(os.getenv("STAGE_NER_WORKERS", "2")), int(os.getenv("STAGE_NER_QUEUE", "16"))),
+    # generation threads only wait on the in-process micro-batcher, which runs the model
+    "generate": ("thread", int(os.getenv("STAGE_GENERATE_WORKERS", "8")), int(os.getenv("STAGE_GENERATE_QUEUE", "16"))),
+    "index": ("thread", int(os.getenv("STAGE_INDEX_WORKERS", "2")), int(os.getenv("STAGE_INDEX_QUEUE", "32"))),
+}
+# seconds suggested to clients in Retry-After when a stage is full
+STAGE_RETRY_AFTER = int(os.getenv("STAGE_RETRY_AFTER", "2"))
+
+# Background extraction jobs
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "storage/jobs.db")
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "4"))
+# a running job whose worker has not checked in for this long is taken over by another
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+# Draft generation
+GENERATOR_MAX_PIPELINES = int(os.getenv("GENERATOR_MAX_PIPELINES", "2"))
+GENERATOR_MAX_BATCH = int(os.getenv("GENERATOR_MAX_BATCH", "8"))
+# how long a draft request waits for others to share its generate() call
+GENERATOR_MAX_WAIT_MS = float(os.getenv("GENERATOR_MAX_WAIT_MS", "20"))
+GENERATOR_RESULT_CACHE_SIZE = int(os.getenv("GENERATOR_RESULT_CACHE_SIZE", "256"))
+
+# HuggingFace Inference API
+HF_API_URL = os.getenv("HF_API_URL", "https://api-inference.huggingface.co")
+HF_CONNECT_TIMEOUT = float(os.getenv("HF_CONNECT_TIMEOUT", "5"))
+HF_READ_TIMEOUT = float(os.getenv("HF_READ_TIMEOUT", "60"))
+HF_MAX_RETRIES = int(os.getenv("HF_MAX_RETRIES", "2"))
+HF_POOL_SIZE = int(os.getenv("HF_POOL_SIZE", "10"))
+# consecutive failures before the remote backend is skipped, and for how long
+HF_BREAKER_FAILURES = int(os.getenv("HF_BREAKER_FAILURES", "3"))
+HF_BREAKER_RESET_SECONDS = float(os.getenv("HF_BREAKER_RESET_SECONDS", "30"))
+# when the HF API is configured but fails, also try the local model before the template
+HF_FALLBACK_LOCAL = os.getenv("HF_FALLBACK_LOCAL", "1") == "1"
+
+# Extraction/draft storage
+STORE_BACKEND = os.getenv("STORE_BACKEND", "sqlite")
+STORE_DB_PATH = os.getenv("STORE_DB_PATH", "storage/ai.db")
+
+# Passage chunking for the search index
+CHUNK_UNIT = os.getenv("CHUNK_UNIT", "tokens")  # tokens | sentences
+# window size and overlap, in CHUNK_UNITs (MiniLM truncates input at 256 word pieces);
+# the defaults depend on the unit: 128/32 tokens or 5/1 sentences
+_CHUNK_DEFAULTS = {"tokens": ("128", "32"), "sentences": ("5", "1")}
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", _CHUNK_DEFAULTS.get(CHUNK_UNIT, _CHUNK_DEFAULTS["tokens"])[0]))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", _CHUNK_DEFAULTS.get(CHUNK_UNIT, _CHUNK_DEFAULTS["tokens"])[1]))
+# vector ids reserve 12 bits for the chunk number
+CHUNK_MAX_PER_DOC = min(int(os.getenv("CHUNK_MAX_PER_DOC", "4096")), 4096)
+# chunk hits fetched per requested result before aggregating per extraction
+CHUNK_SEARCH_OVERSAMPLE = int(os.getenv("CHUNK_SEARCH_OVERSAMPLE", "4"))
+
+# Search: hybrid fuses BM25 and vector rankings; dense / bm25 use one of them
+SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid")
+# results taken from each ranking before reciprocal rank fusion
+SEARCH_FUSION_DEPTH = int(os.getenv("SEARCH_FUSION_DEPTH", "50"))
+SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", "60"))
+
+# In-memory caches for GET /search: query vectors and result lists (keyed by index version)
+SEARCH_QUERY_CACHE_SIZE = int(os.getenv("SEARCH_QUERY_CACHE_SIZE", "2048"))
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+
+# Observability
+# add a Server-Timing header with per-stage durations to every response
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "0") == "1"
+# dump sampled stacks for requests slower than this (0 disables the profiler)
+PROFILE_SLOW_REQUEST_MS = float(os.getenv("PROFILE_SLOW_REQUEST_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "storage/profiles")
+
+# Startup warm-up per component: eager (before serving) | background (after startup) | lazy
+WARMUP_MODES = {
+    "index": os.getenv("WARMUP_INDEX", "eager"),
+    "embeddings": os.getenv("WARMUP_EMBEDDINGS", "background"),
+    "spacy": os.getenv("WARMUP_SPACY", "background"),
+    "ocr": os.getenv("WARMUP_OCR", "background"),
+    "generator": os.getenv("WARMUP_GENERATOR", "lazy"),
+}
@@ -1,10 +1,14 @@
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, Request
+from typing import List, Optional
+from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uuid
 import os
 import sys
-import json
+import asyncio
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 
 # Ensure project root (ai-poc) is on sys.path so utils imports work when running via uvicorn
@@ -12,10 +16,51 @@ BASE_DIR = os.path.dirname(__file__)
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
-from utils.ocr import image_to_text
-from utils.ner import extract_entities
+from utils.executors import StageBusy, StageError, run_in_stage, shutdown_stages, stage_stats
+from utils.jobs import JobRunner, JobStore
+from utils.store import get_store
+from utils.uploads import UPLOADS, UploadRejected, copy_upload
+from utils import metrics, warmup
+from config import (
+    JOBS_DB_PATH,
+    JOB_CONCURRENCY,
+    JOB_LEASE_SECONDS,
+    METRICS_SERVER_TIMING,
+    PROFILE_SLOW_REQUEST_MS,
+    PROFILE_INTERVAL_MS,
+    PROFILE_DIR,
+    UPLOAD_DEDUPE,
+)
+
+_HTTP_SECONDS = metrics.histogram("ai_http_request_duration_seconds", "HTTP request latency.",
+                                  ["method", "route", "status"])
+
+profiler = None
+if PROFILE_SLOW_REQUEST_MS > 0:
+    from utils.profiler import SlowRequestProfiler
+    profiler = SlowRequestProfiler(PROFILE_SLOW_REQUEST_MS, PROFILE_INTERVAL_MS,
+                                   PROFILE_DIR if os.path.isabs(PROFILE_DIR) else os.path.join(BASE_DIR, PROFILE_DIR))
+
 
-app = FastAPI(title="ai-poc")
+@asynccontextmanager
+async def lifespan(app):
+    if profiler is not None:
+        profiler.start()
+    # eager components load before the first request; background ones after startup
+    warmup_task = await warmup.start()
+    await job_runner.start()
+    yield
+    await job_runner.stop()
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+        # retrieve the cancellation so it is not logged as an unretrieved exception
+        await asyncio.gather(warmup_task, return_exceptions=True)
+    shutdown_stages()
+    if profiler is not None:
+        profiler.stop()
+
+
+app = FastAPI(title="ai-poc", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,8 +68,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Document-Id"],
 )
 
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    """Request latency histogram, optional Server-Timing header and slow-request profiles."""
+    timings, token = metrics.start_request()
+    started = profiler.begin() if profiler is not None else None
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        seconds = time.perf_counter() - start
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        _HTTP_SECONDS.observe(seconds, method=request.method, route=path, status=str(status))
+        metrics.end_request(token)
+        if profiler is not None:
+            profiler.end(started, f"{request.method} {path}")
+    if METRICS_SERVER_TIMING:
+        response.headers["Server-Timing"] = metrics.server_timing(timings + [("total", seconds)])
+    return response
+
 ROOT_DIR = os.path.dirname(__file__)
 STORAGE_DIR = os.path.join(ROOT_DIR, "storage")
 EXTRACTS_DIR = os.path.join(STORAGE_DIR, "extracts")
@@ -37,106 +106,409 @@ os.makedirs(EXTRACTIONS_JSON_DIR, exist_ok=True)
 os.makedirs(AI_DOCUMENTS_DIR, exist_ok=True)
 
 
+def _load_extraction(extraction_id):
+    """Return an extraction record from the store, or None if it does not exist."""
+    store = get_store()
+    record = store.get_extraction(extraction_id)
+    if record is None:
+        # the backend still writes FIR extractions straight into ai_extractions/ as JSON
+        record = store.import_json_file(os.path.join(EXTRACTIONS_JSON_DIR, f"{extraction_id}.json"))
+    return record
+
+
+def _load_draft(doc_id):
+    store = get_store()
+    record = store.get_draft(doc_id)
+    if record is None:
+        # drafts written before the store existed
+        record = store.import_json_file(os.path.join(AI_DOCUMENTS_DIR, f"{doc_id}.json"), kind="draft")
+    return record
+
+
+def _rebuild_index():
+    from utils.faiss_index import build_index
+    store = get_store()
+    # pick up JSON records written directly by the backend since the last sync
+    store.import_json_dir(EXTRACTIONS_JSON_DIR)
+    return build_index(store.iter_extractions())
+
+
+def _stage_error_response(e):
+    return JSONResponse({"success": False, "error": str(e), "stage": e.stage},
+                        status_code=e.status_code, headers={"Retry-After": str(e.retry_after)})
+
+
+def _upload_error_response(e):
+    return JSONResponse({"success": False, "error": str(e)}, status_code=e.status_code)
+
+
+async def _save_upload(file: UploadFile):
+    """Stream an upload into EXTRACTS_DIR. Returns (file_id, filename, sha256).
+    Raises UploadTooLarge / UnsupportedUpload."""
+    file_id = str(uuid.uuid4())
+    # keep client-supplied path components out of the stored name
+    filename = f"{file_id}-{os.path.basename(file.filename or 'upload')}"
+    with metrics.timed("upload_write"):
+        _, sha256, _ = await run_in_stage("io", copy_upload, file.file, os.path.join(EXTRACTS_DIR, filename))
+    return file_id, filename, sha256
+
+
+def _reuse_extraction(sha256, file_id, filename, caseId):
+    """Extraction for an earlier upload with the same content, or None. An upload for a
+    different case gets its own copy of the record, without re-running OCR or NER."""
+    store = get_store()
+    previous_id = store.get_upload_hash(sha256)
+    previous = store.get_extraction(previous_id) if previous_id else None
+    if previous is None:
+        return None
+    UPLOADS.inc(result="duplicate")
+    if previous.get("caseId") == caseId:
+        os.remove(os.path.join(EXTRACTS_DIR, filename))
+        return previous
+    extraction = dict(previous, id=file_id, caseId=caseId, sourceFile=filename, duplicateOf=previous["id"],
+                      createdAt=datetime.utcnow().isoformat() + "Z")
+    store.put_extraction(extraction)
+    return extraction
+
+
+async def _no_stage(name):
+    pass
+
+
+async def _run_extraction(file_id, filename, sha256, caseId, enter_stage=_no_stage, run=run_in_stage):
+    """OCR + NER + redaction for a stored upload; writes and returns the extraction record.
+    With UPLOAD_DEDUPE, an upload seen before returns (a copy of) its earlier extraction."""
+    # imported here so PIL/pytesseract/pdfplumber stay out of service startup
+    from utils.ocr import image_to_text
+    from utils.ner import extract_entities
+
+    if UPLOAD_DEDUPE and sha256:
+        extraction = await run("io", _reuse_extraction, sha256, file_id, filename, caseId)
+        if extraction is not None:
+            return extraction
+
+    # OCR reads the stored file through mmap rather than a bytes copy
+    await enter_stage("ocr")
+    with metrics.timed("ocr"):
+        text = await run("ocr", image_to_text, os.path.join(EXTRACTS_DIR, filename))
+
+    # NER + redaction
+    await enter_stage("ner")
+    with metrics.timed("ner"):
+        ner_result = await run("ner", extract_entities, text)
+
+    extraction = {
+        "id": file_id,
+        "caseId": caseId,
+        "sourceFile": filename,
+        "extractedText": text,
+        "redactedText": ner_result.get("redactedText", ""),
+        "redactions": ner_result.get("redactions", []),
+        "entities": ner_result.get("entities", {}),
+        "confidence": ner_result.get("confidence", 0.0),
+        "createdAt": datetime.utcnow().isoformat() + "Z",
+    }
+
+    await enter_stage("save")
+    with metrics.timed("save"):
+        await run("io", get_store().put_extraction, extraction)
+        if sha256:
+            await run("io", get_store().put_upload_hash, sha256, file_id, os.path.getsize(
+                os.path.join(EXTRACTS_DIR, filename)))
+    UPLOADS.inc(result="extracted")
+    return extraction
+
+
+async def _run_in_stage_waiting(name, fn, *args):
+    """Like run_in_stage, but background jobs wait for capacity instead of failing."""
+    while True:
+        try:
+            return await run_in_stage(name, fn, *args)
+        except StageBusy as e:
+            await asyncio.sleep(e.retry_after)
+
+
+async def _handle_ocr_job(job, enter_stage):
+    payload = job["payload"]
+    extraction = await _run_extraction(payload["fileId"], payload["sourceFile"], payload.get("sha256"),
+                                       payload.get("caseId"), enter_stage=enter_stage, run=_run_in_stage_waiting)
+    return extraction["id"]
+
+
+job_store = JobStore(JOBS_DB_PATH if os.path.isabs(JOBS_DB_PATH) else os.path.join(ROOT_DIR, JOBS_DB_PATH))
+job_runner = JobRunner(job_store, _handle_ocr_job, JOB_CONCURRENCY, JOB_LEASE_SECONDS)
+
+
+def _job_view(job):
+    """Public shape of a job for polling clients."""
+    return {
+        "jobId": job["id"],
+        "batchId": job["batchId"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "timings": job["timings"],
+        "extractionId": job["resultId"],
+        "error": job["error"],
+        "createdAt": job["createdAt"],
+        "updatedAt": job["updatedAt"],
+    }
+
+
 @app.post("/ocr-extract")
 async def ocr_extract(file: UploadFile = File(...), caseId: str = Form(None)):
     """Accepts a file, saves it, runs OCR + NER, redacts PII, and saves JSON output."""
     try:
-        content = await file.read()
-        file_id = str(uuid.uuid4())
-        filename = f"{file_id}-{file.filename}"
-        out_path = os.path.join(EXTRACTS_DIR, filename)
+        file_id, filename, sha256 = await _save_upload(file)
+        extraction = await _run_extraction(file_id, filename, sha256, caseId)
+        data = {"extractionId": extraction["id"], "entities": extraction["entities"]}
+        if extraction["id"] != file_id:
+            data["duplicateOf"] = extraction["id"]
+        elif extraction.get("duplicateOf"):
+            data["duplicateOf"] = extraction["duplicateOf"]
+        return JSONResponse({"success": True, "data": data})
+    except UploadRejected as e:
+        return _upload_error_response(e)
+    except StageError as e:
+        return _stage_error_response(e)
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
 
-        with open(out_path, "wb") as f:
-            f.write(content)
 
-        # OCR
-        text = image_to_text(content)
+@app.post("/jobs/ocr-extract")
+async def submit_ocr_job(file: UploadFile = File(...), caseId: str = Form(None)):
+    """Queue an OCR + NER extraction and return a job id immediately. Poll GET /jobs/{jobId}."""
+    try:
+        file_id, filename, sha256 = await _save_upload(file)
+        payload = {"fileId": file_id, "sourceFile": filename, "sha256": sha256, "caseId": caseId}
+        job = await run_in_stage("io", job_store.create, "ocr-extract", payload)
+        job_runner.enqueue(job["id"])
+        return JSONResponse({"success": True, "data": _job_view(job)}, status_code=202)
+    except UploadRejected as e:
+        return _upload_error_response(e)
+    except StageError as e:
+        return _stage_error_response(e)
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
 
-        # NER + redaction
-        ner_result = extract_entities(text)
 
-        extraction = {
-            "id": file_id,
-            "caseId": caseId,
-            "sourceFile": filename,
-            "extractedText": text,
-            "redactedText": ner_result.get("redactedText", ""),
-            "entities": ner_result.get("entities", {}),
-            "confidence": ner_result.get("confidence", 0.0),
-            "createdAt": datetime.utcnow().isoformat() + "Z",
-        }
+def _discard_batch(saved, jobs):
+    for job in jobs:
+        job_store.update(job["id"], status="failed", stage="failed", error="Batch submission failed")
+    for _, filename, _ in saved:
+        try:
+            os.remove(os.path.join(EXTRACTS_DIR, filename))
+        except OSError:
+            pass
 
-        out_json_path = os.path.join(EXTRACTIONS_JSON_DIR, f"{file_id}.json")
-        with open(out_json_path, "w", encoding="utf-8") as jf:
-            json.dump(extraction, jf, ensure_ascii=False, indent=2)
 
-        return JSONResponse({"success": True, "data": {"extractionId": file_id, "entities": extraction["entities"]}})
+@app.post("/jobs/ocr-extract/batch")
+async def submit_ocr_batch(files: List[UploadFile] = File(...), caseId: str = Form(None)):
+    """Queue one extraction job per uploaded file; jobs run concurrently. Poll GET /jobs/batch/{batchId}."""
+    try:
+        batch_id = str(uuid.uuid4())
+        # store every file and create every job before queueing any, so a rejected file or a
+        # full io stage fails the whole batch without leaving files or jobs behind
+        saved = []
+        jobs = []
+        try:
+            for file in files:
+                saved.append(await _save_upload(file))
+            for file_id, filename, sha256 in saved:
+                payload = {"fileId": file_id, "sourceFile": filename, "sha256": sha256, "caseId": caseId}
+                jobs.append(await run_in_stage("io", job_store.create, "ocr-extract", payload, batch_id))
+        except BaseException:
+            await asyncio.to_thread(_discard_batch, saved, jobs)
+            raise
+        for job in jobs:
+            job_runner.enqueue(job["id"])
+        return JSONResponse({"success": True, "data": {"batchId": batch_id, "jobs": [_job_view(j) for j in jobs]}},
+                            status_code=202)
+    except UploadRejected as e:
+        return _upload_error_response(e)
+    except StageError as e:
+        return _stage_error_response(e)
     except Exception as e:
         return JSONResponse({"success": False, "error": str(e)}, status_code=500)
 
 
+@app.get("/jobs/batch/{batch_id}")
+async def get_job_batch(batch_id: str):
+    try:
+        jobs = await run_in_stage("io", job_store.list_batch, batch_id)
+    except StageError as e:
+        return _stage_error_response(e)
+    if not jobs:
+        return JSONResponse({"success": False, "error": "Batch not found"}, status_code=404)
+    done = sum(1 for j in jobs if j["status"] in ("done", "failed"))
+    return JSONResponse({"success": True, "data": {
+        "batchId": batch_id, "total": len(jobs), "finished": done, "jobs": [_job_view(j) for j in jobs]}})
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    try:
+        job = await run_in_stage("io", job_store.get, job_id)
+    except StageError as e:
+        return _stage_error_response(e)
+    if job is None:
+        return JSONResponse({"success": False, "error": "Job not found"}, status_code=404)
+    return JSONResponse({"success": True, "data": _job_view(job)})
+
+
+@app.get("/extractions")
+async def list_extractions(caseId: str = None, since: float = None):
+    """List extractions for a case (?caseId=...) or those changed after a unix timestamp (?since=...)."""
+    if caseId is None and since is None:
+        return JSONResponse({"success": False, "error": "Query parameter 'caseId' or 'since' is required"},
+                            status_code=400)
+    store = get_store()
+    try:
+        if caseId is not None:
+            data = await run_in_stage("io", store.list_extractions_by_case, caseId)
+        else:
+            data = await run_in_stage("io", store.extractions_changed_since, since)
+    except StageError as e:
+        return _stage_error_response(e)
+    return JSONResponse({"success": True, "data": data})
+
+
 @app.get("/extractions/{extraction_id}")
 async def get_extraction(extraction_id: str):
-    path = os.path.join(EXTRACTIONS_JSON_DIR, f"{extraction_id}.json")
-    if not os.path.exists(path):
+    try:
+        data = await run_in_stage("io", _load_extraction, extraction_id)
+    except StageError as e:
+        return _stage_error_response(e)
+    if data is None:
         return JSONResponse({"success": False, "error": "Extraction not found"}, status_code=404)
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
     return JSONResponse({"success": True, "data": data})
 
 
+async def _draft_source(text, extractionId):
+    """Resolve draft input. Returns (source_text, case_id, extraction_id, error_response)."""
+    if extractionId:
+        data = await run_in_stage("io", _load_extraction, extractionId)
+        if data is None:
+            return None, None, None, JSONResponse({"success": False, "error": "Extraction not found"}, status_code=404)
+        source_text, case_id, source_extraction_id = (
+            data.get('redactedText') or data.get('extractedText'), data.get('caseId'), extractionId)
+    else:
+        source_text, case_id, source_extraction_id = text, None, None
+    if not source_text:
+        return None, None, None, JSONResponse({"success": False, "error": "No input text or extraction provided"}, status_code=400)
+    return source_text, case_id, source_extraction_id, None
+
+
+_STREAM_END = object()
+_draft_streams = set()  # running streamed generations, kept referenced until they finish
+
+
+def _draft_record(doc_id, case_id, extraction_id, draft, model_info, prompt, status='DRAFT'):
+    return {
+        'id': doc_id,
+        'caseId': case_id,
+        'extractionId': extraction_id,
+        'documentType': 'CHARGE_SHEET',
+        'draftText': draft,
+        'status': status,
+        'modelInfo': model_info,
+        'prompt': prompt,
+        'createdAt': datetime.utcnow().isoformat() + 'Z'
+    }
+
+
 @app.post('/generate-draft')
 async def generate_draft(text: str = Form(None), extractionId: str = Form(None), model: str = Form(None)):
     """Generate a draft given raw text or an existing extractionId. Saves draft JSON to output."""
     try:
-        source_text = text
-        case_id = None
-        source_extraction_id = None
-        if extractionId:
-            path = os.path.join(EXTRACTIONS_JSON_DIR, f"{extractionId}.json")
-            if not os.path.exists(path):
-                return JSONResponse({"success": False, "error": "Extraction not found"}, status_code=404)
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            source_text = data.get('redactedText') or data.get('extractedText')
-            case_id = data.get('caseId')
-            source_extraction_id = extractionId
-
-        if not source_text:
-            return JSONResponse({"success": False, "error": "No input text or extraction provided"}, status_code=400)
+        source_text, case_id, source_extraction_id, error = await _draft_source(text, extractionId)
+        if error is not None:
+            return error
 
         from utils.generator import generate_draft_from_text
 
-        result = generate_draft_from_text(source_text, model)
+        with metrics.timed("generate"):
+            result = await run_in_stage("generate", generate_draft_from_text, source_text, model)
         doc_id = str(uuid.uuid4())
-        doc = {
-            'id': doc_id,
-            'caseId': case_id,
-            'extractionId': source_extraction_id,
-            'documentType': 'CHARGE_SHEET',
-            'draftText': result.get('draft'),
-            'status': 'DRAFT',
-            'modelInfo': result.get('modelInfo'),
-            'prompt': result.get('prompt'),
-            'createdAt': datetime.utcnow().isoformat() + 'Z'
-        }
-
-        out_path = os.path.join(AI_DOCUMENTS_DIR, f"{doc_id}.json")
-        with open(out_path, 'w', encoding='utf-8') as jf:
-            json.dump(doc, jf, ensure_ascii=False, indent=2)
+        doc = _draft_record(doc_id, case_id, source_extraction_id, result.get('draft'),
+                            result.get('modelInfo'), result.get('prompt'))
+
+        with metrics.timed("save"):
+            await run_in_stage("io", get_store().put_draft, doc)
 
         return JSONResponse({"success": True, "data": {"documentId": doc_id, "draft": doc['draftText']}})
+    except StageError as e:
+        return _stage_error_response(e)
     except Exception as e:
         return JSONResponse({"success": False, "error": str(e)}, status_code=500)
 
 
+@app.post('/generate-draft/stream')
+async def generate_draft_stream(text: str = Form(None), extractionId: str = Form(None), model: str = Form(None)):
+    """Stream a draft as plain text while it is generated. Generation runs on the generate
+    stage and finishes even if the client disconnects; the draft is then saved (as PARTIAL
+    if generation failed midway). Its id is returned up front in the X-Document-Id header."""
+    try:
+        source_text, case_id, source_extraction_id, error = await _draft_source(text, extractionId)
+    except StageError as e:
+        return _stage_error_response(e)
+    if error is not None:
+        return error
+
+    from utils.generator import stream_draft_from_text
+
+    doc_id = str(uuid.uuid4())
+    loop = asyncio.get_running_loop()
+    pieces = asyncio.Queue()
+
+    def _generate():
+        info = {}
+        text_so_far = []
+        status = 'PARTIAL'
+        try:
+            for piece in stream_draft_from_text(source_text, model, info):
+                text_so_far.append(piece)
+                loop.call_soon_threadsafe(pieces.put_nowait, piece)
+            status = 'DRAFT'
+        finally:
+            if text_so_far:
+                doc = _draft_record(doc_id, case_id, source_extraction_id, "".join(text_so_far).strip(),
+                                    info.get('modelInfo'), info.get('prompt'), status)
+                get_store().put_draft(doc)
+
+    # the task holds a generate-stage slot for the whole stream; the queue is not tied to
+    # the response, so a disconnect does not stop generation or the save
+    task = asyncio.ensure_future(run_in_stage("generate", _generate))
+    _draft_streams.add(task)
+    task.add_done_callback(_draft_streams.discard)
+    task.add_done_callback(lambda _: pieces.put_nowait(_STREAM_END))
+
+    first = await pieces.get()
+    if first is _STREAM_END and task.exception() is not None:
+        e = task.exception()
+        if isinstance(e, StageError):
+            return _stage_error_response(e)
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+    async def _stream(piece):
+        while piece is not _STREAM_END:
+            yield piece
+            piece = await pieces.get()
+        if task.exception() is not None:
+            # abort the response so the client sees an incomplete body
+            raise task.exception()
+
+    return StreamingResponse(_stream(first), media_type="text/plain; charset=utf-8",
+                             headers={"X-Document-Id": doc_id})
+
+
 @app.get('/drafts/{doc_id}')
 async def get_draft(doc_id: str):
-    path = os.path.join(AI_DOCUMENTS_DIR, f"{doc_id}.json")
-    if not os.path.exists(path):
+    try:
+        data = await run_in_stage("io", _load_draft, doc_id)
+    except StageError as e:
+        return _stage_error_response(e)
+    if data is None:
         return JSONResponse({"success": False, "error": "Draft not found"}, status_code=404)
-    with open(path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
     return JSONResponse({"success": True, "data": data})
 
 
@@ -145,46 +517,142 @@ async def rebuild_index():
     """Rebuild FAISS index from extraction JSONs in output dir."""
     try:
         # lazy import to avoid startup cost
-        from utils.faiss_index import build_index
-        n = build_index(EXTRACTIONS_JSON_DIR)
+        n = await run_in_stage("index", _rebuild_index)
         return JSONResponse({"success": True, "indexed": n})
+    except StageError as e:
+        return _stage_error_response(e)
     except Exception as e:
         return JSONResponse({"success": False, "error": str(e)}, status_code=500)
 
 
 @app.post('/index/doc/{extraction_id}')
 async def index_single_document(extraction_id: str):
-    """Index a single extraction document by id. For now, this triggers a full rebuild but is exposed for future incremental upserts."""
+    """Index (or re-index) a single extraction document by id without rebuilding the whole index."""
     try:
         # verify file exists
-        path = os.path.join(EXTRACTIONS_JSON_DIR, f"{extraction_id}.json")
-        if not os.path.exists(path):
+        data = await run_in_stage("io", _load_extraction, extraction_id)
+        if data is None:
             return JSONResponse({"success": False, "error": "Extraction not found"}, status_code=404)
-        # For now reuse bulk builder (simple and reliable)
-        from utils.faiss_index import build_index
-        n = build_index(EXTRACTIONS_JSON_DIR)
-        return JSONResponse({"success": True, "indexed": n, "indexedId": extraction_id})
+        from utils.faiss_index import upsert_document
+        indexed = await run_in_stage("index", upsert_document, data)
+        return JSONResponse({"success": True, "indexed": 1 if indexed else 0, "indexedId": extraction_id})
+    except StageError as e:
+        return _stage_error_response(e)
     except Exception as e:
         return JSONResponse({"success": False, "error": str(e)}, status_code=500)
 
 
+@app.delete('/index/doc/{extraction_id}')
+async def remove_indexed_document(extraction_id: str):
+    """Remove a single extraction document from the search index."""
+    try:
+        from utils.faiss_index import remove_document
+        removed = await run_in_stage("index", remove_document, extraction_id)
+        return JSONResponse({"success": True, "removed": 1 if removed else 0, "removedId": extraction_id})
+    except StageError as e:
+        return _stage_error_response(e)
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
+@app.get('/embeddings/cache')
+async def embedding_cache_stats():
+    """Hit/miss counters and size of the on-disk embedding cache."""
+    from utils.embeddings import cache_stats
+    return JSONResponse({"success": True, "data": cache_stats()})
+
+
 @app.get('/health')
 async def health():
     """Health check endpoint for service availability monitoring"""
     return JSONResponse({"status": "healthy", "service": "ai-poc"})
 
 
+@app.get('/ready')
+async def ready():
+    """Readiness: 503 until every eager/background warm-up has finished. Reports each
+    component's state (lazy/pending/loading/ready/failed) and load time."""
+    is_ready, components = warmup.readiness()
+    degraded = [name for name, c in components.items() if c["state"] == "failed"]
+    return JSONResponse({"ready": is_ready, "degraded": degraded, "components": components},
+                        status_code=200 if is_ready else 503)
+
+
+@app.get('/metrics')
+async def metrics_endpoint():
+    """Prometheus text exposition of this worker's counters and histograms."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get('/stages')
+async def stages():
+    """In-flight and capacity counters for each executor stage."""
+    return JSONResponse({"success": True, "data": stage_stats()})
+
+
 @app.get('/search')
-async def search(q: str = None, k: int = 5):
-    """Search extractions for query text. Use GET /search?q=...&k=5"""
+async def search(q: str = None, k: int = 5, nprobe: int = None, efSearch: int = None, mode: str = None,
+                 caseId: str = None, section: str = None, dateFrom: str = None, dateTo: str = None):
+    """Search extractions for query text. Use GET /search?q=...&k=5
+    Optional nprobe (IVF indexes) / efSearch (HNSW) trade recall for latency.
+    mode: hybrid (default), dense or bm25. caseId, section (e.g. 'IPC 302') and
+    dateFrom/dateTo (YYYY-MM-DD) restrict results before ranking."""
     if not q:
         return JSONResponse({"success": False, "error": "Query parameter 'q' is required"}, status_code=400)
     try:
-        from utils.faiss_index import search_index, index_exists
+        from utils.faiss_index import search_index, index_exists, SEARCH_MODES
+        if mode and mode not in SEARCH_MODES:
+            return JSONResponse({"success": False, "error": f"mode must be one of {', '.join(SEARCH_MODES)}"},
+                                status_code=400)
         if not index_exists():
             return JSONResponse({"success": False, "error": "Index not found. POST /index to build it."}, status_code=404)
-        res = search_index(q, k)
+        filters = {"caseId": caseId, "section": section, "dateFrom": dateFrom, "dateTo": dateTo}
+        res = await run_in_stage("index", search_index, q, k, nprobe, efSearch, mode, filters)
         return JSONResponse({"success": True, "data": res})
+    except StageError as e:
+        return _stage_error_response(e)
     except Exception as e:
         return JSONResponse({"success": False, "error": str(e)}, status_code=500)
 
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    k: int = 5
+    nprobe: Optional[int] = None
+    efSearch: Optional[int] = None
+    mode: Optional[str] = None
+    caseId: Optional[str] = None
+    section: Optional[str] = None
+    dateFrom: Optional[str] = None
+    dateTo: Optional[str] = None
+
+
+@app.post('/search/batch')
+async def search_batch_endpoint(body: BatchSearchRequest):
+    """Run many queries in one call: one embedding batch and one index search for all of them.
+    Takes the same options as GET /search (applied to every query); returns one result list per query."""
+    queries = [q for q in body.queries if q]
+    if not queries:
+        return JSONResponse({"success": False, "error": "'queries' must contain at least one query"}, status_code=400)
+    try:
+        from utils.faiss_index import search_batch, index_exists, SEARCH_MODES
+        if body.mode and body.mode not in SEARCH_MODES:
+            return JSONResponse({"success": False, "error": f"mode must be one of {', '.join(SEARCH_MODES)}"},
+                                status_code=400)
+        if not index_exists():
+            return JSONResponse({"success": False, "error": "Index not found. POST /index to build it."}, status_code=404)
+        filters = {"caseId": body.caseId, "section": body.section, "dateFrom": body.dateFrom, "dateTo": body.dateTo}
+        res = await run_in_stage("index", search_batch, queries, body.k, body.nprobe, body.efSearch, body.mode, filters)
+        return JSONResponse({"success": True, "data": [{"query": q, "results": r} for q, r in zip(queries, res)]})
+    except StageError as e:
+        return _stage_error_response(e)
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
+@app.get('/search/cache')
+async def search_cache():
+    """Hit rates of the query-vector and result caches, and search latency by cache outcome."""
+    from utils.faiss_index import search_cache_stats
+    return JSONResponse({"success": True, "data": search_cache_stats()})
+
@@ -2,10 +2,9 @@ from fastapi.testclient import TestClient
 import io
 import json
 
-import importlib.util, sys
-spec=importlib.util.spec_from_file_location('main','d:\\Mohil\\-NyayaSankalan---CMS-main\\-NyayaSankalan---CMS\\ai-poc\\main.py')
-main = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(main)
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import main
 
 client = TestClient(main.app)
 
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# make ai-poc modules (config, utils) importable when running pytest from the repo root
+AI_POC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if AI_POC_DIR not in sys.path:
+    sys.path.insert(0, AI_POC_DIR)
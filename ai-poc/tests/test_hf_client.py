@@ -0,0 +1,154 @@
+"""HFClient against a local stub of the HuggingFace Inference API."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils.hf_client import CircuitBreaker, CircuitOpenError, HFClient, HFRequestError
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server.requests.append({"path": self.path, "body": body, "auth": self.headers.get("Authorization"),
+                                "port": self.client_address[1]})
+        status = server.statuses.pop(0) if server.statuses else 200
+        if status != 200:
+            self._send(status, b'{"error": "unavailable"}', "application/json")
+        elif body.get("stream"):
+            events = "".join(
+                f'data: {json.dumps({"token": {"text": t, "special": False}})}\n\n' for t in ["Sum", "mary", ":"]
+            )
+            events += 'data: {"token": {"text": "</s>", "special": true}}\n\n'
+            self._send(200, events.encode(), "text/event-stream")
+        else:
+            self._send(200, json.dumps([{"generated_text": "Summary: ok"}]).encode(), "application/json")
+
+    def _send(self, status, payload, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.requests = []
+    server.statuses = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(server, **kwargs):
+    kwargs.setdefault("backoff_base", 0.01)
+    return HFClient(f"http://127.0.0.1:{server.server_address[1]}", "tok", **kwargs)
+
+
+def test_generate_returns_text_and_sends_token(stub):
+    client = _client(stub)
+    assert client.generate("prompt", "org/model", {"max_new_tokens": 8}) == "Summary: ok"
+    assert stub.requests[0]["path"] == "/models/org/model"
+    assert stub.requests[0]["auth"] == "Bearer tok"
+
+
+def test_generate_retries_transient_errors(stub):
+    stub.statuses = [503, 502]
+    client = _client(stub, max_retries=2)
+    assert client.generate("prompt", "m", {}) == "Summary: ok"
+    assert len(stub.requests) == 3
+
+
+def test_generate_does_not_retry_client_errors(stub):
+    stub.statuses = [400]
+    client = _client(stub, max_retries=3)
+    with pytest.raises(HFRequestError):
+        client.generate("prompt", "m", {})
+    assert len(stub.requests) == 1
+
+
+def test_circuit_opens_after_failures_and_skips_remote(stub):
+    stub.statuses = [503] * 4
+    client = _client(stub, max_retries=1, breaker=CircuitBreaker(failure_threshold=2, reset_after=60))
+    for _ in range(2):
+        with pytest.raises(HFRequestError):
+            client.generate("prompt", "m", {})
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.generate("prompt", "m", {})
+    assert len(stub.requests) == 4
+
+
+def test_half_open_trial_closes_circuit(stub):
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0)
+    stub.statuses = [503]
+    client = _client(stub, max_retries=0, breaker=breaker)
+    with pytest.raises(HFRequestError):
+        client.generate("prompt", "m", {})
+    assert client.generate("prompt", "m", {}) == "Summary: ok"
+    assert breaker.state == "closed"
+
+
+def test_client_errors_do_not_open_circuit(stub):
+    stub.statuses = [400, 400]
+    client = _client(stub, max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_after=60))
+    for _ in range(2):
+        with pytest.raises(HFRequestError):
+            client.generate("prompt", "m", {})
+    assert client.breaker.state == "closed"
+
+
+def test_auth_and_missing_model_errors_open_circuit(stub):
+    stub.statuses = [401, 404]
+    client = _client(stub, max_retries=2, breaker=CircuitBreaker(failure_threshold=2, reset_after=60))
+    for _ in range(2):
+        with pytest.raises(HFRequestError):
+            client.generate("prompt", "m", {})
+    # not retried, and the second failure opens the circuit
+    assert len(stub.requests) == 2
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.generate("prompt", "m", {})
+
+
+def test_unexpected_request_error_settles_half_open_trial(stub, monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0)
+    client = _client(stub, max_retries=2, breaker=breaker)
+
+    def broken(*args, **kwargs):
+        raise requests.exceptions.InvalidURL("bad url")
+
+    monkeypatch.setattr(client.session, "post", broken)
+    for _ in range(2):
+        # the second call is the half-open trial; it must not leave the trial in flight
+        with pytest.raises(HFRequestError):
+            client.generate("prompt", "m", {})
+    monkeypatch.undo()
+    assert client.generate("prompt", "m", {}) == "Summary: ok"
+    assert breaker.state == "closed"
+
+
+def test_stream_yields_tokens_and_skips_special(stub):
+    client = _client(stub)
+    assert list(client.stream("prompt", "m", {})) == ["Sum", "mary", ":"]
+    assert stub.requests[0]["body"]["stream"] is True
+
+
+def test_session_reuses_connection(stub):
+    client = _client(stub)
+    client.generate("a", "m", {})
+    client.generate("b", "m", {})
+    # keep-alive: both calls arrive on the same client connection
+    assert len({r["port"] for r in stub.requests}) == 1
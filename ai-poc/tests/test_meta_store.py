@@ -0,0 +1,79 @@
+"""MetaStore round trips against a plain dict of meta items."""
+import json
+import random
+
+from utils.meta_store import MetaStore
+
+
+def _item(vid, doc, rnd):
+    return {
+        "vid": vid,
+        "id": f"ext-{doc}",
+        "caseId": None if doc % 3 == 0 else f"case-{doc % 5}",
+        "sourceFile": None if doc % 4 == 0 else f"fir-{doc}.pdf",
+        "chunk": vid & 0xFFF,
+        "start": rnd.randint(0, 5000),
+        "end": rnd.randint(5000, 9000),
+        "snippet": "".join(rnd.choice("abc दर्ज ü ") for _ in range(rnd.randint(0, 40))),
+    }
+
+
+def _check(store, reference):
+    assert len(store) == len(reference)
+    for vid, item in reference.items():
+        assert vid in store
+        assert store.get(vid) == item
+        assert store.doc_id(vid) == item["id"]
+    vids = sorted(reference)
+    for lo, hi in [(0, 1 << 40), (vids[0], vids[0]), (vids[len(vids) // 3], vids[2 * len(vids) // 3])]:
+        assert store.vids_between(lo, hi) == [v for v in vids if lo <= v <= hi]
+
+
+def test_round_trip_with_updates(tmp_path):
+    rnd = random.Random(7)
+    reference = {}
+    for doc in range(40):
+        for chunk in range(rnd.randint(1, 4)):
+            vid = (doc << 20) | chunk
+            reference[vid] = _item(vid, doc, rnd)
+
+    path = str(tmp_path / "meta.bin")
+    MetaStore.from_items(list(reference.values())).save(path)
+    store = MetaStore.load(path)
+    _check(store, reference)
+
+    for round_no in range(3):
+        # replace some chunks, add new documents and drop others, in memory
+        changed = [_item(vid, vid >> 20, rnd) for vid in rnd.sample(sorted(reference), 10)]
+        added = [_item(((100 + round_no) << 20) | c, 100 + round_no, rnd) for c in range(3)]
+        store.upsert(changed + added)
+        reference.update({m["vid"]: m for m in changed + added})
+        removed = rnd.sample(sorted(reference), 8)
+        store.remove(removed + [123456789])  # unknown ids are ignored
+        for vid in removed:
+            del reference[vid]
+        assert store.get(removed[0]) is None
+        _check(store, reference)
+
+        path = str(tmp_path / f"meta-{round_no}.bin")
+        store.save(path)
+        store = MetaStore.load(path)
+        _check(store, reference)
+
+
+def test_empty_store(tmp_path):
+    path = str(tmp_path / "meta.bin")
+    MetaStore().save(path)
+    store = MetaStore.load(path)
+    assert len(store) == 0
+    assert store.get(1) is None and store.vids_between(0, 1 << 62) == []
+
+
+def test_load_meta_reads_legacy_json(tmp_path):
+    from utils.faiss_index import LEGACY_META_FILE, _load_meta
+
+    rnd = random.Random(3)
+    items = [_item((doc << 20) | c, doc, rnd) for doc in range(5) for c in range(2)]
+    with open(tmp_path / LEGACY_META_FILE, "w", encoding="utf-8") as f:
+        json.dump({"items": items}, f)
+    _check(_load_meta(str(tmp_path)), {m["vid"]: m for m in items})
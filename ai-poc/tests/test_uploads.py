@@ -0,0 +1,49 @@
+"""Upload sniffing and streaming copy."""
+import hashlib
+import io
+import os
+
+import pytest
+
+from utils.uploads import UnsupportedUpload, UploadRejected, UploadTooLarge, copy_upload, sniff
+
+
+def test_sniff_types():
+    assert sniff(b"%PDF-1.7\n...") == "pdf"
+    assert sniff(b"\x89PNG\r\n\x1a\n\x00\x00") == "png"
+    assert sniff(b"RIFF\x10\x00\x00\x00WEBPVP8 ") == "webp"
+    assert sniff("FIR दर्ज".encode("utf-8")) == "text"
+    assert sniff(b"\x00\x01binary") is None
+    assert sniff(b"") is None
+
+
+def test_sniff_accepts_utf8_cut_at_the_window_end():
+    head = "दर्ज".encode("utf-8")
+    # the last character's bytes are split by the sniff window
+    assert sniff(head[:-1]) == "text"
+    # an invalid byte in the middle is not text
+    assert sniff(b"abc\xff\xfedef") is None
+
+
+def test_copy_upload_writes_file_and_digest(tmp_path):
+    data = b"%PDF-1.4\n" + os.urandom(10000)
+    path = str(tmp_path / "doc.pdf")
+    size, sha256, kind = copy_upload(io.BytesIO(data), path, max_bytes=1 << 20, chunk_size=1024)
+    assert (size, sha256, kind) == (len(data), hashlib.sha256(data).hexdigest(), "pdf")
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert os.listdir(tmp_path) == ["doc.pdf"]
+
+
+@pytest.mark.parametrize("data, error, status", [
+    (b"%PDF-1.4\n" + b"x" * 5000, UploadTooLarge, 413),
+    (b"\x00\x01\x02 not a document", UnsupportedUpload, 415),
+    (b"", UploadRejected, 400),
+])
+def test_copy_upload_rejects_and_leaves_nothing(tmp_path, data, error, status):
+    path = str(tmp_path / "upload")
+    with pytest.raises(error) as info:
+        copy_upload(io.BytesIO(data), path, max_bytes=4096, chunk_size=512)
+    assert info.value.status_code == status
+    # neither the target nor its .part file is left behind
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,203 @@
+"""In-process BM25 inverted index over extraction text, with filter fields.
+
+Dense MiniLM vectors match paraphrases but are poor at exact tokens such as
+"IPC 302", case ids, phone fragments and names; BM25 covers those. Documents are
+whole extractions keyed by extraction id and can be added or removed one at a
+time. Each document also carries filter fields (caseId, IPC sections, dates)
+taken from the entities extract_entities produced.
+"""
+import math
+import pickle
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_SECTION_RE = re.compile(r"\d{1,4}")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def normalize_section(section) -> Optional[str]:
+    """'IPC 302', 'ipc302' and '302' all normalize to '302'."""
+    m = _SECTION_RE.search(str(section or ""))
+    if m is None:
+        return None
+    return m.group(0).lstrip("0") or "0"
+
+
+def record_fields(data: Dict) -> Dict:
+    """Filter fields of an extraction record: caseId, normalized IPC sections and ISO dates."""
+    entities = data.get("entities") or {}
+    sections = {normalize_section(s) for s in entities.get("sections") or []}
+    return {
+        "caseId": data.get("caseId"),
+        "sections": sorted(s for s in sections if s),
+        "dates": sorted({str(d)[:10] for d in entities.get("dates") or [] if d}),
+    }
+
+
+class BM25Index:
+    """Postings map term -> {doc slot: term frequency}. Each document gets an integer slot
+    so a query scores whole posting lists with numpy instead of a Python loop per hit."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> {slot: term frequency}
+        self.slots = {}  # doc id -> slot
+        self.doc_ids = []  # slot -> doc id (None once freed)
+        self.doc_terms = {}  # slot -> distinct terms, to undo its postings on remove
+        self.doc_len = np.zeros(1024, dtype=np.float32)  # slot -> number of tokens
+        self.fields = {}  # doc id -> record_fields()
+        self.total_len = 0
+        self._free = []
+        self._by_case = {}  # caseId -> doc ids
+        self._by_section = {}  # section -> doc ids
+        self._by_date = {}  # ISO date -> doc ids
+        self._arrays = {}  # term -> (slots, tfs) numpy copy of its postings, rebuilt on change
+
+    def __len__(self):
+        return len(self.slots)
+
+    def add(self, doc_id: str, text: str, fields: Optional[Dict] = None):
+        """Index doc_id, replacing any previous version of it."""
+        self.remove(doc_id)
+        slot = self._free.pop() if self._free else len(self.doc_ids)
+        if slot == len(self.doc_ids):
+            self.doc_ids.append(doc_id)
+        else:
+            self.doc_ids[slot] = doc_id
+        if slot >= len(self.doc_len):
+            self.doc_len = np.concatenate([self.doc_len, np.zeros(len(self.doc_len), dtype=np.float32)])
+        self.slots[doc_id] = slot
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[slot] = tf
+            self._arrays.pop(term, None)
+        self.doc_terms[slot] = list(counts)
+        length = sum(counts.values())
+        self.doc_len[slot] = length
+        self.total_len += length
+        fields = fields or {}
+        self.fields[doc_id] = fields
+        if fields.get("caseId"):
+            self._by_case.setdefault(fields["caseId"], set()).add(doc_id)
+        for s in fields.get("sections") or []:
+            self._by_section.setdefault(s, set()).add(doc_id)
+        for d in fields.get("dates") or []:
+            self._by_date.setdefault(d, set()).add(doc_id)
+
+    def remove(self, doc_id: str) -> bool:
+        slot = self.slots.pop(doc_id, None)
+        if slot is None:
+            return False
+        for term in self.doc_terms.pop(slot):
+            docs = self.postings[term]
+            del docs[slot]
+            if not docs:
+                del self.postings[term]
+            self._arrays.pop(term, None)
+        self.total_len -= int(self.doc_len[slot])
+        self.doc_len[slot] = 0
+        self.doc_ids[slot] = None
+        self._free.append(slot)
+        fields = self.fields.pop(doc_id)
+        if fields.get("caseId"):
+            _discard(self._by_case, fields["caseId"], doc_id)
+        for s in fields.get("sections") or []:
+            _discard(self._by_section, s, doc_id)
+        for d in fields.get("dates") or []:
+            _discard(self._by_date, d, doc_id)
+        return True
+
+    def filter(self, case_id: Optional[str] = None, section=None,
+               date_from: Optional[str] = None, date_to: Optional[str] = None) -> Optional[Set[str]]:
+        """Doc ids matching every given filter, or None when no filter is given.
+        Dates are ISO strings; a document matches if any of its dates is in range."""
+        allowed = None
+        if case_id:
+            allowed = set(self._by_case.get(case_id, ()))
+        if section:
+            docs = self._by_section.get(normalize_section(section), set())
+            allowed = set(docs) if allowed is None else allowed & docs
+        if date_from or date_to:
+            lo, hi = date_from or "0000-00-00", date_to or "9999-99-99"
+            # distinct dates are few next to documents
+            docs = set()
+            for date, ids in self._by_date.items():
+                if lo <= date <= hi:
+                    docs |= ids
+            allowed = docs if allowed is None else allowed & docs
+        return allowed
+
+    def _posting_arrays(self, term: str):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            docs = self.postings[term]
+            arrays = (np.fromiter(docs.keys(), dtype=np.int64, count=len(docs)),
+                      np.fromiter(docs.values(), dtype=np.float32, count=len(docs)))
+            self._arrays[term] = arrays
+        return arrays
+
+    def search(self, query: str, k: int, allowed: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """Top k (doc id, score) for query, restricted to allowed doc ids if given."""
+        n = len(self.slots)
+        if n == 0:
+            return []
+        avgdl = self.total_len / n
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        matched = np.zeros(len(self.doc_ids), dtype=bool)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            slots, tfs = self._posting_arrays(term)
+            idf = math.log(1 + (n - len(slots) + 0.5) / (len(slots) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[slots] / avgdl)
+            # a slot appears once per term, so fancy-index += is safe
+            scores[slots] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+            matched[slots] = True
+        if allowed is not None:
+            permitted = np.zeros(len(self.doc_ids), dtype=bool)
+            permitted[[self.slots[d] for d in allowed if d in self.slots]] = True
+            matched &= permitted
+        candidates = np.flatnonzero(matched)
+        if len(candidates) == 0:
+            return []
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.doc_ids[s], float(scores[s])) for s in top]
+
+    def save(self, path: str):
+        state = dict(self.__dict__, _arrays={})
+        with open(path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        index = cls()
+        with open(path, "rb") as f:
+            index.__dict__.update(pickle.load(f))
+        return index
+
+
+def _discard(groups: Dict[str, Set[str]], key: str, doc_id: str):
+    docs = groups.get(key)
+    if docs is not None:
+        docs.discard(doc_id)
+        if not docs:
+            del groups[key]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: each id scores sum(1 / (k + rank)) over the lists it appears in."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
@@ -0,0 +1,44 @@
+import re
+from typing import List, Tuple
+from config import CHUNK_UNIT, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_MAX_PER_DOC
+
+# a sentence ends at . ! ? followed by whitespace, or at a line break (OCR output is line-oriented)
+_SENTENCE_RE = re.compile(r"[^.!?\n]+(?:[.!?]+|\n|$)")
+_TOKEN_RE = re.compile(r"\S+")
+
+
+def _unit_spans(text: str, unit: str) -> List[Tuple[int, int]]:
+    pattern = _SENTENCE_RE if unit == "sentences" else _TOKEN_RE
+    spans = []
+    for m in pattern.finditer(text):
+        start, end = m.span()
+        # trim surrounding whitespace so offsets point at the passage itself
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            spans.append((start, end))
+    return spans
+
+
+def chunk_text(text: str, size: int = None, overlap: int = None, unit: str = None) -> List[Tuple[int, int]]:
+    """Split text into sliding windows of `size` units (sentences or whitespace tokens)
+    overlapping by `overlap` units. Returns (start, end) character offsets into text,
+    at most CHUNK_MAX_PER_DOC of them."""
+    size = size or CHUNK_SIZE
+    overlap = CHUNK_OVERLAP if overlap is None else overlap
+    unit = unit or CHUNK_UNIT
+    if overlap >= size:
+        raise ValueError("chunk overlap must be smaller than chunk size")
+    spans = _unit_spans(text or "", unit)
+    if not spans:
+        return []
+    chunks = []
+    step = size - overlap
+    for first in range(0, len(spans), step):
+        window = spans[first:first + size]
+        chunks.append((window[0][0], window[-1][1]))
+        if first + size >= len(spans) or len(chunks) >= CHUNK_MAX_PER_DOC:
+            break
+    return chunks
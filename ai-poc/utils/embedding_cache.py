@@ -0,0 +1,272 @@
+"""Persistent content-addressed cache of embedding vectors.
+
+Layout per model under EMBEDDING_CACHE_DIR/<model-slug>/:
+  vectors.f32  raw float32 rows, append-only, read through a memory map
+  index.log    append-only "key<TAB>row<TAB>last_used" lines; the last line per key wins
+  dim          vector dimension
+
+Keys are sha256 of the normalized text, so the same text is only embedded once
+per model across rebuilds and restarts. Run `python -m utils.embedding_cache compact`
+to evict old entries and reclaim space.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from typing import Dict, List
+
+import numpy as np
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EMBEDDING_CACHE_DIR
+from utils.locks import FileLock
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+CACHE_ROOT = os.path.join(BASE_DIR, EMBEDDING_CACHE_DIR)
+
+# only re-log an access if the recorded one is older than this, to keep index.log small
+_TOUCH_INTERVAL = 24 * 3600
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WS_RE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+def text_key(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, root: str = CACHE_ROOT):
+        self.model_name = model_name
+        self.dir = os.path.join(root, _slug(model_name))
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.index_path = os.path.join(self.dir, "index.log")
+        self.dim_path = os.path.join(self.dir, "dim")
+        self.lock_path = os.path.join(self.dir, "lock")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> [row, last_used]
+        self._dim = None
+        self._mmap = None
+        self._mmap_rows = 0
+        self._inode = None
+        self._index_offset = 0  # bytes of index.log read into _entries
+        os.makedirs(self.dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        self._entries = {}
+        self._index_offset = 0
+        self._mmap = None
+        self._inode = self._vectors_inode()
+        self._read_tail()
+
+    def _read_tail(self):
+        """Pick up dim and index.log lines appended since the last read, possibly by
+        another process. Lines are consumed up to the last complete one."""
+        if self._inode is None:
+            self._inode = self._vectors_inode()
+        if self._dim is None and os.path.exists(self.dim_path):
+            with open(self.dim_path, "r", encoding="utf-8") as f:
+                self._dim = int(f.read().strip() or 0) or None
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode("utf-8", errors="replace").splitlines():
+            parts = line.split("\t")
+            if len(parts) != 3:
+                continue  # torn write
+            self._entries[parts[0]] = [int(parts[1]), float(parts[2])]
+        self._index_offset += end
+
+    def _vectors_inode(self):
+        try:
+            return os.stat(self.vectors_path).st_ino
+        except FileNotFoundError:
+            return None
+
+    def _reload_if_compacted(self):
+        # compaction (possibly in another process) swaps in a new vector file and renumbers rows
+        if self._inode is not None and self._vectors_inode() != self._inode:
+            self._load()
+
+    def _rows_on_disk(self):
+        if not self._dim or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (self._dim * 4)
+
+    def _vectors(self):
+        rows = self._rows_on_disk()
+        if rows == 0:
+            return None
+        if self._mmap is None or self._mmap_rows != rows:
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim))
+            self._mmap_rows = rows
+        return self._mmap
+
+    def _file_lock(self):
+        return FileLock(self.lock_path)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return cached vectors for the keys that are present; counts hits and misses."""
+        now = time.time()
+        found = {}
+        touched = []
+        with self._lock:
+            self._reload_if_compacted()
+            if any(key not in self._entries for key in keys):
+                # another process may have added them since the index was last read
+                with self._file_lock():
+                    self._reload_if_compacted()
+                    self._read_tail()
+            vectors = self._vectors()
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or vectors is None or entry[0] >= len(vectors):
+                    self.misses += 1
+                    continue
+                found[key] = np.array(vectors[entry[0]])
+                self.hits += 1
+                if now - entry[1] > _TOUCH_INTERVAL:
+                    entry[1] = now
+                    touched.append((key, entry[0]))
+            if touched:
+                with self._file_lock():
+                    # rows are renumbered by a compaction; the touches are dropped then
+                    if self._vectors_inode() == self._inode:
+                        self._read_tail()
+                        self._append_index(touched, now)
+        return found
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(keys) == 0:
+            return
+        now = time.time()
+        with self._lock, self._file_lock():
+            self._reload_if_compacted()
+            self._read_tail()
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+                with open(self.dim_path, "w", encoding="utf-8") as f:
+                    f.write(str(self._dim))
+            if vectors.shape[1] != self._dim:
+                raise ValueError(f"cache for {self.model_name} holds {self._dim}-d vectors, got {vectors.shape[1]}")
+            # skip keys a sibling process stored while these were being embedded
+            new = [i for i, key in enumerate(keys) if key not in self._entries]
+            if not new:
+                return
+            start = self._rows_on_disk()
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors[new].tobytes())
+            if self._inode is None:
+                self._inode = self._vectors_inode()
+            added = []
+            for row, i in enumerate(new, start):
+                self._entries[keys[i]] = [row, now]
+                added.append((keys[i], row))
+            self._append_index(added, now)
+
+    def _append_index(self, rows, ts):
+        # callers hold the file lock and have read the tail, so this ends the log
+        with open(self.index_path, "ab") as f:
+            f.write("".join(f"{key}\t{row}\t{ts:.0f}\n" for key, row in rows).encode("utf-8"))
+            self._index_offset = f.tell()
+
+    @property
+    def dim(self):
+        """Vector dimension stored in this cache, or None while it is empty."""
+        return self._dim
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self._entries),
+            "rows": self._rows_on_disk(),
+            "bytes": os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": (self.hits / total) if total else 0.0,
+        }
+
+    def compact(self, max_entries: int = None, max_age_days: float = None):
+        """Evict least recently used entries beyond max_entries and entries not used for
+        max_age_days, then rewrite the vector file without dead rows. Returns (kept, evicted)."""
+        with self._lock, self._file_lock():
+            self._load()
+            vectors = self._vectors()
+            items = sorted(self._entries.items(), key=lambda kv: kv[1][1], reverse=True)
+            items = [kv for kv in items if vectors is not None and kv[1][0] < len(vectors)]
+            if max_age_days is not None:
+                cutoff = time.time() - max_age_days * 86400
+                items = [kv for kv in items if kv[1][1] >= cutoff]
+            if max_entries is not None:
+                items = items[:max_entries]
+            evicted = len(self._entries) - len(items)
+
+            tmp_vectors = self.vectors_path + ".tmp"
+            tmp_index = self.index_path + ".tmp"
+            entries = {}
+            with open(tmp_vectors, "wb") as vf, open(tmp_index, "w", encoding="utf-8") as inf:
+                for new_row, (key, (row, ts)) in enumerate(items):
+                    vf.write(np.ascontiguousarray(vectors[row]).tobytes())
+                    inf.write(f"{key}\t{new_row}\t{ts:.0f}\n")
+                    entries[key] = [new_row, ts]
+            self._mmap = None
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_index, self.index_path)
+            self._entries = entries
+            self._index_offset = os.path.getsize(self.index_path)
+            self._inode = self._vectors_inode()
+            return len(entries), evicted
+
+
+def _model_dirs(model):
+    if model:
+        return [model]
+    if not os.path.isdir(CACHE_ROOT):
+        return []
+    return sorted(os.listdir(CACHE_ROOT))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or compact the embedding cache.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_stats = sub.add_parser("stats", help="show entry counts and size per model")
+    p_stats.add_argument("--model")
+    p_compact = sub.add_parser("compact", help="evict old entries and reclaim space")
+    p_compact.add_argument("--model")
+    p_compact.add_argument("--max-entries", type=int)
+    p_compact.add_argument("--max-age-days", type=float)
+    args = parser.parse_args(argv)
+
+    for name in _model_dirs(args.model):
+        cache = EmbeddingCache(name)
+        if args.command == "compact":
+            kept, evicted = cache.compact(args.max_entries, args.max_age_days)
+            print(f"{name}: kept {kept}, evicted {evicted}")
+        else:
+            s = cache.stats()
+            print(f"{name}: {s['entries']} entries, {s['rows']} rows, {s['bytes']} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,27 +1,137 @@
+"""Sentence embeddings for indexing and search, with a selectable CPU runtime.
+
+EMBEDDING_BACKEND picks how EMBEDDING_MODEL runs:
+  torch      PyTorch (default)
+  onnx       ONNX Runtime export of the same model
+  onnx-int8  int8-quantized ONNX export (EMBEDDING_ONNX_FILE picks the file)
+
+The ONNX backends need sentence-transformers >= 3.2 with optimum[onnxruntime];
+if they cannot load, the torch backend is used and counted as a fallback. Each
+backend keeps its own embedding cache, since their vectors differ slightly.
+"""
+import logging
+
 from sentence_transformers import SentenceTransformer
 import numpy as np
+from config import (
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    EMBEDDING_ONNX_FILE,
+    EMBEDDING_THREADS,
+    EMBEDDING_BATCH_SIZE,
+)
+from utils import metrics
 
-_MODEL_NAME = "all-MiniLM-L6-v2"
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+_MODEL_NAME = EMBEDDING_MODEL
 _model = None
+_backend = EMBEDDING_BACKEND if EMBEDDING_BACKEND in BACKENDS else "torch"
+_cache = None
+
+
+def load_model(model_name: str, backend: str = "torch", threads: int = EMBEDDING_THREADS):
+    """Load model_name on backend with `threads` intra-op threads (0 keeps the runtime default)."""
+    if backend == "torch":
+        if threads > 0:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name)
+    model_kwargs = {"provider": "CPUExecutionProvider"}
+    if backend == "onnx-int8":
+        model_kwargs["file_name"] = EMBEDDING_ONNX_FILE
+    if threads > 0:
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        model_kwargs["session_options"] = options
+    return SentenceTransformer(model_name, backend="onnx", model_kwargs=model_kwargs)
 
 
 def _get_model():
-    global _model
+    global _model, _backend, _cache
     if _model is None:
-        _model = SentenceTransformer(_MODEL_NAME)
+        with metrics.model_load("embedding", f"{_MODEL_NAME} ({_backend})"):
+            try:
+                _model = load_model(_MODEL_NAME, _backend)
+            except Exception as e:
+                if _backend == "torch":
+                    raise
+                logger.warning("Embedding backend %s unavailable (%s); using torch", _backend, e)
+                metrics.fallback("embeddings", "backend_unavailable")
+                _backend, _cache = "torch", None
+                _model = load_model(_MODEL_NAME, "torch")
     return _model
 
 
-def embed_texts(texts):
-    """Return numpy array of shape (len(texts), dim) with float32 vectors (normalized)."""
-    if not texts:
-        return np.zeros((0, 384), dtype=np.float32)
+def cache_namespace() -> str:
+    # torch keeps the plain model name so caches filled before backends existed stay valid
+    return _MODEL_NAME if _backend == "torch" else f"{_MODEL_NAME}@{_backend}"
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        from utils.embedding_cache import EmbeddingCache
+        _cache = EmbeddingCache(cache_namespace())
+    return _cache
+
+
+def embedding_dim() -> int:
+    """Vector dimension of the model; read from the cache when the model is not loaded yet."""
+    if _model is None and EMBEDDING_CACHE_ENABLED and _get_cache().dim:
+        return _get_cache().dim
+    return int(_get_model().get_sentence_embedding_dimension())
+
+
+def model_info():
+    return {"model": _MODEL_NAME, "backend": _backend, "loaded": _model is not None,
+            "threads": EMBEDDING_THREADS, "batchSize": EMBEDDING_BATCH_SIZE}
+
+
+def _encode(texts):
     model = _get_model()
-    embs = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    with metrics.timed("embed"):
+        embs = model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE, convert_to_numpy=True,
+                            normalize_embeddings=True)
     return embs.astype(np.float32)
 
 
+def embed_texts(texts, use_cache=EMBEDDING_CACHE_ENABLED):
+    """Return numpy array of shape (len(texts), dim) with float32 vectors (normalized).
+    Vectors for previously seen text are served from the on-disk embedding cache."""
+    if not texts:
+        return np.zeros((0, embedding_dim()), dtype=np.float32)
+    if not use_cache:
+        return _encode(texts)
+
+    from utils.embedding_cache import normalize_text, text_key
+    normalized = [normalize_text(t) for t in texts]
+    keys = [text_key(n) for n in normalized]
+    if _backend != "torch":
+        # settle the backend first: an ONNX load that falls back to torch switches the cache namespace
+        _get_model()
+    found = _get_cache().get_many(keys)
+
+    # embed each distinct missing text once
+    missing = {}
+    for key, norm in zip(keys, normalized):
+        if key not in found and key not in missing:
+            missing[key] = norm
+    if missing:
+        vectors = _encode(list(missing.values()))
+        _get_cache().put_many(list(missing.keys()), vectors)
+        found.update(zip(missing.keys(), vectors))
+    return np.stack([found[k] for k in keys]).astype(np.float32)
+
+
 def embed_text(text):
     embs = embed_texts([text])
     return embs[0] if len(embs) else None
 
+
+def cache_stats():
+    return _get_cache().stats() if EMBEDDING_CACHE_ENABLED else None
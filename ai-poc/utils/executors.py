@@ -0,0 +1,134 @@
+"""Bounded executor stages that keep blocking work off the event loop.
+
+Each stage owns a thread or process pool and admits at most workers + queue
+calls at a time. When a stage is full, calls fail fast with StageBusy (HTTP 429)
+instead of piling up behind a slow upload; a crashed process pool surfaces as
+StageUnavailable (HTTP 503) and is recreated for the next call.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import EXECUTOR_STAGES, STAGE_RETRY_AFTER
+from utils import metrics
+
+_REJECTED = metrics.counter("ai_stage_rejected_total", "Calls refused because a stage was full or crashed.",
+                            ["stage", "reason"])
+
+
+class StageError(Exception):
+    status_code = 503
+
+    def __init__(self, stage, message, retry_after=STAGE_RETRY_AFTER):
+        super().__init__(message)
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class StageBusy(StageError):
+    status_code = 429
+
+
+class StageUnavailable(StageError):
+    status_code = 503
+
+
+class Stage:
+    def __init__(self, name, kind, workers, max_queue, initializer=None):
+        self.name = name
+        self.kind = kind
+        self.workers = workers
+        self.limit = workers + max_queue
+        self.inflight = 0
+        self.initializer = initializer if kind == "process" else None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix=f"stage-{self.name}")
+            return self._executor
+
+    def prestart(self, fn=None):
+        """Start the pool's workers now rather than on the first call. If fn is given,
+        submit it once per worker and return the results."""
+        executor = self._get_executor()
+        futures = [executor.submit(fn or _noop) for _ in range(self.workers)]
+        return [f.result() for f in futures]
+
+    async def run(self, fn, *args, **kwargs):
+        if self.inflight >= self.limit:
+            _REJECTED.inc(stage=self.name, reason="busy")
+            raise StageBusy(self.name, f"Too many pending '{self.name}' tasks, retry later")
+        self.inflight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            if self.kind == "process":
+                # metrics recorded in the worker process come back with the result
+                result, delta = await loop.run_in_executor(
+                    executor, functools.partial(metrics.call_collecting, fn, *args, **kwargs))
+                metrics.merge(delta)
+                return result
+            # run in a copy of the caller's context so stage timings reach the request
+            ctx = contextvars.copy_context()
+            return await loop.run_in_executor(executor, functools.partial(ctx.run, fn, *args, **kwargs))
+        except BrokenProcessPool:
+            _REJECTED.inc(stage=self.name, reason="crashed")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            raise StageUnavailable(self.name, f"'{self.name}' worker crashed, retry later")
+        finally:
+            self.inflight -= 1
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self):
+        return {"kind": self.kind, "workers": self.workers, "limit": self.limit, "inflight": self.inflight}
+
+
+def _noop():
+    return None
+
+
+def _init_ner():
+    # load spaCy when a worker process starts, before it takes its first task
+    from utils import ner
+    ner.warm_up()
+
+
+_INITIALIZERS = {"ner": _init_ner}
+
+_stages = {name: Stage(name, *spec, initializer=_INITIALIZERS.get(name))
+           for name, spec in EXECUTOR_STAGES.items()}
+
+
+def get_stage(name):
+    return _stages[name]
+
+
+async def run_in_stage(name, fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on the named stage's pool and await the result."""
+    return await _stages[name].run(fn, *args, **kwargs)
+
+
+def stage_stats():
+    return {name: stage.stats() for name, stage in _stages.items()}
+
+
+def shutdown_stages():
+    for stage in _stages.values():
+        stage.shutdown()
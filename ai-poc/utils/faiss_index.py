@@ -1,137 +1,755 @@
+"""FAISS + BM25 search index over extraction passages.
+
+Layout under storage/indexes (the directory of INDEX_PATH):
+  CURRENT     number of the published snapshot
+  v<N>/       snapshot N: the FAISS index, meta.bin (chunk metadata, see
+              utils/meta_store.py), bm25.pkl and updates.log, an append-only log
+              of upserts/removes applied on top of the snapshot (plus dead.npy when
+              the index holds vectors it could not delete)
+  rebuilding.*  one marker per full rebuild in progress; compaction waits for them
+
+A snapshot is written to a temporary directory and published by renaming it into
+place and then atomically replacing CURRENT, so readers never see a half-written
+index. Every worker process keeps one in-memory _IndexState and brings it up to
+date on its own: a new CURRENT means load the new snapshot, a longer log means
+replay the new entries. Writers in all workers serialize on a lock file; within
+a process a reader-writer lock lets searches run concurrently with each other but
+not with an update mutating the index, and a full rebuild keeps serving the old
+state until the new one is swapped in.
+"""
 import os
 import json
+import uuid
+import base64
+import hashlib
+import shutil
+import threading
+import time
+from contextlib import contextmanager
 import faiss
 import numpy as np
-from config import INDEX_PATH, STORAGE_DIR
+from config import (
+    INDEX_PATH,
+    INDEX_COMPACT_EVERY,
+    INDEX_MMAP,
+    INDEX_SYNC_INTERVAL_SECONDS,
+    INDEX_KEEP_SNAPSHOTS,
+    CHUNK_SEARCH_OVERSAMPLE,
+    SEARCH_MODE,
+    SEARCH_FUSION_DEPTH,
+    SEARCH_RRF_K,
+    SEARCH_QUERY_CACHE_SIZE,
+    SEARCH_RESULT_CACHE_SIZE,
+    SEARCH_CACHE_TTL_SECONDS,
+)
+from utils import index_factory, metrics
+from utils.bm25 import BM25Index, record_fields, reciprocal_rank_fusion, tokenize
+from utils.chunking import chunk_text
+from utils.locks import FileLock
+from utils.meta_store import MetaStore
+from utils.search_cache import LatencyStats, TTLCache
 
-# store meta alongside index
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-INDEX_FULL_PATH = os.path.join(BASE_DIR, INDEX_PATH)
-META_DIR = os.path.join(BASE_DIR, "storage", "indexes")
-META_PATH = os.path.join(META_DIR, "meta.json")
+META_DIR = os.path.dirname(os.path.join(BASE_DIR, INDEX_PATH))
+CURRENT_PATH = os.path.join(META_DIR, "CURRENT")
+LOCK_PATH = os.path.join(META_DIR, "write.lock")
+INDEX_FILE = os.path.basename(INDEX_PATH)
+META_FILE = "meta.bin"
+# snapshots written before meta.bin existed
+LEGACY_META_FILE = "meta.json"
+# keyword (BM25) index over the same extractions, snapshotted with the vectors
+BM25_FILE = "bm25.pkl"
+# ids of vectors the index could not delete (HNSW); they stay until the next rebuild
+DEAD_FILE = "dead.npy"
+LOG_FILE = "updates.log"
+# one empty file per rebuild in progress; compaction waits while any exists
+REBUILD_MARKER_PREFIX = "rebuilding."
+# a marker this old was left by a rebuild that crashed
+REBUILD_MARKER_MAX_AGE = 6 * 3600
+
+SEARCH_MODES = ("hybrid", "dense", "bm25")
+
+_ID_MASK = (1 << 63) - 1
+# low bits of a vector id hold the chunk number within its extraction
+_CHUNK_BITS = 12
+_CHUNK_MASK = (1 << _CHUNK_BITS) - 1
+# the bits above them a generation, bumped when a replaced chunk's vector cannot be deleted,
+# so new vectors never reuse the id of a dead one
+_GEN_BITS = 8
+_GEN_MASK = ((1 << _GEN_BITS) - 1) << _CHUNK_BITS
+
+# normalized query -> vector
+_query_vectors = TTLCache(SEARCH_QUERY_CACHE_SIZE, SEARCH_CACHE_TTL_SECONDS, name="search_query_vectors")
+# (query, params, version) -> results
+_results = TTLCache(SEARCH_RESULT_CACHE_SIZE, SEARCH_CACHE_TTL_SECONDS, name="search_results")
+_latency = LatencyStats()
+_SEARCH_SECONDS = metrics.histogram("ai_search_duration_seconds", "Search latency by cache outcome.", ["outcome"])
+
+
+class _RWLock:
+    """Many readers or one writer. Waiting writers block new readers so updates are not starved."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class _IndexState:
+    """In-memory view of snapshot `version` plus the first log_offset bytes of its update log."""
+
+    def __init__(self, version, index, meta, bm25):
+        self.version = version
+        self.index = index
+        self.meta = meta  # MetaStore: vector id -> meta item (one per chunk)
+        self.bm25 = bm25
+        self.dead = set()  # vector ids still in the index but removed (index cannot delete)
+        self.log_offset = 0
+        self.log_entries = 0
 
-_index = None
-_meta = None
+    @property
+    def key(self):
+        return self.version, self.log_entries
+
+
+_state = None
+_rw = _RWLock()
+_sync_lock = threading.Lock()
+_last_sync = 0.0
 
 
 def _ensure_dirs():
     os.makedirs(META_DIR, exist_ok=True)
 
 
+def _snapshot_dir(version):
+    return os.path.join(META_DIR, f"v{version}")
+
+
+def _log_path(version):
+    return os.path.join(_snapshot_dir(version), LOG_FILE)
+
+
+def _read_current():
+    try:
+        with open(CURRENT_PATH, 'r', encoding='utf-8') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
 def index_exists():
-    return os.path.exists(INDEX_FULL_PATH) and os.path.exists(META_PATH)
+    return _read_current() is not None
 
 
-def build_index(output_dir):
-    """Scan extraction JSONs under output_dir and build a FAISS index. Returns number indexed."""
-    _ensure_dirs()
-    docs = []
-    ids = []
-    metadata = []
+def warm_up():
+    """Load the published snapshot into memory. Returns a short description."""
+    _sync(force=True)
+    state = _state
+    if state is None:
+        return "no index built"
+    return f"snapshot {state.version}, {state.index.ntotal} vectors"
 
-    # look for files directly under output_dir (exclude ai_documents subdir)
-    for fn in os.listdir(output_dir):
-        if not fn.endswith('.json'):
-            continue
-        path = os.path.join(output_dir, fn)
-        if os.path.isdir(path):
+
+def index_version():
+    """(snapshot, applied log entries) of the index this process serves, or None."""
+    state = _state
+    return state.key if state is not None else None
+
+
+def vector_id(extraction_id):
+    """Stable non-negative int64 FAISS id for an extraction id (UUID or arbitrary string)."""
+    try:
+        return uuid.UUID(str(extraction_id)).int & _ID_MASK
+    except ValueError:
+        digest = hashlib.blake2b(str(extraction_id).encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') & _ID_MASK
+
+
+def chunk_vector_id(extraction_id, chunk_no):
+    """FAISS id of chunk chunk_no (generation 0) of an extraction; all chunks share the high bits."""
+    return (vector_id(extraction_id) & ~(_GEN_MASK | _CHUNK_MASK)) | chunk_no
+
+
+def _chunk_vids(meta, extraction_id):
+    """Vector ids of every indexed chunk of extraction_id (they share all but the generation
+    and chunk bits)."""
+    first = chunk_vector_id(extraction_id, 0)
+    return meta.vids_between(first, first | _GEN_MASK | _CHUNK_MASK)
+
+
+def _keyword_text(data):
+    # BM25 matches exact tokens (phone fragments, names) in the unredacted text; only the
+    # redacted passages are ever returned as snippets
+    return data.get('extractedText') or data.get('redactedText') or ''
+
+
+def _record_chunks(data):
+    """Return (passage texts, meta items) for an extraction record, or None if it has nothing to index."""
+    # heuristic: extraction files have 'extractedText'
+    if not isinstance(data, dict) or 'extractedText' not in data:
+        return None
+    text = data.get('redactedText') or data.get('extractedText') or ''
+    spans = chunk_text(text)
+    if not spans:
+        return None
+    texts = []
+    items = []
+    for n, (start, end) in enumerate(spans):
+        passage = text[start:end]
+        texts.append(passage)
+        items.append({
+            'vid': chunk_vector_id(data.get('id'), n),
+            'id': data.get('id'),
+            'caseId': data.get('caseId'),
+            'sourceFile': data.get('sourceFile'),
+            'chunk': n,
+            'start': start,
+            'end': end,
+            'snippet': passage[:400]
+        })
+    return texts, items
+
+
+def record_passages(data):
+    """Passage texts the index embeds for an extraction record ([] if it has nothing to index)."""
+    rec = _record_chunks(data)
+    return rec[0] if rec else []
+
+
+def _new_index(dim):
+    # incremental adds start flat; POST /index switches to the configured INDEX_TYPE
+    return index_factory.flat_index(dim)
+
+
+def _live_items(state, items):
+    """items with vector ids in the first generation that collides with no dead vector."""
+    if not state.dead:
+        return items
+    for gen in range(1 << _GEN_BITS):
+        vids = [(m['vid'] & ~_GEN_MASK) | (gen << _CHUNK_BITS) for m in items]
+        if not state.dead.intersection(vids):
+            return [dict(m, vid=vid) for m, vid in zip(items, vids)]
+    raise RuntimeError(f"Extraction {items[0]['id']} was replaced too often since the index was built; "
+                       "POST /index to rebuild it")
+
+
+def _apply_upsert(state, items, vectors):
+    """Replace all chunks of the extraction in items with the given chunk vectors.
+    Replaying the same log over the same snapshot picks the same vector ids everywhere."""
+    _apply_remove(state, items[0]['id'])
+    items = _live_items(state, items)
+    state.index.add_with_ids(vectors, np.array([m['vid'] for m in items], dtype=np.int64))
+    state.meta.upsert(items)
+
+
+def _apply_remove(state, extraction_id):
+    """Drop all chunks of extraction_id. Returns True if any were indexed."""
+    vids = _chunk_vids(state.meta, extraction_id)
+    if not vids:
+        return False
+    if not index_factory.remove_ids(state.index, vids):
+        # HNSW cannot delete: the vectors stay until the next rebuild, without meta, and
+        # their ids are never handed out again
+        state.dead.update(vids)
+    state.meta.remove(vids)
+    return True
+
+
+def _apply_entry(state, entry):
+    if entry['op'] == 'upsert':
+        vecs = np.frombuffer(base64.b64decode(entry['vectors']), dtype=np.float32)
+        _apply_upsert(state, entry['items'], vecs.reshape(len(entry['items']), -1))
+        state.bm25.add(entry['id'], entry.get('text', ''), entry.get('fields'))
+    elif entry['op'] == 'remove':
+        _apply_remove(state, entry['id'])
+        state.bm25.remove(entry['id'])
+
+
+def _replay_log(state, path=None):
+    """Apply update-log entries past state.log_offset. Caller holds the write lock (or owns state)."""
+    path = path or _log_path(state.version)
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return
+    if size <= state.log_offset:
+        return
+    if index_factory.is_read_only(state.index):
+        # memory-mapped IVF lists live on disk read-only; load them into RAM to modify
+        state.index = index_factory.read_index(os.path.join(_snapshot_dir(state.version), INDEX_FILE))
+    with open(path, 'rb') as lf:
+        lf.seek(state.log_offset)
+        for line in lf:
+            if not line.endswith(b'\n'):
+                # an append still in progress; pick it up on the next sync
+                break
+            _apply_entry(state, json.loads(line))
+            state.log_offset += len(line)
+            state.log_entries += 1
+
+
+def _load_meta(directory):
+    path = os.path.join(directory, META_FILE)
+    if os.path.exists(path):
+        return MetaStore.load(path)
+    with open(os.path.join(directory, LEGACY_META_FILE), 'r', encoding='utf-8') as mf:
+        return MetaStore.from_items(json.load(mf).get('items', []))
+
+
+def _load_snapshot(version):
+    directory = _snapshot_dir(version)
+    # the update log needs a writable index, so only memory-map a snapshot with no pending updates
+    log = _log_path(version)
+    mmap = INDEX_MMAP and not (os.path.exists(log) and os.path.getsize(log) > 0)
+    index = index_factory.read_index(os.path.join(directory, INDEX_FILE), mmap=mmap)
+    meta = _load_meta(directory)
+    state = _IndexState(version, index, meta, BM25Index.load(os.path.join(directory, BM25_FILE)))
+    dead = os.path.join(directory, DEAD_FILE)
+    if os.path.exists(dead):
+        state.dead = set(np.load(dead).tolist())
+    _replay_log(state)
+    return state
+
+
+def _sync(force=False):
+    """Bring this process's state up to date with the published snapshot and its log.
+    Readers (force=False) check at most every INDEX_SYNC_INTERVAL_SECONDS and never wait
+    for another thread's reload; they keep serving the current state meanwhile."""
+    global _state, _last_sync
+    if not force and time.monotonic() - _last_sync < INDEX_SYNC_INTERVAL_SECONDS:
+        return
+    if not _sync_lock.acquire(blocking=force):
+        return
+    try:
+        _last_sync = time.monotonic()
+        version = _read_current()
+        state = _state
+        if version is None:
+            if state is not None:
+                with _rw.write():
+                    _state = None
+        elif state is None or state.version != version:
+            # load outside the write lock so searches keep using the old state meanwhile
+            with metrics.timed("index_load"):
+                new_state = _load_snapshot(version)
+            with _rw.write():
+                _state = new_state
+        else:
+            log = _log_path(version)
+            if os.path.exists(log) and os.path.getsize(log) > state.log_offset:
+                with _rw.write():
+                    _replay_log(state)
+    finally:
+        _sync_lock.release()
+
+
+def _next_version():
+    versions = [int(d[1:]) for d in os.listdir(META_DIR) if d.startswith('v') and d[1:].isdigit()]
+    return max(versions + [_read_current() or 0]) + 1
+
+
+def _write_current(version):
+    tmp = f"{CURRENT_PATH}.tmp-{os.getpid()}"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(str(version))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, CURRENT_PATH)
+
+
+def _prune_snapshots(current):
+    # siblings may still be loading the previous snapshot, so keep the last few; a rebuild
+    # in progress still needs the logs of every snapshot since it started
+    if _rebuild_markers():
+        return
+    for d in os.listdir(META_DIR):
+        if d.startswith('v') and d[1:].isdigit() and int(d[1:]) <= current - INDEX_KEEP_SNAPSHOTS:
+            shutil.rmtree(os.path.join(META_DIR, d), ignore_errors=True)
+
+
+def _publish(state):
+    """Write a full index + meta + BM25 snapshot of state and make it current. Caller holds
+    LOCK_PATH. Returns the new snapshot version."""
+    version = _next_version()
+    tmp = os.path.join(META_DIR, f".v{version}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    faiss.write_index(state.index, os.path.join(tmp, INDEX_FILE))
+    state.bm25.save(os.path.join(tmp, BM25_FILE))
+    state.meta.save(os.path.join(tmp, META_FILE))
+    if state.dead:
+        np.save(os.path.join(tmp, DEAD_FILE), np.array(sorted(state.dead), dtype=np.int64))
+    os.rename(tmp, _snapshot_dir(version))
+    _write_current(version)
+    _prune_snapshots(version)
+    return version
+
+
+def _rebuild_markers():
+    """Marker files of rebuilds in progress (any process), ignoring ones left by a crash."""
+    now = time.time()
+    markers = []
+    for name in os.listdir(META_DIR):
+        if name.startswith(REBUILD_MARKER_PREFIX):
+            path = os.path.join(META_DIR, name)
+            try:
+                if now - os.path.getmtime(path) < REBUILD_MARKER_MAX_AGE:
+                    markers.append(path)
+            except OSError:
+                pass
+    return markers
+
+
+def _carry_over(state, base_version, base_offset):
+    """Replay onto a rebuilt state every update logged since the rebuild read its base:
+    the rest of the base snapshot's log, then the whole log of each snapshot published
+    since (a sibling's first document, or another rebuild), oldest first."""
+    current = _read_current()
+    if current is None:
+        return
+    first = base_version if base_version is not None else 1
+    for version in range(first, current + 1):
+        if not os.path.isdir(_snapshot_dir(version)):
             continue
+        state.log_offset = base_offset if version == base_version else 0
+        _replay_log(state, _log_path(version))
+
+
+def build_index(records):
+    """Build a FAISS index from an iterable of extraction records. Returns number of extractions indexed.
+    Searches keep using the previous snapshot until the new one is published."""
+    global _state
+    _ensure_dirs()
+    # no compaction while this runs, so the log it carries over stays where it was read
+    marker = os.path.join(META_DIR, f"{REBUILD_MARKER_PREFIX}{os.getpid()}-{uuid.uuid4().hex}")
+    with open(marker, 'w', encoding='utf-8'):
+        pass
+    try:
+        return _build_index(records)
+    finally:
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            # heuristic: extraction files have 'extractedText'
-            if 'extractedText' in data:
-                text = data.get('redactedText') or data.get('extractedText') or ''
-                if not text.strip():
-                    continue
-                docs.append(text)
-                ids.append(data.get('id'))
-                metadata.append({
-                    'id': data.get('id'),
-                    'caseId': data.get('caseId'),
-                    'sourceFile': data.get('sourceFile'),
-                    'snippet': text[:400]
-                })
-        except Exception:
+            os.remove(marker)
+        except OSError:
+            pass
+
+
+def _build_index(records):
+    global _state
+    _sync(force=True)
+    base = _state
+    base_version = base.version if base is not None else None
+    base_offset = base.log_offset if base is not None else 0
+
+    # later records win if the same id appears twice
+    chunks_by_doc = {}
+    bm25 = BM25Index()
+    for data in records:
+        rec = _record_chunks(data)
+        if rec is None:
             continue
+        chunks_by_doc[rec[1][0]['id']] = rec
+        bm25.add(data.get('id'), _keyword_text(data), record_fields(data))
 
-    if not docs:
-        # nothing to index
-        # write empty meta and remove old index if any
-        if os.path.exists(INDEX_FULL_PATH):
-            try:
-                os.remove(INDEX_FULL_PATH)
-            except Exception:
-                pass
-        with open(META_PATH, 'w', encoding='utf-8') as mf:
-            json.dump({'items': []}, mf)
+    if not chunks_by_doc:
+        # nothing to index: unpublish so searches report a missing index
+        with FileLock(LOCK_PATH):
+            if os.path.exists(CURRENT_PATH):
+                os.remove(CURRENT_PATH)
+            with _rw.write():
+                _state = None
         return 0
 
-    # compute embeddings lazily to avoid heavy startup
+    passages = [t for texts, _ in chunks_by_doc.values() for t in texts]
+    metadata = [m for _, items in chunks_by_doc.values() for m in items]
+
+    # compute embeddings lazily to avoid heavy startup; one call so the model batches every passage
     from utils.embeddings import embed_texts
-    vectors = embed_texts(docs)
+    vectors = embed_texts(passages)
 
     # ensure vectors are 2D
     if vectors.ndim == 1:
         vectors = vectors.reshape(1, -1)
 
-    dim = vectors.shape[1]
-    # use inner product on normalized vectors as cosine similarity
-    index = faiss.IndexFlatIP(dim)
-    index.add(vectors.astype(np.float32))
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = index_factory.create_index(vectors)
+    index.add_with_ids(vectors, np.array([m['vid'] for m in metadata], dtype=np.int64))
+    meta = MetaStore.from_items(metadata)
 
-    # save index and meta
-    faiss.write_index(index, INDEX_FULL_PATH)
+    with FileLock(LOCK_PATH):
+        state = _IndexState(None, index, meta, bm25)
+        # carry over updates logged while this rebuild was running
+        _carry_over(state, base_version, base_offset)
+        state.version = _publish(state)
+        state.log_offset = state.log_entries = 0
+        # serve the metadata from the published file, mapped rather than held in memory
+        state.meta = MetaStore.load(os.path.join(_snapshot_dir(state.version), META_FILE))
+        with _rw.write():
+            _state = state
 
-    with open(META_PATH, 'w', encoding='utf-8') as mf:
-        json.dump({'items': metadata}, mf, ensure_ascii=False, indent=2)
+    return len(chunks_by_doc)
 
-    # clear cached
-    global _index, _meta
-    _index = None
-    _meta = None
 
-    return len(docs)
+def _append_log(entry):
+    """Append an update to the current snapshot's log and apply it to this process's state.
+    Every INDEX_COMPACT_EVERY entries the log is folded into a new snapshot.
+    Caller holds LOCK_PATH and has synced."""
+    state = _state
+    with open(_log_path(state.version), 'a', encoding='utf-8') as lf:
+        lf.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    with _rw.write():
+        _replay_log(state)
+    if state.log_entries >= INDEX_COMPACT_EVERY and not _rebuild_markers():
+        with _rw.read():
+            version = _publish(state)
+        meta = MetaStore.load(os.path.join(_snapshot_dir(version), META_FILE))
+        with _rw.write():
+            # the folded-in delta now lives in the new meta.bin
+            state.version, state.meta = version, meta
+            state.log_offset = state.log_entries = 0
 
 
-def _load_index_and_meta():
-    global _index, _meta
-    if _index is not None and _meta is not None:
-        return _index, _meta
-    if not os.path.exists(INDEX_FULL_PATH) or not os.path.exists(META_PATH):
-        raise FileNotFoundError('Index or meta not found. Run POST /index to build it.')
-    idx = faiss.read_index(INDEX_FULL_PATH)
-    with open(META_PATH, 'r', encoding='utf-8') as mf:
-        meta = json.load(mf).get('items', [])
-    _index = idx
-    _meta = meta
-    return _index, _meta
+def upsert_document(data):
+    """Add or replace a single extraction record (all of its chunks) in the index. Costs one
+    batched embedding call plus an append to the update log. Returns False if the record
+    has no text to index."""
+    global _state
+    _ensure_dirs()
+    rec = _record_chunks(data)
+    if rec is None:
+        # an extraction that lost its text should not keep matching
+        remove_document(data.get('id') if isinstance(data, dict) else None)
+        return False
+    texts, items = rec
 
+    from utils.embeddings import embed_texts
+    vecs = np.ascontiguousarray(embed_texts(texts), dtype=np.float32).reshape(len(texts), -1)
+    text, fields = _keyword_text(data), record_fields(data)
+
+    with FileLock(LOCK_PATH):
+        _sync(force=True)
+        if _state is None:
+            # first document: publish it as a snapshot of its own
+            state = _IndexState(None, _new_index(vecs.shape[1]), MetaStore(), BM25Index())
+            _apply_upsert(state, items, vecs)
+            state.bm25.add(items[0]['id'], text, fields)
+            state.version = _publish(state)
+            with _rw.write():
+                _state = state
+            return True
+        _append_log({
+            'op': 'upsert',
+            'id': items[0]['id'],
+            'items': items,
+            'vectors': base64.b64encode(vecs.tobytes()).decode('ascii'),
+            'text': text,
+            'fields': fields,
+        })
+    return True
+
+
+def remove_document(extraction_id):
+    """Remove a single extraction (all of its chunks) from the index. Returns True if it was indexed."""
+    if not extraction_id or not index_exists():
+        return False
+    with FileLock(LOCK_PATH):
+        _sync(force=True)
+        if _state is None or not _chunk_vids(_state.meta, extraction_id):
+            return False
+        _append_log({'op': 'remove', 'id': extraction_id})
+    return True
+
+
+def _embed_queries(texts):
+    """Query vectors for texts (one row each); only queries not in the vector cache are encoded,
+    in a single batch."""
+    from utils.embedding_cache import normalize_text
+    keys = [normalize_text(t) for t in texts]
+    vectors = {key: _query_vectors.get(key) for key in set(keys)}
+    missing = [key for key, vec in vectors.items() if vec is None]
+    if missing:
+        from utils.embeddings import embed_texts
+        # ad-hoc queries stay out of the on-disk document embedding cache
+        for key, vec in zip(missing, embed_texts(missing, use_cache=False)):
+            vec = np.asarray(vec, dtype=np.float32)
+            _query_vectors.put(key, vec)
+            vectors[key] = vec
+    return np.ascontiguousarray(np.stack([vectors[key] for key in keys]), dtype=np.float32)
+
+
+def _dense_hits(idx, meta, qvs, limit, nprobe, ef_search, allowed):
+    """Best-scoring chunk per extraction for each query row, best first:
+    [{extraction id: (score, vector id)}]. allowed (extraction ids) restricts the search
+    through an id selector. Only each hit's extraction id is read from the metadata."""
+    candidates = idx.ntotal
+    selector = None
+    if allowed is not None:
+        vids = [vid for doc_id in allowed for vid in _chunk_vids(meta, doc_id)]
+        if not vids:
+            return [{} for _ in range(len(qvs))]
+        selector = faiss.IDSelectorBatch(np.array(vids, dtype=np.int64))
+        candidates = len(vids)
+    params = index_factory.search_params(idx, nprobe=nprobe, ef_search=ef_search, selector=selector)
+    # hits are chunks: over-fetch, keep each extraction's best passage, and widen the fetch
+    # for queries where one long extraction crowds out the others (HNSW may also return removed vectors)
+    fetch = limit * max(CHUNK_SEARCH_OVERSAMPLE, 1)
+    hits = [None] * len(qvs)
+    pending = list(range(len(qvs)))
+    while pending:
+        D, I = idx.search(qvs[pending], min(fetch, idx.ntotal), params=params)
+        retry = []
+        for row, scores, vids in zip(pending, D, I):
+            best = {}
+            for score, vid in zip(scores, vids):
+                doc_id = meta.doc_id(int(vid)) if vid >= 0 else None
+                if doc_id is None or doc_id in best:
+                    continue
+                # results come back best first, so the first chunk seen is the extraction's best
+                best[doc_id] = (float(score), int(vid))
+            hits[row] = best
+            if len(best) < limit and fetch < candidates:
+                retry.append(row)
+        pending = retry
+        fetch *= 2
+    return hits
+
+
+def _keyword_passage(meta, extraction_id, query_text):
+    """Meta item of the extraction's chunk sharing the most terms with the query."""
+    terms = set(tokenize(query_text))
+    chunks = [meta.get(vid) for vid in _chunk_vids(meta, extraction_id)]
+    if not chunks:
+        return None
+    return max(chunks, key=lambda m: len(terms.intersection(tokenize(m.get('snippet')))))
+
+
+def _rank(query_text, k, mode, meta, dense, keyword):
+    """Merge one query's dense hits and BM25 hits into its result list."""
+    if mode == 'dense':
+        ranked = [(doc_id, score) for doc_id, (score, _) in dense.items()]
+    elif mode == 'bm25':
+        ranked = keyword
+    else:
+        ranked = reciprocal_rank_fusion([list(dense), [doc_id for doc_id, _ in keyword]], k=SEARCH_RRF_K)
 
-def search_index(query_text, k=5):
-    """Search the index for query_text and return up to k results with scores and metadata."""
-    try:
-        idx, meta = _load_index_and_meta()
-    except FileNotFoundError:
-        # Graceful degradation: return empty results if index doesn't exist
-        return []
-    
-    from utils.embeddings import embed_text
-    qv = embed_text(query_text).astype(np.float32)
-    if qv.ndim == 1:
-        qv = qv.reshape(1, -1)
-    D, I = idx.search(qv, k)
     results = []
-    for score, iid in zip(D[0], I[0]):
-        if iid < 0 or iid >= len(meta):
+    for doc_id, score in ranked:
+        m = meta.get(dense[doc_id][1]) if doc_id in dense else _keyword_passage(meta, doc_id, query_text)
+        if m is None:
             continue
-        m = meta[iid]
         results.append({
             'score': float(score),
             'id': m.get('id'),
             'caseId': m.get('caseId'),
             'sourceFile': m.get('sourceFile'),
-            'snippet': m.get('snippet')
+            'snippet': m.get('snippet'),
+            'passage': {'start': m.get('start'), 'end': m.get('end')}
         })
+        if len(results) == k:
+            break
     return results
 
+
+def _copy_results(results):
+    return [dict(r, passage=dict(r['passage'])) for r in results]
+
+
+def search_batch(queries, k=5, nprobe=None, ef_search=None, mode=None, filters=None):
+    """Run several queries at once: cached results are reused, the remaining queries are
+    embedded in one batch and searched with a single index.search over the query matrix.
+    Returns one result list per query, as for search_index."""
+    if not queries:
+        return []
+    start = time.perf_counter()
+    mode = mode or SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}', expected one of {SEARCH_MODES}")
+    _sync()
+    if _state is None:
+        # Graceful degradation: return empty results if index doesn't exist
+        return [[] for _ in queries]
+
+    filters = {key: v for key, v in (filters or {}).items() if v}
+    params_key = (k, mode, nprobe, ef_search, tuple(sorted(filters.items())))
+    out = [_results.get((q, params_key, index_version())) for q in queries]
+    todo = sorted({q for q, cached in zip(queries, out) if cached is None})
+    computed = {}
+    if todo:
+        # embed before taking the lock so a slow encode never holds up index updates
+        qvs = _embed_queries(todo) if mode != 'bm25' else None
+        with _rw.read():
+            state = _state
+            if state is None or state.index.ntotal == 0:
+                return [[] for _ in queries]
+            allowed = state.bm25.filter(filters.get('caseId'), filters.get('section'),
+                                        filters.get('dateFrom'), filters.get('dateTo'))
+            if allowed is not None and not allowed:
+                computed = {q: [] for q in todo}
+            else:
+                depth = k if mode != 'hybrid' else max(k, SEARCH_FUSION_DEPTH)
+                if qvs is not None:
+                    dense = _dense_hits(state.index, state.meta, qvs, depth, nprobe, ef_search, allowed)
+                else:
+                    dense = [{} for _ in todo]
+                for q, dense_q in zip(todo, dense):
+                    keyword = state.bm25.search(q, depth, allowed) if mode != 'dense' else []
+                    computed[q] = _rank(q, k, mode, state.meta, dense_q, keyword)
+            for q, results in computed.items():
+                _results.put((q, params_key, state.key), results)
+
+    out = [_copy_results(cached if cached is not None else computed[q]) for q, cached in zip(queries, out)]
+    label = 'cached' if not todo else ('computed' if len(todo) == len(set(queries)) else 'partial')
+    label = label if len(queries) == 1 else f'batch-{label}'
+    seconds = time.perf_counter() - start
+    _latency.record(label, seconds * 1000)
+    _SEARCH_SECONDS.observe(seconds, outcome=label)
+    metrics.record_stage("search", seconds)
+    return out
+
+
+def search_index(query_text, k=5, nprobe=None, ef_search=None, mode=None, filters=None):
+    """Search the index for query_text and return up to k results with scores and metadata.
+    nprobe (IVF) and ef_search (HNSW) trade recall for latency per query.
+    mode is 'hybrid' (BM25 and vector rankings fused with reciprocal rank fusion), 'dense'
+    or 'bm25'. filters may hold caseId, section (IPC) and dateFrom/dateTo (ISO dates).
+    Repeated queries are served from the result cache until the index changes."""
+    return search_batch([query_text], k, nprobe, ef_search, mode, filters)[0]
+
+
+def search_cache_stats():
+    return {
+        'indexVersion': index_version(),
+        'queryVectors': _query_vectors.stats(),
+        'results': _results.stats(),
+        'latency': _latency.stats(),
+    }
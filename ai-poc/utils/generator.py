@@ -1,8 +1,44 @@
 import os
-from typing import Optional, Dict
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Optional, Dict, Iterator
+from config import (
+    GENERATOR_MAX_PIPELINES,
+    GENERATOR_MAX_BATCH,
+    GENERATOR_MAX_WAIT_MS,
+    GENERATOR_RESULT_CACHE_SIZE,
+    HF_API_URL,
+    HF_CONNECT_TIMEOUT,
+    HF_READ_TIMEOUT,
+    HF_MAX_RETRIES,
+    HF_POOL_SIZE,
+    HF_BREAKER_FAILURES,
+    HF_BREAKER_RESET_SECONDS,
+    HF_FALLBACK_LOCAL,
+)
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_DRAFTS = metrics.counter("ai_drafts_total", "Drafts generated, by backend (hf-api, local, fallback, cached).",
+                          ["backend"])
 
 HF_API_TOKEN = os.getenv("HUGGINGFACE_HUB_API_TOKEN")
 DEFAULT_MODEL = os.getenv("MODEL_NAME", "google/flan-t5-small")
+HF_PARAMETERS = {"max_new_tokens": 512, "temperature": 0.2}
+
+_hf_client = None
+_hf_client_lock = threading.Lock()
+
+_pipelines = OrderedDict()  # model name -> transformers pipeline, least recently used first
+_pipelines_lock = threading.Lock()
+
+_results = OrderedDict()  # (model, prompt sha256) -> generated draft result
+_results_lock = threading.Lock()
 
 
 def _build_prompt(text: str) -> str:
@@ -13,42 +49,161 @@ def _build_prompt(text: str) -> str:
     return prompt
 
 
+def _get_hf_client():
+    global _hf_client
+    with _hf_client_lock:
+        if _hf_client is None:
+            from utils.hf_client import HFClient, CircuitBreaker
+            _hf_client = HFClient(
+                HF_API_URL,
+                HF_API_TOKEN,
+                connect_timeout=HF_CONNECT_TIMEOUT,
+                read_timeout=HF_READ_TIMEOUT,
+                max_retries=HF_MAX_RETRIES,
+                pool_size=HF_POOL_SIZE,
+                breaker=CircuitBreaker(HF_BREAKER_FAILURES, HF_BREAKER_RESET_SECONDS),
+            )
+        return _hf_client
+
+
 def _call_hf_api(prompt: str, model: str = DEFAULT_MODEL) -> Optional[str]:
-    """Call HuggingFace Inference API if token is provided."""
-    try:
-        import requests
-        if not HF_API_TOKEN:
-            return None
-        url = f"https://api-inference.huggingface.co/models/{model}"
-        headers = {"Authorization": f"Bearer {HF_API_TOKEN}", "Accept": "application/json"}
-        payload = {"inputs": prompt, "parameters": {"max_new_tokens": 512, "temperature": 0.2}}
-        resp = requests.post(url, json=payload, headers=headers, timeout=60)
-        resp.raise_for_status()
-        j = resp.json()
-        # HF may return a list of dicts with 'generated_text'
-        if isinstance(j, dict) and 'error' in j:
-            return None
-        if isinstance(j, list) and len(j) > 0:
-            return j[0].get('generated_text') or j[0].get('result') or None
-        if isinstance(j, dict) and 'generated_text' in j:
-            return j['generated_text']
+    """Call HuggingFace Inference API if token is provided. Returns None on failure or
+    while the circuit breaker has the remote backend switched off."""
+    if not HF_API_TOKEN:
         return None
-    except Exception:
+    try:
+        with metrics.timed("hf_api"):
+            return _get_hf_client().generate(prompt, model, HF_PARAMETERS)
+    except Exception as e:
+        logger.info("HuggingFace API unavailable for %s: %s", model, e)
+        metrics.fallback("generator", "hf_api_unavailable")
         return None
 
 
+def _get_pipeline(model: str):
+    """Return a cached text2text pipeline for model, evicting the least recently used
+    one when more than GENERATOR_MAX_PIPELINES are loaded."""
+    with _pipelines_lock:
+        pipe = _pipelines.get(model)
+        if pipe is not None:
+            _pipelines.move_to_end(model)
+            return pipe
+        from transformers import pipeline
+        with metrics.model_load("generator", model):
+            pipe = pipeline('text2text-generation', model=model, truncation=True)
+        _pipelines[model] = pipe
+        while len(_pipelines) > GENERATOR_MAX_PIPELINES:
+            _pipelines.popitem(last=False)
+        return pipe
+
+
+def warm_up(model: Optional[str] = None) -> str:
+    """Load the local pipeline for model ahead of the first draft. Skipped (returns the
+    reason) when drafts go to the HF API without a local fallback."""
+    if HF_API_TOKEN and not HF_FALLBACK_LOCAL:
+        return "remote only (HF API)"
+    model = model or DEFAULT_MODEL
+    _get_pipeline(model)
+    return f"local:{model}"
+
+
+def _generated_text(out) -> Optional[str]:
+    if isinstance(out, list):
+        out = out[0] if out else None
+    if isinstance(out, dict):
+        return out.get('generated_text') or out.get('summary_text') or None
+    return None
+
+
+class _MicroBatcher:
+    """Groups concurrent local generation requests into one pipeline call per model.
+
+    A request waits at most GENERATOR_MAX_WAIT_MS for others to join its batch;
+    a batch never exceeds GENERATOR_MAX_BATCH prompts.
+    """
+
+    def __init__(self, max_batch: int, max_wait_ms: float):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending = []  # (model, prompt, future)
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, prompt: str, model: str) -> Future:
+        fut = Future()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="generator-batcher", daemon=True)
+                self._thread.start()
+            self._pending.append((model, prompt, fut))
+            self._cond.notify()
+        return fut
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            model = self._pending[0][0]
+            while True:
+                same_model = [p for p in self._pending if p[0] == model]
+                remaining = deadline - time.monotonic()
+                if len(same_model) >= self.max_batch or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = same_model[:self.max_batch]
+            for item in batch:
+                self._pending.remove(item)
+            return model, batch
+
+    def _loop(self):
+        while True:
+            model, batch = self._next_batch()
+            try:
+                pipe = _get_pipeline(model)
+                outs = pipe([p for _, p, _ in batch], max_length=512, do_sample=False, batch_size=len(batch))
+                for (_, _, fut), out in zip(batch, outs):
+                    fut.set_result(_generated_text(out))
+            except Exception as e:
+                for _, _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+
+_batcher = _MicroBatcher(GENERATOR_MAX_BATCH, GENERATOR_MAX_WAIT_MS)
+
+
 def _call_local_transformer(prompt: str, model: str = DEFAULT_MODEL) -> Optional[str]:
     try:
-        from transformers import pipeline
-        pipe = pipeline('text2text-generation', model=model, truncation=True)
-        out = pipe(prompt, max_length=512, do_sample=False)
-        if isinstance(out, list) and len(out) > 0:
-            return out[0].get('generated_text') or out[0].get('summary_text') or None
-        return None
+        with metrics.timed("local_generate"):
+            return _batcher.submit(prompt, model).result()
     except Exception:
+        metrics.fallback("generator", "local_model_unavailable")
         return None
 
 
+def _result_key(model: str, prompt: str):
+    return model, hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+def _cached_result(key) -> Optional[Dict[str, Optional[str]]]:
+    with _results_lock:
+        result = _results.get(key)
+        if result is not None:
+            _results.move_to_end(key)
+        return result
+
+
+def _store_result(key, result: Dict[str, Optional[str]]):
+    if GENERATOR_RESULT_CACHE_SIZE <= 0:
+        return
+    with _results_lock:
+        _results[key] = result
+        _results.move_to_end(key)
+        while len(_results) > GENERATOR_RESULT_CACHE_SIZE:
+            _results.popitem(last=False)
+
+
 def generate_draft_from_text(text: str, model: Optional[str] = None) -> Dict[str, Optional[str]]:
     """Generate a draft from text. Returns dict { draft, modelInfo, prompt }"""
     if not text:
@@ -57,21 +212,82 @@ def generate_draft_from_text(text: str, model: Optional[str] = None) -> Dict[str
     prompt = _build_prompt(text)
     model = model or DEFAULT_MODEL
 
+    # Same model + prompt (e.g. regenerating for the same extraction) is served from cache
+    key = _result_key(model, prompt)
+    cached = _cached_result(key)
+    if cached is not None:
+        _DRAFTS.inc(backend="cached")
+        return dict(cached)
+
     # Try HF API if token provided
     if HF_API_TOKEN:
         out = _call_hf_api(prompt, model=model)
         if out:
-            return {"draft": out.strip(), "modelInfo": f"hf-api:{model}", "prompt": prompt}
+            result = {"draft": out.strip(), "modelInfo": f"hf-api:{model}", "prompt": prompt}
+            _store_result(key, result)
+            _DRAFTS.inc(backend="hf-api")
+            return dict(result)
+
+    return _generate_without_remote(text, prompt, model, key)
+
 
-    # Try local transformer
-    out = _call_local_transformer(prompt, model=model)
-    if out:
-        return {"draft": out.strip(), "modelInfo": f"local:{model}", "prompt": prompt}
+def _generate_without_remote(text: str, prompt: str, model: str, key) -> Dict[str, Optional[str]]:
+    # Try local transformer (unless the HF API is configured as the only model backend)
+    if not HF_API_TOKEN or HF_FALLBACK_LOCAL:
+        out = _call_local_transformer(prompt, model=model)
+        if out:
+            result = {"draft": out.strip(), "modelInfo": f"local:{model}", "prompt": prompt}
+            _store_result(key, result)
+            _DRAFTS.inc(backend="local")
+            return dict(result)
 
-    # Fallback: simple extractive template
+    # Fallback: simple extractive template (not cached, so a model that comes back is used)
+    _DRAFTS.inc(backend="fallback")
+    metrics.fallback("generator", "template")
     summary = text.strip()[:1000]
     fallback = (
         "Summary:\n" + summary + "\n\nCharges:\n[Please fill]\n\nEvidence:\n[Please list key evidence]\n\nNext Steps:\n[Suggested next steps]"
     )
     return {"draft": fallback, "modelInfo": "fallback", "prompt": prompt}
 
+
+def stream_draft_from_text(text: str, model: Optional[str] = None, info: Optional[Dict] = None) -> Iterator[str]:
+    """Yield the draft in pieces as the HF API streams tokens. Without a usable remote
+    backend the whole draft is produced as for generate_draft_from_text and yielded once.
+    info, if given, receives modelInfo and prompt once generation has finished."""
+    info = info if info is not None else {}
+    if not text:
+        info.update({"modelInfo": None, "prompt": None})
+        return
+    prompt = _build_prompt(text)
+    model = model or DEFAULT_MODEL
+    info["prompt"] = prompt
+    key = _result_key(model, prompt)
+    cached = _cached_result(key)
+    if cached is not None:
+        _DRAFTS.inc(backend="cached")
+        info["modelInfo"] = cached["modelInfo"]
+        yield cached["draft"]
+        return
+
+    if HF_API_TOKEN:
+        pieces = []
+        try:
+            for piece in _get_hf_client().stream(prompt, model, HF_PARAMETERS):
+                pieces.append(piece)
+                yield piece
+        except Exception as e:
+            if pieces:
+                # the client already has part of the draft; don't restart it on another backend
+                raise
+            logger.info("HuggingFace API streaming unavailable for %s: %s", model, e)
+            metrics.fallback("generator", "hf_api_unavailable")
+        if pieces:
+            _DRAFTS.inc(backend="hf-api")
+            info["modelInfo"] = f"hf-api:{model}"
+            _store_result(key, {"draft": "".join(pieces).strip(), "modelInfo": info["modelInfo"], "prompt": prompt})
+            return
+
+    result = _generate_without_remote(text, prompt, model, key)
+    info["modelInfo"] = result["modelInfo"]
+    yield result["draft"]
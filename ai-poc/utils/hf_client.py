@@ -0,0 +1,191 @@
+"""Pooled HTTP client for the HuggingFace Inference API.
+
+One keep-alive requests.Session is shared by all draft requests. Calls are
+retried a bounded number of times with jittered exponential backoff, and a
+circuit breaker skips the remote backend entirely while it keeps failing so a
+dead endpoint costs nothing instead of a timeout per request.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# bad token or model id: every call will fail the same way, so these count towards the breaker
+CONFIG_ERROR_STATUS = {401, 403, 404}
+# transport errors worth another attempt; any other requests error fails at once
+RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class HFRequestError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures; after reset_after seconds a
+    single trial call is let through (half-open) and its outcome closes or re-opens it."""
+
+    def __init__(self, failure_threshold: int, reset_after: float):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_after:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_after or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class HFClient:
+    def __init__(self, base_url: str, token: Optional[str], connect_timeout: float = 5.0,
+                 read_timeout: float = 60.0, max_retries: int = 2, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, pool_size: int = 10, breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker(failure_threshold=5, reset_after=30.0)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _headers(self, accept="application/json") -> Dict[str, str]:
+        headers = {"Accept": accept}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # full jitter: uniform in [0, base * 2^attempt]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _post(self, model: str, payload: Dict, stream: bool = False) -> requests.Response:
+        """POST with bounded retries; returns a 2xx response or raises. Updates the breaker
+        whatever happens, so a half-open trial always settles."""
+        if not self.breaker.allow():
+            raise CircuitOpenError("HuggingFace API circuit is open")
+        url = f"{self.base_url}/models/{model}"
+        accept = "text/event-stream" if stream else "application/json"
+        last_error = None
+        settled = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                retry_after = None
+                try:
+                    resp = self.session.post(url, json=payload, headers=self._headers(accept),
+                                             timeout=self.timeout, stream=stream)
+                except RETRYABLE_ERRORS as e:
+                    last_error = e
+                except requests.RequestException as e:
+                    # InvalidURL, SSLError, ...: retrying will not help
+                    last_error = e
+                    break
+                else:
+                    if resp.status_code < 400:
+                        self.breaker.record_success()
+                        settled = True
+                        return resp
+                    last_error = HFRequestError(f"HTTP {resp.status_code}")
+                    retry_after = resp.headers.get("Retry-After")
+                    resp.close()
+                    if resp.status_code in CONFIG_ERROR_STATUS:
+                        break
+                    if resp.status_code not in RETRYABLE_STATUS:
+                        # the endpoint is up and rejected this input: not a breaker failure
+                        self.breaker.record_success()
+                        settled = True
+                        raise last_error
+                if attempt < self.max_retries:
+                    time.sleep(self._backoff(attempt, retry_after))
+        finally:
+            if not settled:
+                self.breaker.record_failure()
+        logger.warning("HuggingFace API call for %s failed: %s (circuit %s)", model, last_error, self.breaker.state)
+        raise HFRequestError(str(last_error))
+
+    def generate(self, prompt: str, model: str, parameters: Dict) -> Optional[str]:
+        resp = self._post(model, {"inputs": prompt, "parameters": parameters})
+        j = resp.json()
+        # HF may return a list of dicts with 'generated_text'
+        if isinstance(j, dict) and 'error' in j:
+            return None
+        if isinstance(j, list) and len(j) > 0:
+            return j[0].get('generated_text') or j[0].get('result') or None
+        if isinstance(j, dict) and 'generated_text' in j:
+            return j['generated_text']
+        return None
+
+    def stream(self, prompt: str, model: str, parameters: Dict) -> Iterator[str]:
+        """Yield generated text pieces as the server streams tokens (server-sent events).
+        Servers that ignore streaming and answer with plain JSON yield a single piece."""
+        resp = self._post(model, {"inputs": prompt, "parameters": parameters, "stream": True}, stream=True)
+        with resp:
+            if "text/event-stream" not in resp.headers.get("Content-Type", ""):
+                j = resp.json()
+                item = j[0] if isinstance(j, list) and j else j
+                if isinstance(item, dict) and item.get("generated_text"):
+                    yield item["generated_text"]
+                return
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    event = json.loads(data)
+                except ValueError:
+                    continue
+                token = (event.get("token") or {})
+                if token.get("special"):
+                    continue
+                if token.get("text"):
+                    yield token["text"]
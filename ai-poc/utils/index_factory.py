@@ -0,0 +1,138 @@
+"""Build, train and query the configured FAISS index type.
+
+INDEX_TYPE selects the structure used by full rebuilds:
+  flat   exact inner-product search (IndexFlatIP behind an IndexIDMap2)
+  ivf    inverted lists over exact vectors (IndexIVFFlat), tuned per query with nprobe
+  ivfpq  inverted lists over product-quantized codes (IndexIVFPQ), far smaller in RAM
+  hnsw   graph index (IndexHNSWFlat behind an IndexIDMap2), tuned per query with efSearch
+
+IVF variants need a training sample; when the corpus is too small to train the
+requested number of lists the factory degrades to a smaller nlist or to flat.
+HNSW cannot delete vectors: removed or replaced ids stay in the graph (and are
+filtered out through the metadata) until the next full rebuild.
+"""
+import logging
+import faiss
+import numpy as np
+from config import (
+    INDEX_TYPE,
+    INDEX_NLIST,
+    INDEX_PQ_M,
+    INDEX_PQ_NBITS,
+    INDEX_HNSW_M,
+    INDEX_HNSW_EF_CONSTRUCTION,
+    INDEX_NPROBE,
+    INDEX_EF_SEARCH,
+    INDEX_TRAIN_SAMPLE,
+)
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf", "ivfpq", "hnsw")
+# faiss k-means wants at least this many training points per centroid
+_MIN_POINTS_PER_CENTROID = 39
+
+
+def flat_index(dim):
+    # use inner product on normalized vectors as cosine similarity
+    return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+
+def create_index(vectors, kind=None, nlist=None):
+    """Return an empty (but trained) index of the requested kind for vectors like these."""
+    kind = (kind or INDEX_TYPE).lower()
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{kind}', expected one of {INDEX_TYPES}")
+    n, dim = vectors.shape
+
+    if kind == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, INDEX_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efConstruction = INDEX_HNSW_EF_CONSTRUCTION
+        hnsw.hnsw.efSearch = INDEX_EF_SEARCH
+        return faiss.IndexIDMap2(hnsw)
+    if kind == "flat":
+        return flat_index(dim)
+
+    nlist = min(nlist or INDEX_NLIST, n // _MIN_POINTS_PER_CENTROID)
+    if kind == "ivfpq" and (dim % INDEX_PQ_M != 0 or n < _MIN_POINTS_PER_CENTROID * (1 << INDEX_PQ_NBITS)):
+        logger.warning("Not enough vectors (%d) or dim %d not divisible by m=%d for IVF-PQ; using IVF-Flat",
+                       n, dim, INDEX_PQ_M)
+        kind = "ivf"
+    if nlist < 2:
+        logger.warning("Not enough vectors (%d) to train an IVF index; using flat", n)
+        return flat_index(dim)
+
+    quantizer = faiss.IndexFlatIP(dim)
+    if kind == "ivfpq":
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, INDEX_PQ_M, INDEX_PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+    else:
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+    index.train(training_sample(vectors))
+    index.nprobe = min(INDEX_NPROBE, nlist)
+    return index
+
+
+def training_sample(vectors, max_points=None):
+    """Uniform random sample of at most max_points rows for k-means training."""
+    max_points = max_points or INDEX_TRAIN_SAMPLE
+    if len(vectors) <= max_points:
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    rows = np.random.default_rng(0).choice(len(vectors), size=max_points, replace=False)
+    return np.ascontiguousarray(vectors[np.sort(rows)], dtype=np.float32)
+
+
+def index_kind(index):
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def search_params(index, nprobe=None, ef_search=None, selector=None):
+    """Per-query search parameters for index, or None to use the index defaults."""
+    kind = index_kind(index)
+    if kind in ("ivf", "ivfpq") and (nprobe or selector is not None):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = int(nprobe or index.nprobe)
+    elif kind == "hnsw" and (ef_search or selector is not None):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = int(ef_search or faiss.downcast_index(index.index).hnsw.efSearch)
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def remove_ids(index, ids):
+    """Remove ids where the index supports it; returns False for HNSW (no deletion)."""
+    try:
+        index.remove_ids(np.asarray(ids, dtype=np.int64))
+        return True
+    except RuntimeError:
+        return False
+
+
+def read_index(path, mmap=False):
+    """Read an index, memory-mapped when requested and supported by the index type."""
+    if mmap:
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP)
+        except RuntimeError:
+            logger.info("Index at %s cannot be memory-mapped; loading into RAM", path)
+    return faiss.read_index(path)
+
+
+def is_read_only(index):
+    """Memory-mapped IVF indexes keep their lists on disk and cannot be modified."""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexIVF):
+        invlists = faiss.downcast_InvertedLists(inner.invlists)
+        return isinstance(invlists, faiss.OnDiskInvertedLists)
+    return False
@@ -0,0 +1,241 @@
+"""Persistent background job queue for long-running extraction work.
+
+Jobs live in a small SQLite database so queued and interrupted work is picked
+up again after a restart. JobRunner drains the queue with a fixed number of
+concurrent asyncio workers and records the current stage and per-stage timings
+as it goes, so clients can poll instead of holding a connection open.
+
+Several server processes share the database. A worker claims a job with a
+conditional UPDATE, so each job runs once, and renews the lease on its running
+jobs while it works; only jobs whose lease has lapsed (their process died) are
+put back in the queue.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    batch_id TEXT,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    payload TEXT NOT NULL,
+    timings TEXT NOT NULL DEFAULT '{}',
+    result_id TEXT,
+    error TEXT,
+    owner TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs(batch_id);
+"""
+
+
+def _now(offset_seconds: float = 0.0):
+    return (datetime.utcnow() + timedelta(seconds=offset_seconds)).isoformat() + "Z"
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            # databases created before jobs were claimed
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+
+    def create(self, kind: str, payload: Dict, batch_id: Optional[str] = None) -> Dict:
+        job_id = str(uuid.uuid4())
+        now = _now()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, batch_id, kind, status, stage, payload, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, batch_id, kind, STATUS_QUEUED, STATUS_QUEUED, json.dumps(payload), now, now),
+            )
+        return self.get(job_id)
+
+    def update(self, job_id: str, **fields):
+        if "timings" in fields:
+            fields["timings"] = json.dumps(fields["timings"])
+        fields["updated_at"] = _now()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def list_batch(self, batch_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE batch_id = ? ORDER BY created_at", (batch_id,)).fetchall()
+        return [_row_to_job(r) for r in rows]
+
+    def claim(self, job_id: str, owner: str) -> Optional[Dict]:
+        """Mark a queued job as running for owner. Returns the job, or None if it was not
+        queued (another worker claimed it first, or it already finished)."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (STATUS_RUNNING, owner, _now(), job_id, STATUS_QUEUED),
+            )
+        return self.get(job_id) if cur.rowcount == 1 else None
+
+    def renew(self, owner: str):
+        """Extend the lease on every job owner is running."""
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET updated_at = ? WHERE owner = ? AND status = ?",
+                               (_now(), owner, STATUS_RUNNING))
+
+    def release(self, job_id: str, owner: str):
+        """Put a job owner is running back in the queue (on shutdown)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, owner = NULL, updated_at = ? "
+                "WHERE id = ? AND owner = ? AND status = ?",
+                (STATUS_QUEUED, STATUS_QUEUED, _now(), job_id, owner, STATUS_RUNNING),
+            )
+
+    def requeue_unfinished(self, lease_seconds: float) -> List[str]:
+        """Reset running jobs whose lease lapsed more than lease_seconds ago back to queued
+        and return all queued ids."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, owner = NULL, updated_at = ? "
+                "WHERE status = ? AND updated_at < ?",
+                (STATUS_QUEUED, STATUS_QUEUED, _now(), STATUS_RUNNING, _now(-lease_seconds)),
+            )
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (STATUS_QUEUED,)).fetchall()
+        return [r["id"] for r in rows]
+
+
+def _row_to_job(row) -> Dict:
+    return {
+        "id": row["id"],
+        "batchId": row["batch_id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "stage": row["stage"],
+        "payload": json.loads(row["payload"]),
+        "timings": json.loads(row["timings"] or "{}"),
+        "resultId": row["result_id"],
+        "error": row["error"],
+        "createdAt": row["created_at"],
+        "updatedAt": row["updated_at"],
+    }
+
+
+# handler(job, enter_stage) -> result id; enter_stage(name) is awaited at each stage boundary
+JobHandler = Callable[[Dict, Callable[[str], Awaitable[None]]], Awaitable[Optional[str]]]
+
+
+class JobRunner:
+    def __init__(self, store: JobStore, handler: JobHandler, concurrency: int, lease_seconds: float = 60.0):
+        self.store = store
+        self.handler = handler
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        # identifies this process's claims in the shared database
+        self.owner = str(uuid.uuid4())
+        self._queue = None
+        self._queued = set()  # ids in _queue, so sweeps do not add them twice
+        self._workers = []
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        await self._sweep()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._workers.append(asyncio.create_task(self._keep_leases()))
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def enqueue(self, job_id: str):
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    async def _sweep(self):
+        """Queue jobs left by dead workers and any queued job not yet in this process's queue.
+        A job queued in a sibling's memory may be picked up here too; the claim decides."""
+        for job_id in await asyncio.to_thread(self.store.requeue_unfinished, self.lease_seconds):
+            self.enqueue(job_id)
+
+    async def _keep_leases(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self.store.renew, self.owner)
+                await self._sweep()
+            except Exception:
+                logger.exception("Job lease renewal failed")
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await asyncio.to_thread(self.store.claim, job_id, self.owner)
+        if job is None:
+            return
+        timings = {}
+        current = {"stage": None, "started": time.perf_counter()}
+
+        def _close_stage():
+            if current["stage"] is not None:
+                timings[current["stage"]] = round((time.perf_counter() - current["started"]) * 1000, 2)
+
+        async def enter_stage(name: str):
+            _close_stage()
+            current["stage"], current["started"] = name, time.perf_counter()
+            await asyncio.to_thread(self.store.update, job_id, status=STATUS_RUNNING, stage=name, timings=timings)
+
+        try:
+            result_id = await self.handler(job, enter_stage)
+            _close_stage()
+            await asyncio.to_thread(self.store.update, job_id, status=STATUS_DONE, stage=STATUS_DONE,
+                                    timings=timings, result_id=result_id)
+        except asyncio.CancelledError:
+            # shutting down: hand the job back rather than leave it to wait out its lease;
+            # off the loop, and shielded so a second cancel does not abandon the write
+            await asyncio.shield(asyncio.to_thread(self.store.release, job_id, self.owner))
+            raise
+        except Exception as e:
+            _close_stage()
+            await asyncio.to_thread(self.store.update, job_id, status=STATUS_FAILED, timings=timings,
+                                    error=str(e))
@@ -0,0 +1,268 @@
+"""Columnar, memory-mapped metadata for the search index: one row per indexed chunk.
+
+A snapshot's meta.bin holds fixed-width columns sorted by vector id (vid, doc,
+chunk, start, end) plus two offset-indexed UTF-8 blobs: the snippets, and a doc
+table with each extraction's id, caseId and sourceFile. Loading maps the file
+read-only, so every worker shares the page cache instead of parsing JSON into a
+dict per chunk, and a search decodes only the rows it returns.
+
+Updates replayed from the snapshot's log go to an in-memory delta (upserted items
+plus removed base rows); save() folds base and delta into a new file.
+
+File layout: MAGIC, 8-byte little-endian header length, JSON header
+{"rows", "docs", "sections": {name: [offset, dtype, count]}}, then the sections,
+each 8-byte aligned; offsets count from the first section.
+"""
+import bisect
+import json
+import mmap
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+MAGIC = b"AIMETA1\n"
+_ALIGN = 8
+# doc table string fields, stored per doc in this order
+_DOC_FIELDS = ("id", "caseId", "sourceFile")
+
+
+def _aligned(n: int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+
+def _encode_strings(values: List[Optional[str]]):
+    """(blob, offsets, null flags) for a list of optional strings."""
+    encoded = [(v if v is not None else "").encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    nulls = np.array([v is None for v in values], dtype=np.uint8)
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets, nulls
+
+
+def _gather(blob: np.ndarray, offsets: np.ndarray, rows: np.ndarray):
+    """Blob and offsets holding only the given rows' byte spans, in that order."""
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    new_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    # position i of the new blob reads blob[starts[row] + (i - new_offsets[row])]
+    index = np.repeat(starts - new_offsets[:-1], lengths) + np.arange(new_offsets[-1], dtype=np.int64)
+    return blob[index], new_offsets
+
+
+class MetaStore:
+    """Vector id -> meta item ({vid, id, caseId, sourceFile, chunk, start, end, snippet})."""
+
+    def __init__(self):
+        self._mmap = None
+        self._cols = {
+            "vid": np.zeros(0, dtype=np.int64),
+            "doc": np.zeros(0, dtype=np.int32),
+            "chunk": np.zeros(0, dtype=np.int32),
+            "start": np.zeros(0, dtype=np.int32),
+            "end": np.zeros(0, dtype=np.int32),
+            "snippet_offsets": np.zeros(1, dtype=np.int64),
+            "snippets": np.zeros(0, dtype=np.uint8),
+            "doc_offsets": np.zeros(1, dtype=np.int64),
+            "doc_strings": np.zeros(0, dtype=np.uint8),
+            "doc_nulls": np.zeros(0, dtype=np.uint8),
+        }
+        self._removed = set()  # base rows dropped or replaced since load
+        self._delta = {}  # vid -> item upserted since load
+        self._delta_vids = []  # sorted keys of _delta, for range lookups
+
+    # -- building and persistence --
+
+    @classmethod
+    def from_items(cls, items: Iterable[Dict]) -> "MetaStore":
+        store = cls()
+        store._set_base(cls._columns(list(items)), None)
+        return store
+
+    @staticmethod
+    def _columns(items: List[Dict]):
+        items = sorted(items, key=lambda m: m["vid"])
+        docs = {}  # (id, caseId, sourceFile) -> doc row
+        doc_rows = [docs.setdefault(tuple(m.get(f) for f in _DOC_FIELDS), len(docs)) for m in items]
+        snippets, snippet_offsets, _ = _encode_strings([m.get("snippet") or "" for m in items])
+        doc_strings, doc_offsets, doc_nulls = _encode_strings([v for doc in docs for v in doc])
+        cols = {
+            "vid": np.array([m["vid"] for m in items], dtype=np.int64),
+            "doc": np.array(doc_rows, dtype=np.int32),
+            "chunk": np.array([m.get("chunk") or 0 for m in items], dtype=np.int32),
+            "start": np.array([m.get("start") or 0 for m in items], dtype=np.int32),
+            "end": np.array([m.get("end") or 0 for m in items], dtype=np.int32),
+            "snippet_offsets": snippet_offsets,
+            "snippets": snippets,
+            "doc_offsets": doc_offsets,
+            "doc_strings": doc_strings,
+            "doc_nulls": doc_nulls,
+        }
+        return cols
+
+    def _set_base(self, cols, mapped):
+        self._cols = cols
+        # the column views keep the mapping alive; it closes when the store is collected
+        self._mmap = mapped
+        self._removed = set()
+        self._delta = {}
+        self._delta_vids = []
+
+    @classmethod
+    def load(cls, path: str) -> "MetaStore":
+        """Map meta.bin read-only; columns are views into the mapping, nothing is parsed per row."""
+        store = cls()
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:len(MAGIC)] != MAGIC:
+            mapped.close()
+            raise ValueError(f"{path} is not an index metadata file")
+        header_len = int.from_bytes(mapped[len(MAGIC):len(MAGIC) + 8], "little")
+        header = json.loads(mapped[len(MAGIC) + 8:len(MAGIC) + 8 + header_len])
+        data_start = _aligned(len(MAGIC) + 8 + header_len)
+        cols = {name: np.frombuffer(mapped, dtype=np.dtype(dtype), count=count, offset=data_start + offset)
+                for name, (offset, dtype, count) in header["sections"].items()}
+        store._set_base(cols, mapped)
+        return store
+
+    def _merged_columns(self):
+        """Columns of base (minus removed rows) plus delta, sorted by vid."""
+        base = self._cols
+        if not self._delta and not self._removed:
+            return base
+        keep = np.ones(len(base["vid"]), dtype=bool)
+        if self._removed:
+            keep[list(self._removed)] = False
+        rows = np.flatnonzero(keep)
+
+        # keep only docs still referenced, renumbered in order
+        used_docs = np.unique(base["doc"][rows])
+        doc_field_rows = (used_docs[:, None] * len(_DOC_FIELDS) + np.arange(len(_DOC_FIELDS))).ravel()
+        doc_strings, doc_offsets = _gather(base["doc_strings"], base["doc_offsets"], doc_field_rows)
+        snippets, snippet_offsets = _gather(base["snippets"], base["snippet_offsets"], rows)
+        kept = {
+            "vid": base["vid"][rows],
+            "doc": np.searchsorted(used_docs, base["doc"][rows]).astype(np.int32),
+            "chunk": base["chunk"][rows],
+            "start": base["start"][rows],
+            "end": base["end"][rows],
+        }
+        if not self._delta:
+            return dict(kept, snippet_offsets=snippet_offsets, snippets=snippets, doc_offsets=doc_offsets,
+                        doc_strings=doc_strings, doc_nulls=base["doc_nulls"][doc_field_rows])
+
+        added = self._columns(list(self._delta.values()))
+        n_docs = len(used_docs)
+        order = np.argsort(np.concatenate([kept["vid"], added["vid"]]), kind="stable")
+        merged = {name: np.concatenate([kept[name], added[name] + (n_docs if name == "doc" else 0)])[order]
+                  for name in ("vid", "doc", "chunk", "start", "end")}
+        all_snippets = np.concatenate([snippets, added["snippets"]])
+        all_offsets = np.concatenate([snippet_offsets, added["snippet_offsets"][1:] + snippet_offsets[-1]])
+        merged["snippets"], merged["snippet_offsets"] = _gather(all_snippets, all_offsets, order)
+        merged["doc_strings"] = np.concatenate([doc_strings, added["doc_strings"]])
+        merged["doc_offsets"] = np.concatenate([doc_offsets, added["doc_offsets"][1:] + doc_offsets[-1]])
+        merged["doc_nulls"] = np.concatenate([base["doc_nulls"][doc_field_rows], added["doc_nulls"]])
+        return merged
+
+    def save(self, path: str):
+        """Write base and delta as one file; the store itself is unchanged."""
+        cols = self._merged_columns()
+        sections = {}
+        size = 0
+        for name, arr in cols.items():
+            size = _aligned(size)
+            sections[name] = [size, arr.dtype.str, int(arr.size)]
+            size += arr.nbytes
+        header = json.dumps({"rows": int(cols["vid"].size), "docs": int(cols["doc_nulls"].size // len(_DOC_FIELDS)),
+                             "sections": sections}).encode("utf-8")
+        data_start = _aligned(len(MAGIC) + 8 + len(header))
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            for name, arr in cols.items():
+                f.seek(data_start + sections[name][0])
+                f.write(np.ascontiguousarray(arr).tobytes())
+            # empty trailing sections still need their offsets inside the file
+            f.truncate(data_start + size)
+
+    # -- reads --
+
+    def __len__(self):
+        return len(self._cols["vid"]) - len(self._removed) + len(self._delta)
+
+    def _row(self, vid: int) -> int:
+        vids = self._cols["vid"]
+        row = int(np.searchsorted(vids, vid))
+        if row < len(vids) and vids[row] == vid and row not in self._removed:
+            return row
+        return -1
+
+    def __contains__(self, vid) -> bool:
+        return vid in self._delta or self._row(vid) >= 0
+
+    def _doc_field(self, doc: int, field: int) -> Optional[str]:
+        i = doc * len(_DOC_FIELDS) + field
+        if self._cols["doc_nulls"][i]:
+            return None
+        start, end = self._cols["doc_offsets"][i:i + 2]
+        return self._cols["doc_strings"][start:end].tobytes().decode("utf-8")
+
+    def doc_id(self, vid: int) -> Optional[str]:
+        """Extraction id of a chunk, without decoding the rest of its row."""
+        item = self._delta.get(vid)
+        if item is not None:
+            return item.get("id")
+        row = self._row(vid)
+        return self._doc_field(int(self._cols["doc"][row]), 0) if row >= 0 else None
+
+    def get(self, vid: int) -> Optional[Dict]:
+        item = self._delta.get(vid)
+        if item is not None:
+            return item
+        row = self._row(vid)
+        if row < 0:
+            return None
+        cols = self._cols
+        doc = int(cols["doc"][row])
+        start, end = cols["snippet_offsets"][row:row + 2]
+        return {
+            "vid": int(cols["vid"][row]),
+            "id": self._doc_field(doc, 0),
+            "caseId": self._doc_field(doc, 1),
+            "sourceFile": self._doc_field(doc, 2),
+            "chunk": int(cols["chunk"][row]),
+            "start": int(cols["start"][row]),
+            "end": int(cols["end"][row]),
+            "snippet": cols["snippets"][start:end].tobytes().decode("utf-8"),
+        }
+
+    def vids_between(self, lo: int, hi: int) -> List[int]:
+        """Vector ids in [lo, hi], ascending."""
+        vids = self._cols["vid"]
+        first, last = np.searchsorted(vids, lo, "left"), np.searchsorted(vids, hi, "right")
+        found = {int(vids[row]) for row in range(first, last) if row not in self._removed}
+        found.update(self._delta_vids[bisect.bisect_left(self._delta_vids, lo):
+                                      bisect.bisect_right(self._delta_vids, hi)])
+        return sorted(found)
+
+    # -- updates --
+
+    def upsert(self, items: Iterable[Dict]):
+        for m in items:
+            vid = m["vid"]
+            row = self._row(vid)
+            if row >= 0:
+                self._removed.add(row)
+            if vid not in self._delta:
+                bisect.insort(self._delta_vids, vid)
+            self._delta[vid] = m
+
+    def remove(self, vids: Iterable[int]):
+        for vid in vids:
+            if self._delta.pop(vid, None) is not None:
+                del self._delta_vids[bisect.bisect_left(self._delta_vids, vid)]
+            row = self._row(vid)
+            if row >= 0:
+                self._removed.add(row)
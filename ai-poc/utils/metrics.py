@@ -0,0 +1,258 @@
+"""Process-local counters and latency histograms, rendered in the Prometheus text format.
+
+Hot paths record named stages with timed("ocr") / record_stage(); each stage feeds
+the ai_stage_duration_seconds histogram and, while a request is being served, the
+request's own timing list (sent back as a Server-Timing header when enabled).
+
+Work run on a process-pool stage records into the child's registry; call_collecting
+ships those observations back with the result and merge() folds them into the
+parent, so /metrics covers NER and redaction too. Every uvicorn worker keeps its
+own registry; scrape each worker (or aggregate by instance) when running several.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = OrderedDict()  # metric name -> metric
+_registry_lock = threading.Lock()
+# process that owns the registry contents; a forked pool worker starts with a copy of its parent's
+_owner_pid = os.getpid()
+
+# (stage, seconds) recorded while serving the current request, or None outside a request
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _label_key(labelnames, labels) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labelnames, key, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(labelnames, key)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _merge_value(self, key, value):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def _drain(self):
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def _render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value:g}" for key, value in items]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label key -> [per-bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        slot = next((i for i, b in enumerate(self.buckets) if value <= b), len(self.buckets))
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            data[0][slot] += 1
+            data[1] += value
+            data[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _merge_value(self, key, value):
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                self._values[key] = [list(value[0]), value[1], value[2]]
+                return
+            data[0] = [a + b for a, b in zip(data[0], value[0])]
+            data[1] += value[1]
+            data[2] += value[2]
+
+    def _drain(self):
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def _render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(d[0]), d[1], d[2])) for key, d in self._values.items())
+        lines = []
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + ["+Inf"], counts):
+                cumulative += count
+                le = bound if isinstance(bound, str) else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+def _get_or_create(cls, name, help, labelnames, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, help, labelnames, **kwargs)
+        return metric
+
+
+def counter(name: str, help: str, labelnames=()) -> Counter:
+    return _get_or_create(Counter, name, help, labelnames)
+
+
+def histogram(name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return _get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+
+STAGE_SECONDS = histogram("ai_stage_duration_seconds", "Time spent in each processing stage.", ["stage"])
+MODEL_LOAD_SECONDS = histogram("ai_model_load_seconds", "Time to load a model into memory.", ["kind", "model"],
+                               buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+FALLBACKS = counter("ai_fallback_total", "Requests served by a degraded fallback path.", ["component", "reason"])
+
+
+def record_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def model_load(kind: str, model: str):
+    """Time a model load into ai_model_load_seconds (and the request's 'model_load' stage)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        MODEL_LOAD_SECONDS.observe(seconds, kind=kind, model=model)
+        record_stage("model_load", seconds)
+
+
+def fallback(component: str, reason: str):
+    FALLBACKS.inc(component=component, reason=reason)
+
+
+def start_request() -> Tuple[List, contextvars.Token]:
+    timings = []
+    return timings, _request_timings.set(timings)
+
+
+def end_request(token: contextvars.Token):
+    _request_timings.reset(token)
+
+
+def server_timing(timings) -> str:
+    """Server-Timing header value; repeated stages (e.g. OCR pages) are summed."""
+    totals = OrderedDict()
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
+
+
+def drain() -> Dict:
+    """Take (and reset) everything recorded in this process, in a picklable form."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    out = {}
+    for m in metrics:
+        values = m._drain()
+        if values:
+            out[m.name] = {"type": m.type, "help": m.help, "labelnames": m.labelnames,
+                           "buckets": getattr(m, "buckets", None), "values": values}
+    return out
+
+
+def merge(delta: Optional[Dict]):
+    """Fold a drain() result from a worker process into this process's registry."""
+    if not delta:
+        return
+    for stage, seconds in delta.get("timings", ()):
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, seconds))
+    for name, data in delta.get("metrics", {}).items():
+        if data["type"] == "histogram":
+            metric = histogram(name, data["help"], data["labelnames"], data["buckets"])
+        else:
+            metric = counter(name, data["help"], data["labelnames"])
+        for key, value in data["values"].items():
+            metric._merge_value(key, value)
+
+
+def call_collecting(fn, *args, **kwargs):
+    """Run fn in a pool worker process; return (result, metrics recorded while it ran)."""
+    global _owner_pid
+    if os.getpid() != _owner_pid:
+        # drop what was inherited from the parent at fork time so it is not counted twice
+        drain()
+        _owner_pid = os.getpid()
+    timings, token = start_request()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        end_request(token)
+    return result, {"metrics": drain(), "timings": timings}
+
+
+def render() -> str:
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines = []
+    for m in metrics:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.type}")
+        lines.extend(m._render())
+    return "\n".join(lines) + "\n"
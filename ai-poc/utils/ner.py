@@ -1,52 +1,107 @@
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, List, Optional
+from config import SPACY_MODEL, SPACY_DISABLED_PIPES, NER_BATCH_SIZE, NER_N_PROCESS
+from utils import metrics
+from utils.redaction import Redactor
 
 IPC_REGEX = re.compile(r"IPC\s*\d{1,4}", re.IGNORECASE)
 DATE_REGEX = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
 PHONE_REGEX = re.compile(r"\b\d{10,13}\b")
 
+_nlp = None
+_nlp_unavailable = False
+
+
+def _get_nlp():
+    """Return the process-wide spaCy pipeline, loading it once. Returns None if spaCy
+    or the model is not installed."""
+    global _nlp, _nlp_unavailable
+    if _nlp is not None or _nlp_unavailable:
+        return _nlp
+    try:
+        import spacy
+        with metrics.model_load("spacy", SPACY_MODEL):
+            nlp = spacy.load(SPACY_MODEL, disable=SPACY_DISABLED_PIPES)
+        # the shared tok2vec is only needed if ner listens to it (not the case for en_core_web_sm)
+        if "tok2vec" in nlp.pipe_names and "ner" not in nlp.get_pipe("tok2vec").listening_components:
+            nlp.disable_pipe("tok2vec")
+        _nlp = nlp
+    except Exception:
+        # spaCy not available or model not installed; names will be skipped
+        _nlp_unavailable = True
+    return _nlp
+
+
+def warm_up() -> bool:
+    """Load the spaCy pipeline and run it once. Returns False if spaCy is unavailable."""
+    nlp = _get_nlp()
+    if nlp is None:
+        return False
+    nlp("Warm up the pipeline.")
+    return True
+
+
+def spacy_loaded() -> bool:
+    return _nlp is not None
+
 
 def _redact_names(text: str, names: list) -> str:
-    redacted = text
-    for name in sorted(set(names), key=len, reverse=True):
-        if not name.strip():
-            continue
-        redacted = re.sub(re.escape(name), "[REDACTED]", redacted)
+    redacted, _ = Redactor({"names": names}).redact(text)
     return redacted
 
 
-def extract_entities(text: str) -> Dict[str, Any]:
-    """Extract simple entities (sections, dates, phones, names) and return
-    a dict with entities and a redacted_text field."""
+def _build_result(text: str, doc=None) -> Dict[str, Any]:
     entities = {
         "sections": IPC_REGEX.findall(text),
         "dates": DATE_REGEX.findall(text),
         "phones": PHONE_REGEX.findall(text),
         "names": [],
     }
+    if doc is not None:
+        entities["names"] = [ent.text for ent in doc.ents if ent.label_ in ("PERSON", "ORG")]
 
-    # Try to use spaCy if installed
-    try:
-        import spacy
-        nlp = spacy.load("en_core_web_sm")
-        doc = nlp(text)
-        names = [ent.text for ent in doc.ents if ent.label_ in ("PERSON", "ORG")]
-        entities["names"] = names
-    except Exception:
-        # spaCy not available or model not installed; skip names
-        entities["names"] = []
-
-    # Create redacted text by replacing phones and names
-    redacted = text
-    for phone in entities["phones"]:
-        redacted = redacted.replace(phone, "[REDACTED_PHONE]")
-
-    redacted = _redact_names(redacted, entities.get("names", []))
+    # Redact spans from every detector in one pass (phones and names by default)
+    with metrics.timed("redaction"):
+        redacted, redactions = Redactor(entities).redact(text)
 
     result = {
         "entities": entities,
         "redactedText": redacted,
+        "redactions": redactions,
         "confidence": 0.9,
     }
     return result
 
+
+def extract_entities(text: str) -> Dict[str, Any]:
+    """Extract simple entities (sections, dates, phones, names) and return
+    a dict with entities and a redacted_text field."""
+    nlp = _get_nlp()
+    doc = None
+    if nlp is None:
+        metrics.fallback("ner", "spacy_unavailable")
+    else:
+        try:
+            with metrics.timed("spacy"):
+                doc = nlp(text)
+        except Exception:
+            metrics.fallback("ner", "spacy_error")
+            doc = None
+    return _build_result(text, doc)
+
+
+def extract_entities_batch(texts: Iterable[str], batch_size: Optional[int] = None,
+                           n_process: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Batched variant of extract_entities for bulk jobs. Streams texts through
+    nlp.pipe and returns one result per input text, in order."""
+    texts = [t or "" for t in texts]
+    nlp = _get_nlp()
+    if nlp is None:
+        metrics.fallback("ner", "spacy_unavailable")
+        return [_build_result(t) for t in texts]
+    docs = nlp.pipe(
+        texts,
+        batch_size=batch_size or NER_BATCH_SIZE,
+        n_process=n_process or NER_N_PROCESS,
+    )
+    return [_build_result(t, doc) for t, doc in zip(texts, docs)]
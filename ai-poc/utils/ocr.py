@@ -1,33 +1,264 @@
-from PIL import Image
+from PIL import Image, ImageSequence
 import pytesseract
+import hashlib
 import io
+import mmap
+import os
+import time
+import threading
 import pdfplumber
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from config import (
+    OCR_WORKERS,
+    OCR_MAX_INFLIGHT_PAGES,
+    OCR_PDF_DPI,
+    OCR_PREPROCESS,
+    OCR_TARGET_DPI,
+    OCR_MAX_SIDE,
+    OCR_PSM,
+    OCR_CACHE_DIR,
+)
+from utils import metrics
+from utils import ocr_preprocess
 
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+CACHE_DIR = (OCR_CACHE_DIR if os.path.isabs(OCR_CACHE_DIR) else os.path.join(BASE_DIR, OCR_CACHE_DIR)) \
+    if OCR_CACHE_DIR else None
 
-def image_to_text(file_bytes: bytes) -> str:
-    """Run OCR on image bytes or extract text from a PDF. Returns extracted text."""
-    # Try image OCR first
+_pool = None
+_pool_lock = threading.Lock()
+
+_PAGE_SECONDS = metrics.histogram("ai_ocr_page_seconds", "Time to get the text of one page.", ["method"])
+
+
+def _get_pool():
+    """Process pool of tesseract workers shared by all requests; None means OCR inline."""
+    global _pool
+    if OCR_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS)
+    return _pool
+
+
+def _tesseract_version(_=None):
     try:
-        img = Image.open(io.BytesIO(file_bytes))
-        text = pytesseract.image_to_string(img)
-        if text and text.strip():
-            return text
-    except Exception:
-        pass
+        return str(pytesseract.get_tesseract_version())
+    except Exception as e:
+        # TesseractNotFoundError does not survive pickling back from a pool worker
+        raise RuntimeError(str(e)) from None
+
+
+def warm_up() -> str:
+    """Start the OCR worker processes and check tesseract is callable. Returns its version."""
+    pool = _get_pool()
+    if pool is None:
+        return _tesseract_version()
+    # one call per worker so every process is forked before the first upload
+    return list(pool.map(_tesseract_version, range(OCR_WORKERS)))[0]
 
-    # Try PDF text extraction
+
+def _ocr_image(img):
+    """Worker: preprocess and OCR one page image. Returns (text, milliseconds)."""
+    start = time.perf_counter()
+    config = ""
+    if OCR_PREPROCESS:
+        try:
+            img, psm = ocr_preprocess.prepare(img)
+            config = f"--psm {psm}"
+        except Exception:
+            pass
     try:
-        with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-            pages = [p.extract_text() or "" for p in pdf.pages]
-            text = "\n".join(pages)
-            if text.strip():
-                return text
+        text = pytesseract.image_to_string(img, config=config)
     except Exception:
+        # tesseract missing or failed on this page; keep the other pages
+        text = ""
+    return text, (time.perf_counter() - start) * 1000
+
+
+def _page_key(img) -> str:
+    """Hash of a page's pixels and the OCR settings that affect its text."""
+    h = hashlib.sha256(f"{img.mode}|{img.size}|{img.info.get('dpi')}|{OCR_PREPROCESS}|"
+                       f"{ocr_preprocess.VERSION}|{OCR_TARGET_DPI}|{OCR_MAX_SIDE}|{OCR_PSM}".encode("utf-8"))
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(CACHE_DIR, key[:2], key + ".txt")
+
+
+def _cache_get(key):
+    try:
+        with open(_cache_path(key), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _cache_put(key, text):
+    path = _cache_path(key)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except OSError:
         pass
 
-    # Fallback: try plain text decode
+
+class _Done:
+    """Already-finished result, so text-layer pages and OCR futures share one queue."""
+
+    def __init__(self, value):
+        self._value = value
+
+    def result(self):
+        return self._value
+
+
+def _iter_image_pages(img):
+    """Yield ('image', frame, None) for every frame of an image (multi-frame TIFFs have many)."""
+    for frame in ImageSequence.Iterator(img):
+        yield "image", frame.copy(), None
+
+
+def _render_page(page):
+    """Rasterize a PDF page at OCR_PDF_DPI, lowered so oversized pages stay within OCR_MAX_SIDE."""
+    resolution = OCR_PDF_DPI
+    longest_in = max(float(page.width), float(page.height)) / 72.0
+    if OCR_MAX_SIDE > 0 and longest_in * resolution > OCR_MAX_SIDE:
+        resolution = max(72, int(OCR_MAX_SIDE / longest_in))
+    img = page.to_image(resolution=resolution).original.copy()
+    img.info["dpi"] = (resolution, resolution)
+    return img
+
+
+def _iter_pdf_pages(pdf):
+    """Yield ('text', text, ms) for pages with a text layer and ('image', rendered page, None) otherwise."""
+    for page in pdf.pages:
+        try:
+            start = time.perf_counter()
+            text = page.extract_text() or ""
+            if text.strip():
+                yield "text", text, (time.perf_counter() - start) * 1000
+            else:
+                yield "image", _render_page(page), None
+        finally:
+            # drop parsed objects as we go so large bundles stream through
+            page.close()
+
+
+def _run_pages(pages):
+    """Run a page stream through the OCR pool, keeping at most OCR_MAX_INFLIGHT_PAGES
+    in flight. Returns per-page results in page order."""
+    pool = _get_pool()
+    pending = deque()
+    results = []
+
+    def _drain(limit):
+        while len(pending) > limit:
+            page_no, method, fut, key = pending.popleft()
+            text, ms = fut.result()
+            _PAGE_SECONDS.observe(ms / 1000, method=method)
+            if key is not None and text.strip():
+                _cache_put(key, text)
+            results.append({"page": page_no, "method": method, "ms": round(ms, 2), "text": text})
+
+    for page_no, (kind, payload, ms) in enumerate(pages, start=1):
+        if kind == "text":
+            pending.append((page_no, "text-layer", _Done((payload, ms)), None))
+            _drain(OCR_MAX_INFLIGHT_PAGES)
+            continue
+        key = _page_key(payload) if CACHE_DIR is not None else None
+        cached = _cache_get(key) if key is not None else None
+        if cached is not None:
+            pending.append((page_no, "cache", _Done((cached, 0.0)), None))
+        elif pool is not None:
+            pending.append((page_no, "ocr", pool.submit(_ocr_image, payload), key))
+        else:
+            pending.append((page_no, "ocr", _Done(_ocr_image(payload)), key))
+        _drain(OCR_MAX_INFLIGHT_PAGES)
+    _drain(0)
+    return results
+
+
+@contextmanager
+def _open_source(source):
+    """Bytes, or a path to a file that is memory-mapped rather than read into memory;
+    yields a buffer (bytes or mmap, None for an empty file)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield source
+        return
+    with open(source, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield None
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield buf
+
+
+def _stream(buf):
+    # an mmap is itself a seekable file object; PIL and pdfminer read it in place
+    if isinstance(buf, mmap.mmap):
+        buf.seek(0)
+        return buf
+    return io.BytesIO(buf)
+
+
+def _ocr_buffer(buf):
+    pages = None
     try:
-        return file_bytes.decode("utf-8", errors="ignore")
+        with Image.open(_stream(buf)) as img:
+            pages = _run_pages(_iter_image_pages(img))
     except Exception:
-        return ""
+        pass
+
+    if pages is None or not any(p["text"].strip() for p in pages):
+        try:
+            with pdfplumber.open(_stream(buf)) as pdf:
+                pages = _run_pages(_iter_pdf_pages(pdf))
+        except Exception:
+            if pages is None:
+                return None
+
+    text = "\n".join(p["text"] for p in pages)
+    return {
+        "text": text,
+        "pages": [{"page": p["page"], "method": p["method"], "ms": p["ms"], "chars": len(p["text"])}
+                  for p in pages],
+    }
+
+
+def ocr_document(source):
+    """Page-level OCR of an image, multi-frame TIFF or PDF, given as bytes or a file path.
+    Pages with a text layer use it; image-only pages go to the tesseract process pool.
+    Returns {"text", "pages": [{"page", "method", "ms", "chars"}]} or None if the file is
+    neither an image nor a PDF."""
+    with _open_source(source) as buf:
+        return _ocr_buffer(buf) if buf is not None else None
+
+
+def image_to_text(source) -> str:
+    """Run OCR on an image or extract text from a PDF, given as bytes or a file path.
+    Returns extracted text."""
+    with _open_source(source) as buf:
+        if buf is None:
+            return ""
+        try:
+            result = _ocr_buffer(buf)
+            if result and result["text"].strip():
+                return result["text"]
+        except Exception:
+            pass
 
+        # Fallback: try plain text decode
+        metrics.fallback("ocr", "plain_text")
+        try:
+            return str(buf, "utf-8", errors="ignore")
+        except Exception:
+            return ""
@@ -0,0 +1,134 @@
+"""Page image preprocessing before tesseract: rescale, grayscale, binarize, deskew,
+and a page segmentation mode chosen from the page layout.
+
+Phone photos of FIRs arrive as 12+ megapixel colour images, often slightly
+rotated; tesseract is slower and less accurate on them than on a clean ~300 DPI
+bilevel page. Runs in the OCR worker processes, using PIL and numpy only.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from config import OCR_DESKEW_MAX_ANGLE, OCR_MAX_SIDE, OCR_PSM, OCR_TARGET_DPI
+
+# bump when the pipeline changes so cached OCR results of the old one are not reused
+VERSION = 1
+
+# longest side of the copy used to measure skew and layout
+_ANALYSIS_SIDE = 1000
+
+
+def _source_dpi(img: Image.Image) -> Optional[float]:
+    dpi = img.info.get("dpi")
+    try:
+        value = float(dpi[0] if isinstance(dpi, (tuple, list)) else dpi)
+    except (TypeError, ValueError, IndexError):
+        return None
+    # 72/96 are what cameras and screenshots write when they do not know
+    return value if value > 0 and value not in (72.0, 96.0) else None
+
+
+def target_scale(img: Image.Image) -> float:
+    """Resize factor that brings the page to OCR_TARGET_DPI (when its DPI is known)
+    and its longest side to at most OCR_MAX_SIDE."""
+    scale = 1.0
+    dpi = _source_dpi(img)
+    if dpi and (dpi > OCR_TARGET_DPI * 1.2 or dpi < OCR_TARGET_DPI * 0.75):
+        scale = OCR_TARGET_DPI / dpi
+    longest = max(img.size) * scale
+    if OCR_MAX_SIDE > 0 and longest > OCR_MAX_SIDE:
+        scale *= OCR_MAX_SIDE / longest
+    return scale
+
+
+def otsu_threshold(hist) -> int:
+    """Otsu's threshold for a 256-bin grayscale histogram (Image.histogram())."""
+    hist = np.asarray(hist, dtype=np.float64)
+    p = hist / max(hist.sum(), 1.0)
+    omega = np.cumsum(p)
+    mu = np.cumsum(p * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mu[-1] * omega - mu) ** 2 / (omega * (1.0 - omega))
+    return int(np.nanargmax(np.nan_to_num(between, nan=-1.0)))
+
+
+def _analysis_mask(gray: Image.Image, threshold: int, dark_text: bool) -> np.ndarray:
+    factor = min(1.0, _ANALYSIS_SIDE / max(gray.size))
+    small = gray.resize((max(1, round(gray.width * factor)), max(1, round(gray.height * factor))), Image.BOX)
+    arr = np.asarray(small)
+    return arr <= threshold if dark_text else arr > threshold
+
+
+def _profile_score(mask: Image.Image, angle: float) -> float:
+    # text lines aligned with the rows give the sharpest row-sum profile
+    rows = np.asarray(mask.rotate(angle, resample=Image.NEAREST, fillcolor=0), dtype=bool).sum(axis=1)
+    return float(np.sum(np.diff(rows.astype(np.float64)) ** 2))
+
+
+def skew_angle(mask: np.ndarray, max_angle: float = OCR_DESKEW_MAX_ANGLE) -> float:
+    """Rotation (degrees, counter-clockwise) that levels the text lines of an ink mask."""
+    if max_angle <= 0 or not mask.any():
+        return 0.0
+    image = Image.fromarray(mask.astype(np.uint8) * 255)
+    coarse = np.arange(-max_angle, max_angle + 1e-9, 0.5)
+    best = max(coarse, key=lambda a: _profile_score(image, a))
+    fine = np.arange(best - 0.4, best + 0.41, 0.1)
+    return float(max(fine, key=lambda a: _profile_score(image, a)))
+
+
+def choose_psm(mask: np.ndarray) -> int:
+    """7 for a single text line, 3 (automatic layout) for multi-column pages, else 6
+    (one uniform block, the usual FIR page)."""
+    ink = mask.sum(axis=1)
+    if not ink.any():
+        return 6
+    # rows inked well beyond descenders and specks; gaps of a row or two do not split a line
+    rows = ink > 0.05 * ink.max()
+    inked_rows = np.flatnonzero(rows)
+    lines = 1 + int(np.count_nonzero(np.diff(inked_rows) > 3))
+    if lines <= 1:
+        return 7
+    cols = mask.sum(axis=0) > 0
+    inked = np.flatnonzero(cols)
+    if inked.size:
+        width = inked[-1] - inked[0] + 1
+        body = cols[inked[0]:inked[-1] + 1]
+        # a blank gutter wider than 3% of the text width, away from the edges
+        gap = run = 0
+        for i, ink in enumerate(body):
+            run = 0 if ink else run + 1
+            if 0.2 * width < i < 0.8 * width:
+                gap = max(gap, run)
+        if gap > 0.03 * width:
+            return 3
+    return 6
+
+
+def prepare(img: Image.Image) -> Tuple[Image.Image, int]:
+    """Preprocess a page for tesseract. Returns (bilevel 'L' image, psm)."""
+    img = ImageOps.exif_transpose(img)
+    gray = img.convert("L")
+    scale = target_scale(gray)
+    if abs(scale - 1.0) > 0.05:
+        size = (max(1, round(gray.width * scale)), max(1, round(gray.height * scale)))
+        # BOX averages whole source pixels when shrinking: close to LANCZOS for text, several times faster
+        gray = gray.resize(size, Image.BOX if scale < 1 else Image.BICUBIC)
+
+    hist = gray.histogram()
+    threshold = otsu_threshold(hist)
+    # text is the minority class; light text on a dark background is inverted
+    dark_text = sum(hist[:threshold + 1]) <= gray.width * gray.height / 2
+    mask = _analysis_mask(gray, threshold, dark_text)
+
+    angle = skew_angle(mask)
+    if abs(angle) >= 0.1:
+        background = 255 if dark_text else 0
+        gray = gray.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=background)
+        mask = _analysis_mask(gray, threshold, dark_text)
+
+    # black text on white, via a lookup table
+    lut = [0 if (v <= threshold) == dark_text else 255 for v in range(256)]
+    binary = gray.point(lut)
+    psm = choose_psm(mask) if OCR_PSM == "auto" else int(OCR_PSM)
+    return binary, psm
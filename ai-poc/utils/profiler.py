@@ -0,0 +1,75 @@
+"""Opt-in sampling profiler for slow requests.
+
+A daemon thread samples every thread's Python stack each PROFILE_INTERVAL_MS
+into a bounded ring buffer. When a request takes longer than
+PROFILE_SLOW_REQUEST_MS, the samples taken during it are written to
+PROFILE_DIR as collapsed stacks ("frame;frame;frame count" per line), ready for
+flamegraph.pl or speedscope. Samples cover the whole process, so concurrent
+requests show up in each other's profiles; work done in process-pool workers is
+not sampled.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+# leaf frames in these files are threads parked waiting for work
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "thread.py")
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SlowRequestProfiler:
+    def __init__(self, threshold_ms: float, interval_ms: float, out_dir: str, max_samples: int = 200000):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.out_dir = out_dir
+        self._samples = deque(maxlen=max_samples)  # (monotonic time, thread name, collapsed stack)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            os.makedirs(self.out_dir, exist_ok=True)
+            self._thread = threading.Thread(target=self._loop, name="slow-request-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                self._samples.append((now, names.get(ident, str(ident)), _collapse(frame)))
+
+    def begin(self) -> float:
+        return time.monotonic()
+
+    def end(self, started: float, name: str):
+        """Dump the samples taken since started if the request was slow. Returns the file written, or None."""
+        elapsed = time.monotonic() - started
+        if elapsed < self.threshold:
+            return None
+        stacks = Counter(f"{thread};{stack}" for t, thread, stack in list(self._samples) if t >= started)
+        if not stacks:
+            return None
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")[:60]
+        path = os.path.join(self.out_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{int(elapsed * 1000)}ms.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
@@ -0,0 +1,58 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# replacement token per detector label; labels without a token are detected but left as-is
+REDACTION_TOKENS = {
+    "phones": "[REDACTED_PHONE]",
+    "names": "[REDACTED]",
+}
+
+
+class Redactor:
+    """Rewrites every occurrence of the detected terms in a single pass.
+
+    All terms from all detectors are compiled into one alternation regex, sorted
+    longest first so that at any position the longest term wins. Python's re
+    tries the alternatives one after another at each position, so the cost is
+    roughly text length times number of terms; the gain over one pass per term
+    is that the text is scanned and rebuilt once.
+    """
+
+    def __init__(self, terms_by_label: Dict[str, Iterable[str]], tokens: Optional[Dict[str, str]] = None):
+        self.tokens = REDACTION_TOKENS if tokens is None else tokens
+        self._label_of = {}
+        for label, terms in terms_by_label.items():
+            if label not in self.tokens:
+                continue
+            for term in terms or []:
+                # first detector to claim a term keeps it
+                if term and term.strip() and term not in self._label_of:
+                    self._label_of[term] = label
+        if self._label_of:
+            alternation = "|".join(re.escape(t) for t in sorted(self._label_of, key=len, reverse=True))
+            self._pattern = re.compile(alternation)
+        else:
+            self._pattern = None
+
+    def redact(self, text: str) -> Tuple[str, List[Dict]]:
+        """Return (redacted_text, redactions). Each redaction has the label and the
+        start/end character offsets of the replaced span in the original text."""
+        if self._pattern is None or not text:
+            return text, []
+        parts = []
+        redactions = []
+        pos = 0
+        for m in self._pattern.finditer(text):
+            start, end = m.span()
+            label = self._label_of[m.group(0)]
+            parts.append(text[pos:start])
+            parts.append(self.tokens[label])
+            redactions.append({"label": label, "start": start, "end": end})
+            pos = end
+        parts.append(text[pos:])
+        return "".join(parts), redactions
+
+
+def redact(text: str, terms_by_label: Dict[str, Iterable[str]],
+           tokens: Optional[Dict[str, str]] = None) -> Tuple[str, List[Dict]]:
+    return Redactor(terms_by_label, tokens).redact(text)
@@ -0,0 +1,274 @@
+"""Re-run NER, redaction, embedding and indexing over every stored extraction.
+
+After a change to the NER rules, the redaction or the embedding model, existing
+records keep their old entities, redacted text and vectors. This streams the
+store through the selected stages without going over HTTP:
+
+  ner     extract_entities on extractedText (also redacts, as on upload)
+  redact  redaction only, with the record's existing entities
+  embed   embed every passage, filling the embedding cache for the current model
+  index   rebuild the search index (or upsert each record when --case-id / --limit
+          restricts the run)
+
+NER and redaction run in a process pool, in batches; embedding and indexing run
+in this process, where the model batches passages itself. Progress is saved to a
+checkpoint after every batch, so an interrupted run continues with --resume.
+The ids of finished records are appended to <checkpoint>.done; --resume processes
+every selected record not listed there, including ones imported since the
+interrupted run. Resuming a run that completed is an error.
+--dry-run runs every stage except indexing but writes nothing: no records, no
+embedding cache entries, no checkpoint.
+
+Usage:
+    python -m utils.reprocess --stages ner,embed,index [--workers 4] [--dry-run] [--resume]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.store import DEFAULT_EXTRACTIONS_DIR, get_store
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+DEFAULT_CHECKPOINT = os.path.join(BASE_DIR, "storage", "reprocess.checkpoint.json")
+
+STAGES = ("ner", "redact", "embed", "index")
+# record fields each worker stage rewrites
+_NER_FIELDS = ("entities", "redactedText", "redactions", "confidence")
+
+
+class _Done:
+    def __init__(self, value):
+        self._value = value
+
+    def result(self):
+        return self._value
+
+
+def _init_worker():
+    from utils import ner
+    ner.warm_up()
+
+
+def process_batch(records: List[Dict], stages: Tuple[str, ...]) -> Tuple[List[Tuple[Dict, bool]], Dict[str, float]]:
+    """Worker: run the NER/redaction stages over a batch of records.
+    Returns ([(record, changed)], seconds per stage)."""
+    seconds = {}
+    out = [dict(r) for r in records]
+    texts = [r.get("extractedText") or "" for r in out]
+    if "ner" in stages:
+        from utils.ner import extract_entities_batch
+        start = time.perf_counter()
+        for record, result in zip(out, extract_entities_batch(texts, n_process=1)):
+            record.update({field: result.get(field) for field in _NER_FIELDS})
+        seconds["ner"] = time.perf_counter() - start
+    elif "redact" in stages:
+        from utils.redaction import redact
+        start = time.perf_counter()
+        for record, text in zip(out, texts):
+            record["redactedText"], record["redactions"] = redact(text, record.get("entities") or {})
+        seconds["redact"] = time.perf_counter() - start
+    return [(new, new != old) for new, old in zip(out, records)], seconds
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(path, state):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _done_path(checkpoint):
+    return checkpoint + ".done"
+
+
+def _load_done(checkpoint):
+    try:
+        with open(_done_path(checkpoint), "r", encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+    except OSError:
+        return set()
+
+
+def _append_done(checkpoint, ids):
+    with open(_done_path(checkpoint), "a", encoding="utf-8") as f:
+        f.write("".join(f"{i}\n" for i in ids))
+
+
+def _batches(store, ids, size):
+    for i in range(0, len(ids), size):
+        records = [store.get_extraction(extraction_id) for extraction_id in ids[i:i + size]]
+        yield [r for r in records if r is not None]
+
+
+def _report(label, done, total, changed, elapsed):
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else 0.0
+    print(f"{label}: {done}/{total} records, {changed} changed, {rate:.1f} records/sec, "
+          f"elapsed {elapsed:.0f}s, eta {eta:.0f}s", file=sys.stderr, flush=True)
+
+
+def run(stages, workers=None, batch_size=32, case_id=None, limit=None, dry_run=False, resume=False,
+        checkpoint=DEFAULT_CHECKPOINT, progress_every=10.0):
+    """Reprocess the store through stages. Returns a summary dict."""
+    stages = tuple(s for s in STAGES if s in stages)
+    store = get_store()
+    # pick up JSON records written directly by the backend, as POST /index does
+    store.import_json_dir(DEFAULT_EXTRACTIONS_DIR)
+
+    ids = store.extraction_ids(case_id)
+    state = {"stages": list(stages), "caseId": case_id, "processed": 0, "changed": 0, "complete": False}
+    saved = _load_checkpoint(checkpoint) if resume else None
+    if saved is not None:
+        if saved.get("stages") != list(stages) or saved.get("caseId") != case_id:
+            raise ValueError(f"Checkpoint {checkpoint} is for stages {saved.get('stages')} "
+                             f"and caseId {saved.get('caseId')}; start without --resume")
+        if saved.get("complete"):
+            raise ValueError(f"Checkpoint {checkpoint} is from a run that completed; start without --resume")
+        state = saved
+        done = _load_done(checkpoint)
+        ids = [i for i in ids if i not in done]
+    elif not dry_run and os.path.exists(_done_path(checkpoint)):
+        os.remove(_done_path(checkpoint))
+    if limit is not None:
+        ids = ids[:limit]
+    # a run over the whole corpus rebuilds the index once instead of upserting each record
+    full_run = case_id is None and limit is None
+    worker_stages = tuple(s for s in stages if s in ("ner", "redact"))
+
+    if "ner" in stages:
+        from utils import ner
+        if not ner.warm_up():
+            print("warning: spaCy is unavailable; names will only come from the regex detectors",
+                  file=sys.stderr)
+
+    totals = {s: 0.0 for s in stages}
+    processed = changed = 0
+    start = last_report = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    pool = None
+    if worker_stages and workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    # batches in flight: enough to keep every worker busy while results are written back
+    window = 2 * workers
+    pending = deque()
+
+    def _finish(limit_pending):
+        nonlocal processed, changed, last_report
+        while len(pending) > limit_pending:
+            results, seconds = pending.popleft().result()
+            for stage, s in seconds.items():
+                totals[stage] += s
+            _write_back(results)
+            processed += len(results)
+            changed += sum(1 for _, c in results if c)
+            if results and not dry_run:
+                _append_done(checkpoint, [r["id"] for r, _ in results])
+                state.update(processed=state["processed"] + len(results),
+                             changed=state["changed"] + sum(1 for _, c in results if c))
+                _save_checkpoint(checkpoint, state)
+            if time.perf_counter() - last_report >= progress_every:
+                last_report = time.perf_counter()
+                _report("progress", processed, len(ids), changed, last_report - start)
+
+    def _write_back(results):
+        if not dry_run:
+            for record, was_changed in results:
+                if was_changed:
+                    store.put_extraction(record)
+        records = [r for r, _ in results]
+        if "embed" in stages:
+            from utils.embeddings import embed_texts
+            from utils.faiss_index import record_passages
+            t = time.perf_counter()
+            passages = [p for r in records for p in record_passages(r)]
+            if passages:
+                # a dry run still embeds, for the timing, but leaves the cache untouched
+                embed_texts(passages, use_cache=not dry_run)
+            totals["embed"] += time.perf_counter() - t
+        if "index" in stages and not full_run and not dry_run:
+            from utils.faiss_index import upsert_document
+            t = time.perf_counter()
+            for r in records:
+                upsert_document(r)
+            totals["index"] += time.perf_counter() - t
+
+    try:
+        for batch in _batches(store, ids, batch_size):
+            if not worker_stages:
+                pending.append(_Done(([(r, False) for r in batch], {})))
+            elif pool is not None:
+                pending.append(pool.submit(process_batch, batch, worker_stages))
+            else:
+                pending.append(_Done(process_batch(batch, worker_stages)))
+            _finish(window)
+        _finish(0)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    indexed = None
+    if "index" in stages and full_run and not dry_run:
+        from utils.faiss_index import build_index
+        t = time.perf_counter()
+        indexed = build_index(store.iter_extractions())
+        totals["index"] += time.perf_counter() - t
+    if not dry_run:
+        state["complete"] = True
+        _save_checkpoint(checkpoint, state)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "stages": list(stages),
+        "records": processed,
+        "changed": changed,
+        "indexed": indexed,
+        "dryRun": dry_run,
+        "seconds": round(elapsed, 3),
+        "recordsPerSec": round(processed / elapsed, 2) if elapsed > 0 else None,
+        "stageSeconds": {s: round(v, 3) for s, v in totals.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-run NER, redaction, embedding and indexing over stored extractions.")
+    parser.add_argument("--stages", default="ner,embed,index", help=f"comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--workers", type=int, default=None, help="NER/redaction processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--case-id", default=None, help="only this case's extractions")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many records")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change and time the stages; write nothing")
+    parser.add_argument("--resume", action="store_true", help="process the records the checkpointed run has not finished")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--progress-every", type=float, default=10.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown or not stages:
+        parser.error(f"unknown stages {unknown}; choose from {', '.join(STAGES)}")
+    summary = run(stages, workers=args.workers, batch_size=args.batch_size, case_id=args.case_id,
+                  limit=args.limit, dry_run=args.dry_run, resume=args.resume, checkpoint=args.checkpoint,
+                  progress_every=args.progress_every)
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""In-memory LRU caches with a time-to-live, used for search query vectors and results.
+
+Dashboards repeat the same handful of queries; caching the query vector skips the
+SentenceTransformer call and caching the result list skips the search entirely.
+Result keys include the index version, so any rebuild or update makes old entries
+unreachable (they age out of the LRU).
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from utils import metrics
+
+_REQUESTS = metrics.counter("ai_cache_requests_total", "In-memory cache lookups by outcome.", ["cache", "result"])
+
+
+class TTLCache:
+    def __init__(self, max_entries: int, ttl_seconds: float, name: str = "default"):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()  # key -> (stored at, value), least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl <= 0 or time.monotonic() - entry[0] < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                _REQUESTS.inc(cache=self.name, result="hit")
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            _REQUESTS.inc(cache=self.name, result="miss")
+            return None
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "ttlSeconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / total if total else None,
+            }
+
+
+class LatencyStats:
+    """Count and mean/max latency per label (e.g. cached vs computed searches)."""
+
+    def __init__(self):
+        self._data = {}  # label -> [count, total ms, max ms]
+        self._lock = threading.Lock()
+
+    def record(self, label: str, ms: float):
+        with self._lock:
+            data = self._data.setdefault(label, [0, 0.0, 0.0])
+            data[0] += 1
+            data[1] += ms
+            data[2] = max(data[2], ms)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {label: {"count": n, "avgMs": round(total / n, 3), "maxMs": round(peak, 3)}
+                    for label, (n, total, peak) in self._data.items()}
@@ -0,0 +1,263 @@
+"""Storage backend for extraction and draft records.
+
+Records used to be one pretty-printed JSON file each under storage/output, so
+every lookup or index rebuild meant a directory scan. ExtractionStore is the
+storage interface; SQLiteStore keeps records in an embedded SQLite database (WAL)
+with compact JSON payloads, indexed by id, caseId and update time.
+
+Import existing JSON files with:
+    python -m utils.store migrate
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import STORE_BACKEND, STORE_DB_PATH
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+DEFAULT_EXTRACTIONS_DIR = os.path.join(BASE_DIR, "storage", "output", "ai_extractions")
+DEFAULT_DRAFTS_DIR = os.path.join(BASE_DIR, "storage", "output", "ai_documents")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    id TEXT PRIMARY KEY,
+    case_id TEXT,
+    created_at TEXT,
+    updated_at REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_extractions_case ON extractions(case_id);
+CREATE INDEX IF NOT EXISTS idx_extractions_updated ON extractions(updated_at);
+CREATE TABLE IF NOT EXISTS drafts (
+    id TEXT PRIMARY KEY,
+    case_id TEXT,
+    extraction_id TEXT,
+    created_at TEXT,
+    updated_at REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_drafts_case ON drafts(case_id);
+CREATE INDEX IF NOT EXISTS idx_drafts_extraction ON drafts(extraction_id);
+CREATE TABLE IF NOT EXISTS upload_hashes (
+    sha256 TEXT PRIMARY KEY,
+    extraction_id TEXT NOT NULL,
+    size INTEGER,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def _dumps(record: Dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+class ExtractionStore(ABC):
+    """Interface for extraction/draft storage backends."""
+
+    @abstractmethod
+    def put_extraction(self, record: Dict):
+        ...
+
+    @abstractmethod
+    def get_extraction(self, extraction_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def has_extraction(self, extraction_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def list_extractions_by_case(self, case_id: str) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def extractions_changed_since(self, since: float) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def iter_extractions(self) -> Iterator[Dict]:
+        ...
+
+    @abstractmethod
+    def extraction_ids(self, case_id: Optional[str] = None) -> List[str]:
+        """Ids of all extractions (of one case if given), sorted."""
+
+    @abstractmethod
+    def put_draft(self, record: Dict):
+        ...
+
+    @abstractmethod
+    def get_draft(self, doc_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def list_drafts_by_case(self, case_id: str) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def get_upload_hash(self, sha256: str) -> Optional[str]:
+        """Extraction id recorded for an upload with this SHA-256, or None."""
+
+    @abstractmethod
+    def put_upload_hash(self, sha256: str, extraction_id: str, size: int):
+        ...
+
+    def import_json_file(self, path: str, kind: str = "extraction") -> Optional[Dict]:
+        """Import one legacy JSON record file. Returns the record, or None if unreadable."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(record, dict) or not record.get("id"):
+            return None
+        if kind == "draft":
+            self.put_draft(record)
+        else:
+            self.put_extraction(record)
+        return record
+
+    def import_json_dir(self, directory: str, kind: str = "extraction", skip_existing: bool = True) -> int:
+        """Import every <id>.json under directory. Returns the number of records imported."""
+        if not os.path.isdir(directory):
+            return 0
+        exists = self.has_extraction if kind == "extraction" else (lambda i: self.get_draft(i) is not None)
+        n = 0
+        for fn in os.listdir(directory):
+            if not fn.endswith(".json"):
+                continue
+            if skip_existing and exists(fn[:-len(".json")]):
+                continue
+            if self.import_json_file(os.path.join(directory, fn), kind) is not None:
+                n += 1
+        return n
+
+
+class SQLiteStore(ExtractionStore):
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread; WAL lets readers run alongside a writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put_extraction(self, record: Dict):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO extractions (id, case_id, created_at, updated_at, payload) VALUES (?, ?, ?, ?, ?)",
+            (record["id"], record.get("caseId"), record.get("createdAt"), time.time(), _dumps(record)),
+        )
+
+    def get_extraction(self, extraction_id: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT payload FROM extractions WHERE id = ?", (extraction_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def has_extraction(self, extraction_id: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM extractions WHERE id = ?", (extraction_id,)).fetchone() is not None
+
+    def list_extractions_by_case(self, case_id: str) -> List[Dict]:
+        rows = self._conn().execute(
+            "SELECT payload FROM extractions WHERE case_id = ? ORDER BY created_at", (case_id,)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def extractions_changed_since(self, since: float) -> List[Dict]:
+        rows = self._conn().execute(
+            "SELECT payload FROM extractions WHERE updated_at > ? ORDER BY updated_at", (since,)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def iter_extractions(self) -> Iterator[Dict]:
+        cursor = self._conn().execute("SELECT payload FROM extractions ORDER BY rowid")
+        while True:
+            rows = cursor.fetchmany(500)
+            if not rows:
+                break
+            for r in rows:
+                yield json.loads(r[0])
+
+    def extraction_ids(self, case_id: Optional[str] = None) -> List[str]:
+        if case_id is None:
+            rows = self._conn().execute("SELECT id FROM extractions ORDER BY id").fetchall()
+        else:
+            rows = self._conn().execute("SELECT id FROM extractions WHERE case_id = ? ORDER BY id", (case_id,)).fetchall()
+        return [r[0] for r in rows]
+
+    def put_draft(self, record: Dict):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO drafts (id, case_id, extraction_id, created_at, updated_at, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (record["id"], record.get("caseId"), record.get("extractionId"), record.get("createdAt"),
+             time.time(), _dumps(record)),
+        )
+
+    def get_draft(self, doc_id: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT payload FROM drafts WHERE id = ?", (doc_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list_drafts_by_case(self, case_id: str) -> List[Dict]:
+        rows = self._conn().execute(
+            "SELECT payload FROM drafts WHERE case_id = ? ORDER BY created_at", (case_id,)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def get_upload_hash(self, sha256: str) -> Optional[str]:
+        row = self._conn().execute("SELECT extraction_id FROM upload_hashes WHERE sha256 = ?", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def put_upload_hash(self, sha256: str, extraction_id: str, size: int):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO upload_hashes (sha256, extraction_id, size, created_at) VALUES (?, ?, ?, ?)",
+            (sha256, extraction_id, size, time.time()),
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ExtractionStore:
+    """Process-wide store for the configured STORE_BACKEND."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if STORE_BACKEND != "sqlite":
+                raise ValueError(f"Unknown STORE_BACKEND '{STORE_BACKEND}'")
+            path = STORE_DB_PATH if os.path.isabs(STORE_DB_PATH) else os.path.join(BASE_DIR, STORE_DB_PATH)
+            _store = SQLiteStore(path)
+        return _store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extraction store maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_migrate = sub.add_parser("migrate", help="import legacy per-record JSON files")
+    p_migrate.add_argument("--extractions-dir", default=DEFAULT_EXTRACTIONS_DIR)
+    p_migrate.add_argument("--drafts-dir", default=DEFAULT_DRAFTS_DIR)
+    p_migrate.add_argument("--overwrite", action="store_true", help="re-import records already in the store")
+    args = parser.parse_args(argv)
+
+    store = get_store()
+    n_ext = store.import_json_dir(args.extractions_dir, "extraction", skip_existing=not args.overwrite)
+    n_drafts = store.import_json_dir(args.drafts_dir, "draft", skip_existing=not args.overwrite)
+    print(f"Imported {n_ext} extractions and {n_drafts} drafts into {store.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
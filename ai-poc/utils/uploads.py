@@ -0,0 +1,96 @@
+"""Streaming upload storage: size limit, content sniffing and SHA-256 while copying.
+
+Starlette spools each multipart upload to a temporary file; copy_upload moves it
+to EXTRACTS_DIR in UPLOAD_CHUNK_BYTES chunks, so a request never holds the whole
+file in memory. The type is taken from the first bytes, not from the client's
+filename or content type, and the digest lets a repeated upload reuse the
+extraction made from the first copy.
+"""
+import hashlib
+import os
+from typing import BinaryIO, Optional, Tuple
+
+from config import UPLOAD_ALLOWED_TYPES, UPLOAD_CHUNK_BYTES, UPLOAD_MAX_BYTES
+from utils import metrics
+
+UPLOADS = metrics.counter("ai_uploads_total", "Uploads by outcome.", ["result"])
+
+# (type, magic prefix); WebP is "RIFF....WEBP" and is checked separately
+_MAGIC = (
+    ("pdf", b"%PDF-"),
+    ("png", b"\x89PNG\r\n\x1a\n"),
+    ("jpeg", b"\xff\xd8\xff"),
+    ("tiff", b"II*\x00"),
+    ("tiff", b"MM\x00*"),
+    ("gif", b"GIF87a"),
+    ("gif", b"GIF89a"),
+    ("bmp", b"BM"),
+)
+SNIFF_BYTES = 4096
+
+
+class UploadRejected(Exception):
+    status_code = 400
+
+
+class UploadTooLarge(UploadRejected):
+    status_code = 413
+
+
+class UnsupportedUpload(UploadRejected):
+    status_code = 415
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """File type from the first bytes of a file: an image/PDF type, 'text', or None."""
+    for kind, magic in _MAGIC:
+        if head.startswith(magic):
+            return kind
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if not head or b"\x00" in head:
+        return None
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # a multi-byte character cut at the end of the sniffed window is still text
+        if e.reason != "unexpected end of data":
+            return None
+    return "text"
+
+
+def copy_upload(src: BinaryIO, path: str, max_bytes: int = UPLOAD_MAX_BYTES,
+                chunk_size: int = UPLOAD_CHUNK_BYTES) -> Tuple[int, str, str]:
+    """Copy an upload stream to path in chunks. Returns (size, sha256 hex, sniffed type).
+    Raises UploadTooLarge / UnsupportedUpload, leaving nothing at path."""
+    digest = hashlib.sha256()
+    size = 0
+    tmp = path + ".part"
+    try:
+        with open(tmp, "wb") as out:
+            head = src.read(SNIFF_BYTES)
+            if not head:
+                UPLOADS.inc(result="empty")
+                raise UploadRejected("Empty upload")
+            kind = sniff(head)
+            if kind is None or kind not in UPLOAD_ALLOWED_TYPES:
+                UPLOADS.inc(result="unsupported")
+                raise UnsupportedUpload(f"Unsupported file type ({kind or 'unknown'}); "
+                                        f"accepted: {', '.join(UPLOAD_ALLOWED_TYPES)}")
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if max_bytes > 0 and size > max_bytes:
+                    UPLOADS.inc(result="too_large")
+                    raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+                digest.update(chunk)
+                out.write(chunk)
+                chunk = src.read(chunk_size)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return size, digest.hexdigest(), kind
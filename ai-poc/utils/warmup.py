@@ -0,0 +1,106 @@
+"""Startup warm-up of models and the search index, and per-component readiness.
+
+Each component has a mode (WARMUP_MODES):
+  eager       loaded before the app starts accepting requests
+  background  loaded in a worker thread right after startup; requests that need
+              it before then load it themselves, as before
+  lazy        not warmed; loaded by the first request that needs it
+
+GET /ready reports every component's state and load time and returns 503 until
+all eager and background components have finished (ready or failed). A failed
+component means its fallback path is in use (e.g. regex-only NER without spaCy).
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Dict
+
+from config import WARMUP_MODES
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+MODES = ("eager", "background", "lazy")
+
+
+def _warm_embeddings():
+    from utils.embeddings import embed_texts, model_info
+    embed_texts(["warm up"], use_cache=False)
+    info = model_info()
+    return f"{info['model']} ({info['backend']})"
+
+
+def _warm_spacy():
+    # NER runs in the stage's worker processes, which load spaCy when they start
+    from utils import ner
+    from utils.executors import get_stage
+    stage = get_stage("ner")
+    if stage.kind != "process":
+        return "spaCy loaded" if ner.warm_up() else "spaCy unavailable; regex-only NER"
+    if not all(stage.prestart(ner.spacy_loaded)):
+        raise RuntimeError("spaCy unavailable; regex-only NER")
+    return f"spaCy loaded in {stage.workers} worker processes"
+
+
+def _warm_generator():
+    from utils.generator import warm_up
+    return warm_up()
+
+
+def _warm_index():
+    from utils.faiss_index import warm_up
+    return warm_up()
+
+
+def _warm_ocr():
+    from utils.ocr import warm_up
+    return f"tesseract {warm_up()}"
+
+
+COMPONENTS: Dict[str, Callable[[], str]] = {
+    "index": _warm_index,
+    "embeddings": _warm_embeddings,
+    "spacy": _warm_spacy,
+    "ocr": _warm_ocr,
+    "generator": _warm_generator,
+}
+
+_status = {}  # component -> {"mode", "state", "seconds", "detail"}
+
+
+def _mode(name):
+    mode = WARMUP_MODES.get(name, "lazy")
+    return mode if mode in MODES else "lazy"
+
+
+def _load(name):
+    _status[name].update(state="loading")
+    start = time.perf_counter()
+    try:
+        detail = COMPONENTS[name]()
+        _status[name].update(state="ready", detail=detail)
+    except Exception as e:
+        logger.warning("Warm-up of %s failed: %s", name, e)
+        metrics.fallback(name, "warmup_failed")
+        _status[name].update(state="failed", detail=str(e))
+    _status[name]["seconds"] = round(time.perf_counter() - start, 3)
+
+
+async def start():
+    """Run eager warm-ups (concurrently) and return once they are done; schedule the
+    background ones. Returns the future of the background warm-ups, or None."""
+    for name in COMPONENTS:
+        _status[name] = {"mode": _mode(name), "state": "pending" if _mode(name) != "lazy" else "lazy",
+                         "seconds": None, "detail": None}
+    eager = [n for n in COMPONENTS if _mode(n) == "eager"]
+    background = [n for n in COMPONENTS if _mode(n) == "background"]
+    await asyncio.gather(*(asyncio.to_thread(_load, n) for n in eager))
+    if not background:
+        return None
+    return asyncio.gather(*(asyncio.to_thread(_load, n) for n in background))
+
+
+def readiness():
+    """(ready, per-component status)."""
+    ready = all(s["state"] in ("ready", "failed", "lazy") for s in _status.values())
+    return ready, {name: dict(s) for name, s in _status.items()}